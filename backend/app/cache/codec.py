@@ -0,0 +1,88 @@
+from typing import Dict, Tuple
+import json
+import struct
+import zlib
+from app.config import get_settings
+import logging
+
+try:
+    import zstandard
+except ImportError:  # Optional; zlib is used when zstd is unavailable
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Header: magic, format version, analysis schema version, compression codec
+MAGIC = b"JA"
+FORMAT_VERSION = 1
+HEADER = struct.Struct(">2sBHB")
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+# Stored positionally, so field names are not repeated in every value.
+# Changing this tuple requires bumping ANALYSIS_SCHEMA_VERSION.
+ANALYSIS_FIELDS = ("summary", "key_skills", "required_experience", "company_culture", "estimated_salary_range")
+
+class StaleSchemaError(ValueError):
+    """The value was written for a different analysis schema version."""
+
+def _compression_codec() -> int:
+    if settings.CACHE_COMPRESSION == "zstd":
+        if zstandard is not None:
+            return CODEC_ZSTD
+        logger.warning("CACHE_COMPRESSION=zstd but zstandard is not installed; using zlib")
+        return CODEC_ZLIB
+    if settings.CACHE_COMPRESSION == "zlib":
+        return CODEC_ZLIB
+    return CODEC_NONE
+
+def encode_analysis(analysis: Dict) -> bytes:
+    """Encode an analysis as a versioned header plus a compact positional body."""
+    body = json.dumps(
+        [analysis.get(field) for field in ANALYSIS_FIELDS],
+        separators=(",", ":"),
+        ensure_ascii=False
+    ).encode()
+
+    codec = CODEC_NONE
+    if len(body) >= settings.CACHE_COMPRESSION_MIN_BYTES:
+        codec = _compression_codec()
+        if codec == CODEC_ZSTD:
+            body = zstandard.ZstdCompressor(level=3).compress(body)
+        elif codec == CODEC_ZLIB:
+            body = zlib.compress(body, 6)
+
+    return HEADER.pack(MAGIC, FORMAT_VERSION, settings.ANALYSIS_SCHEMA_VERSION, codec) + body
+
+def decode_analysis(data: bytes) -> Tuple[Dict, bool]:
+    """
+    Decode a cached analysis. Returns (analysis, is_legacy), where is_legacy
+    marks plain JSON, as older versions stored under the job URL.
+    Raises StaleSchemaError for values from another schema version and
+    ValueError for anything unreadable.
+    """
+    if data[:1] == b"{":
+        return json.loads(data), True
+
+    if len(data) < HEADER.size:
+        raise ValueError("Truncated cache value")
+    magic, format_version, schema_version, codec = HEADER.unpack_from(data)
+    if magic != MAGIC or format_version != FORMAT_VERSION:
+        raise ValueError(f"Unknown cache value format: {magic!r} v{format_version}")
+    if schema_version != settings.ANALYSIS_SCHEMA_VERSION:
+        raise StaleSchemaError(f"Schema version {schema_version}, expected {settings.ANALYSIS_SCHEMA_VERSION}")
+
+    body = data[HEADER.size:]
+    if codec == CODEC_ZLIB:
+        body = zlib.decompress(body)
+    elif codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("zstd-compressed value but zstandard is not installed")
+        body = zstandard.ZstdDecompressor().decompress(body)
+    elif codec != CODEC_NONE:
+        raise ValueError(f"Unknown compression codec: {codec}")
+
+    return dict(zip(ANALYSIS_FIELDS, json.loads(body))), False
@@ -0,0 +1,75 @@
+from typing import Optional
+import redis.asyncio as redis
+import redis as sync_redis
+from app.config import get_settings
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_pool: Optional[redis.ConnectionPool] = None
+_sync_pool: Optional[sync_redis.ConnectionPool] = None
+
+def get_redis() -> redis.Redis:
+    """
+    Get an asyncio Redis client backed by the shared connection pool.
+    The pool is created lazily so services can be constructed before startup.
+    """
+    global _pool
+    if _pool is None:
+        logger.info(f"Creating Redis connection pool (max {settings.REDIS_MAX_CONNECTIONS} connections)")
+        _pool = redis.ConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+            health_check_interval=30
+        )
+    return redis.Redis(connection_pool=_pool)
+
+def get_pubsub_redis() -> redis.Redis:
+    """
+    Get a dedicated asyncio client for long-lived subscriptions. It has no
+    socket read timeout, since a quiet channel is not an error.
+    """
+    return redis.Redis.from_url(
+        settings.REDIS_URL,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        health_check_interval=30
+    )
+
+def get_sync_redis() -> sync_redis.Redis:
+    """
+    Get a blocking Redis client backed by a shared pool, for code that already
+    runs in worker threads (e.g. scraping). Never use it on the event loop.
+    """
+    global _sync_pool
+    if _sync_pool is None:
+        logger.info(f"Creating sync Redis connection pool (max {settings.REDIS_MAX_CONNECTIONS} connections)")
+        _sync_pool = sync_redis.ConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT
+        )
+    return sync_redis.Redis(connection_pool=_sync_pool)
+
+async def init_redis() -> None:
+    """Create the pool and check connectivity. A down Redis is logged, not fatal."""
+    try:
+        await get_redis().ping()
+        logger.info("Redis connection pool ready")
+    except Exception as e:
+        logger.warning(f"Redis unavailable at startup, cache will degrade to misses: {str(e)}")
+
+async def close_redis() -> None:
+    """Close every pooled connection."""
+    global _pool, _sync_pool
+    if _pool is not None:
+        await _pool.disconnect()
+        _pool = None
+        logger.info("Redis connection pool closed")
+    if _sync_pool is not None:
+        _sync_pool.disconnect()
+        _sync_pool = None
+        logger.info("Sync Redis connection pool closed")
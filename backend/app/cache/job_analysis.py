@@ -1,55 +1,460 @@
-import redis
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import hashlib
 import json
-from datetime import timedelta
+import time
+import uuid
+import zlib
+from app.cache.codec import StaleSchemaError, decode_analysis, encode_analysis
+from app.cache.connection import get_pubsub_redis, get_redis
+from app.cache.local import LocalCache
+from app.cache.simhash import SIMHASH_BANDS, bands, content_hash, hamming_distance, simhash
 from app.config import get_settings
 import logging
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+STATS_KEY = "job_analysis:stats"
+STATS_FIELDS = (
+    "l1_hits", "exact_hits", "near_duplicate_hits", "misses",
+    "validation_l1_hits", "validation_hits", "validation_misses",
+)
+INVALIDATION_CHANNEL = "job_analysis:invalidate"
+
 class JobAnalysisCache:
+    """
+    Job analysis cache on the shared asyncio Redis pool.
+    Analyses are content-addressed by a hash of the normalized description,
+    so the same posting under different URLs shares one entry, and a SimHash
+    index lets lightly edited reposts reuse an existing analysis.
+    A bounded in-process LRU (L1) sits in front of Redis (L2); writes are
+    broadcast over pub/sub so other workers drop their stale L1 copies.
+    Every operation degrades to a miss (or a no-op write) when Redis is slow
+    or down, so the cache can never block or fail a request.
+    """
+
     def __init__(self):
         logger.info("Initializing JobAnalysisCache...")
-        logger.debug(f"Connecting to Redis at {settings.REDIS_URL}")
-        self.redis = redis.Redis.from_url(settings.REDIS_URL)
-        self.expiry_days = 7
+        self.redis = get_redis()
+        self.expiry = settings.ANALYSIS_CACHE_EXPIRATION
+        self.local = LocalCache(settings.L1_CACHE_MAX_ENTRIES, settings.L1_CACHE_TTL)
+        self.instance_id = uuid.uuid4().hex
+        self.listener_task: Optional[asyncio.Task] = None
         logger.info("JobAnalysisCache initialized successfully")
 
-    def get_analysis(self, url: str) -> Optional[dict]:
+    def start_invalidation_listener(self) -> None:
+        """Start dropping L1 entries that other workers overwrite."""
+        if self.listener_task is None and settings.L1_CACHE_MAX_ENTRIES > 0:
+            self.listener_task = asyncio.create_task(self._listen_for_invalidations())
+
+    async def stop_invalidation_listener(self) -> None:
+        if self.listener_task is not None:
+            self.listener_task.cancel()
+            try:
+                await self.listener_task
+            except asyncio.CancelledError:
+                pass
+            self.listener_task = None
+
+    @staticmethod
+    def analysis_key(digest: str) -> str:
+        return f"job_analysis:{digest}"
+
+    @staticmethod
+    def band_key(band: int, value: int) -> str:
+        """Sorted set of the digests sharing one SimHash band, scored by their expiry time."""
+        return f"job_simhash:zband:{band}:{value:x}"
+
+    @staticmethod
+    def legacy_key(url: str) -> str:
+        """Key analyses were stored under before they were content-addressed."""
+        return f"job_analysis:{url}"
+
+    async def get_analysis(self, description: str, url: Optional[str] = None) -> Optional[dict]:
         """
-        Retrieve job analysis from cache by URL.
+        Retrieve job analysis from cache by description content, falling back
+        to an entry stored under the job's URL by older versions.
         Returns None if not found.
         """
-        cache_key = f"job_analysis:{url}"
-        logger.debug(f"Attempting to retrieve cache entry for key: {cache_key}")
-        
+        return (await self.get_analyses([description], [url] if url else None))[0]
+
+    async def set_analysis(self, description: str, analysis: dict) -> None:
+        """
+        Store job analysis in cache with expiration.
+        Only stores the analysis part, not the validity.
+        """
+        await self.set_analyses({description: analysis})
+
+    async def get_analyses(self, descriptions: List[str], urls: Optional[List[str]] = None) -> List[Optional[dict]]:
+        """
+        Retrieve several job analyses: L1 first, then exact matches from Redis
+        in a single MGET, then entries older versions stored under the job
+        URLs (when given), then near-duplicates of the remaining misses
+        through the SimHash index.
+        Returns a list aligned with descriptions, with None for each miss.
+        """
+        if not descriptions:
+            return []
+
+        digests = [content_hash(description) for description in descriptions]
+        cache_keys = [self.analysis_key(digest) for digest in digests]
+        results: List[Optional[dict]] = [self.local.get(key) for key in cache_keys]
+        l1_hits = sum(1 for result in results if result is not None)
+
+        remote = [i for i, result in enumerate(results) if result is None]
+        exact_hits = 0
+        if remote:
+            logger.debug(f"Attempting to retrieve {len(remote)} cache entries")
+            try:
+                cached_values = await self.redis.mget([cache_keys[i] for i in remote])
+            except Exception as e:
+                logger.error(f"Error retrieving batch from cache: {str(e)}", exc_info=True)
+                return results
+
+            for i, value in zip(remote, cached_values):
+                results[i] = self._decode(cache_keys[i], value)
+                if results[i] is not None:
+                    self.local.set(cache_keys[i], results[i])
+                    exact_hits += 1
+
+        if urls and settings.LEGACY_URL_KEY_FALLBACK:
+            misses = [i for i, result in enumerate(results) if result is None and urls[i]]
+            if misses:
+                legacy = await self._get_legacy([descriptions[i] for i in misses], [urls[i] for i in misses])
+                for i, analysis in zip(misses, legacy):
+                    if analysis is not None:
+                        results[i] = analysis
+                        self.local.set(cache_keys[i], analysis)
+                        exact_hits += 1
+
+        near_hits = 0
+        misses = [i for i, result in enumerate(results) if result is None]
+        if misses and settings.NEAR_DUPLICATE_DETECTION:
+            try:
+                near_matches = await self._find_near_duplicates([descriptions[i] for i in misses])
+                for i, match in zip(misses, near_matches):
+                    if match is not None:
+                        results[i] = match
+                        near_hits += 1
+            except Exception as e:
+                logger.error(f"Error searching near-duplicate index: {str(e)}", exc_info=True)
+
+        total_misses = len(descriptions) - l1_hits - exact_hits - near_hits
+        logger.debug(f"Batch cache lookup: {l1_hits} L1 hits, {exact_hits} exact hits, "
+                     f"{near_hits} near-duplicate hits, {total_misses} misses")
+        await self._record_stats(
+            l1_hits=l1_hits, exact_hits=exact_hits, near_duplicate_hits=near_hits, misses=total_misses
+        )
+        return results
+
+    async def set_analyses(self, analyses: Dict[str, dict]) -> None:
+        """
+        Store several job analyses, keyed by description, with a single
+        pipelined round trip that also updates the near-duplicate index.
+        Failures are logged and swallowed so a response is never lost
+        because the cache could not be written.
+        """
+        if not analyses:
+            return
+
+        logger.debug(f"Storing {len(analyses)} cache entries")
+        cache_keys = []
+
         try:
-            cached_data = self.redis.get(cache_key)
-            if cached_data:
-                logger.debug(f"Cache hit for key: {cache_key}")
-                return json.loads(cached_data)
-            logger.debug(f"Cache miss for key: {cache_key}")
-            return None
+            async with self.redis.pipeline(transaction=False) as pipeline:
+                for description, analysis in analyses.items():
+                    cache_key = self._queue_analysis(pipeline, description, analysis, self.expiry)
+                    cache_keys.append(cache_key)
+                    self.local.set(cache_key, analysis)
+                self._publish_invalidation(pipeline, cache_keys)
+                await pipeline.execute()
+            logger.debug(f"Successfully cached {len(analyses)} analyses with {self.expiry}s expiration")
+        except Exception as e:
+            logger.error(f"Error storing batch in cache: {str(e)}", exc_info=True)
+
+    async def get_stats(self) -> Dict:
+        """Hit/miss counters shared by all workers, with derived hit rates."""
+        try:
+            raw = await self.redis.hgetall(STATS_KEY)
         except Exception as e:
-            logger.error(f"Error retrieving from cache for key {cache_key}: {str(e)}", exc_info=True)
+            logger.error(f"Error retrieving cache stats: {str(e)}", exc_info=True)
+            raw = {}
+
+        stats = {field: int(raw.get(field.encode(), 0)) for field in STATS_FIELDS}
+        l2_hits = stats["exact_hits"] + stats["near_duplicate_hits"]
+        l2_lookups = l2_hits + stats["misses"]
+        analysis_lookups = stats["l1_hits"] + l2_lookups
+        validation_l2_lookups = stats["validation_hits"] + stats["validation_misses"]
+        validation_lookups = stats["validation_l1_hits"] + validation_l2_lookups
+
+        def ratio(part: int, whole: int) -> float:
+            return part / whole if whole else 0.0
+
+        stats["analysis_hit_rate"] = ratio(stats["l1_hits"] + l2_hits, analysis_lookups)
+        stats["l1_hit_rate"] = ratio(stats["l1_hits"], analysis_lookups)
+        stats["l2_hit_rate"] = ratio(l2_hits, l2_lookups)
+        stats["near_duplicate_hit_rate"] = ratio(stats["near_duplicate_hits"], analysis_lookups)
+        stats["validation_hit_rate"] = ratio(stats["validation_l1_hits"] + stats["validation_hits"], validation_lookups)
+        stats["validation_l1_hit_rate"] = ratio(stats["validation_l1_hits"], validation_lookups)
+        stats["validation_l2_hit_rate"] = ratio(stats["validation_hits"], validation_l2_lookups)
+        # L1 occupancy is per worker, unlike the shared counters above
+        stats["l1"] = self.local.stats()
+        return stats
+
+    async def _find_near_duplicates(self, descriptions: List[str]) -> List[Optional[dict]]:
+        """
+        Look up each description's SimHash bands, keep candidates within
+        NEAR_DUPLICATE_MAX_DISTANCE bits, and return the closest one's analysis.
+        """
+        signatures = [simhash(description) for description in descriptions]
+        now = time.time()
+
+        async with self.redis.pipeline(transaction=False) as pipeline:
+            for signature in signatures:
+                for band, value in enumerate(bands(signature)):
+                    pipeline.zrangebyscore(self.band_key(band, value), now, "+inf")
+            members = await pipeline.execute()
+
+        candidates = [
+            set().union(*members[i * SIMHASH_BANDS:(i + 1) * SIMHASH_BANDS])
+            for i in range(len(descriptions))
+        ]
+        candidate_digests = sorted({digest.decode() for group in candidates for digest in group})
+        if not candidate_digests:
+            return [None] * len(descriptions)
+
+        candidate_signatures = await self.redis.mget([f"job_simhash:sig:{d}" for d in candidate_digests])
+        known = {
+            digest: int(signature)
+            for digest, signature in zip(candidate_digests, candidate_signatures)
+            if signature is not None
+        }
+
+        best_matches: List[Optional[str]] = []
+        for signature, group in zip(signatures, candidates):
+            scored = [
+                (hamming_distance(signature, known[digest.decode()]), digest.decode())
+                for digest in group if digest.decode() in known
+            ]
+            scored = [item for item in scored if item[0] <= settings.NEAR_DUPLICATE_MAX_DISTANCE]
+            best_matches.append(min(scored)[1] if scored else None)
+
+        matched = sorted({digest for digest in best_matches if digest})
+        if not matched:
+            return [None] * len(descriptions)
+
+        cache_keys = [self.analysis_key(digest) for digest in matched]
+        values = await self.redis.mget(cache_keys)
+        analyses = {digest: self._decode(key, value) for digest, key, value in zip(matched, cache_keys, values)}
+        return [analyses.get(digest) if digest else None for digest in best_matches]
+
+    def _publish_invalidation(self, pipeline, cache_keys: List[str]) -> None:
+        if cache_keys and settings.L1_CACHE_MAX_ENTRIES > 0:
+            pipeline.publish(INVALIDATION_CHANNEL, json.dumps({"origin": self.instance_id, "keys": cache_keys}))
+
+    async def _listen_for_invalidations(self) -> None:
+        """Drop L1 entries written by other workers; reconnects until cancelled."""
+        while True:
+            client = get_pubsub_redis()
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Invalidations may have been missed while disconnected
+                self.local.clear()
+                logger.info("Listening for L1 cache invalidations")
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    if data["origin"] != self.instance_id:
+                        self.local.delete_many(data["keys"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"L1 invalidation listener disconnected: {str(e)}")
+                self.local.clear()
+                await asyncio.sleep(settings.L1_CACHE_RECONNECT_DELAY)
+            finally:
+                await pubsub.aclose()
+                await client.aclose()
+
+    async def _record_stats(self, **counts: int) -> None:
+        counts = {field: count for field, count in counts.items() if count}
+        if not counts:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipeline:
+                for field, count in counts.items():
+                    pipeline.hincrby(STATS_KEY, field, count)
+                await pipeline.execute()
+        except Exception as e:
+            logger.debug(f"Error recording cache stats: {str(e)}")
+
+    def _queue_analysis(self, pipeline, description: str, analysis: dict, expiry: int) -> str:
+        """Queue writing an analysis and its near-duplicate index entries; returns its key."""
+        digest = content_hash(description)
+        cache_key = self.analysis_key(digest)
+        pipeline.setex(cache_key, expiry, encode_analysis(analysis))
+
+        if settings.NEAR_DUPLICATE_DETECTION:
+            signature = simhash(description)
+            pipeline.setex(f"job_simhash:sig:{digest}", expiry, signature)
+            now = time.time()
+            for band, value in enumerate(bands(signature)):
+                band_key = self.band_key(band, value)
+                # Members expire individually, and a busy band keeps only the latest-expiring ones
+                pipeline.zadd(band_key, {digest: now + expiry})
+                pipeline.zremrangebyscore(band_key, "-inf", now)
+                pipeline.zremrangebyrank(band_key, 0, -settings.NEAR_DUPLICATE_BAND_MAX_MEMBERS - 1)
+                pipeline.expire(band_key, expiry)
+        return cache_key
+
+    def _decode(self, cache_key: str, cached_data: Optional[bytes]) -> Optional[dict]:
+        """Decode a cached value; a corrupt or stale one reads as a miss."""
+        if not cached_data:
             return None
+        try:
+            analysis, _ = decode_analysis(cached_data)
+        except StaleSchemaError as e:
+            logger.debug(f"Ignoring cache entry for key {cache_key}: {str(e)}")
+            return None
+        except (ValueError, zlib.error) as e:
+            logger.error(f"Corrupt cache entry for key {cache_key}: {str(e)}")
+            return None
+        return analysis
 
-    def set_analysis(self, url: str, analysis: dict) -> None:
+    async def _get_legacy(self, descriptions: List[str], urls: List[str]) -> List[Optional[dict]]:
         """
-        Store job analysis in cache with expiration.
-        Only stores the analysis part, not the validity.
+        Look up analyses older versions stored as JSON under the job URL, and
+        move each one found to its content key, keeping its remaining TTL.
+        Returns a list aligned with descriptions, with None for each miss.
         """
-        cache_key = f"job_analysis:{url}"
-        logger.debug(f"Storing cache entry for key: {cache_key}")
-        
+        legacy_keys = [self.legacy_key(url) for url in urls]
         try:
-            self.redis.setex(
-                cache_key,
-                timedelta(days=self.expiry_days),
-                json.dumps(analysis)
-            )
-            logger.debug(f"Successfully cached analysis for key: {cache_key} with {self.expiry_days} days expiration")
+            async with self.redis.pipeline(transaction=False) as pipeline:
+                for legacy_key in legacy_keys:
+                    pipeline.get(legacy_key)
+                    pipeline.pttl(legacy_key)
+                replies = await pipeline.execute()
         except Exception as e:
-            logger.error(f"Error storing in cache for key {cache_key}: {str(e)}", exc_info=True)
-            raise 
\ No newline at end of file
+            logger.error(f"Error retrieving legacy cache entries: {str(e)}", exc_info=True)
+            return [None] * len(descriptions)
+
+        results: List[Optional[dict]] = []
+        found: Dict[str, Tuple[str, dict, int]] = {}
+        for description, legacy_key, value, ttl in zip(descriptions, legacy_keys, replies[::2], replies[1::2]):
+            analysis = self._decode(legacy_key, value)
+            results.append(analysis)
+            if analysis is not None:
+                found[description] = (legacy_key, analysis, ttl)
+        await self._migrate_legacy(found)
+        return results
+
+    async def _migrate_legacy(self, found: Dict[str, Tuple[str, dict, int]]) -> None:
+        """Re-key URL-keyed analyses by content in the compact format and drop the old keys."""
+        if not found:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipeline:
+                for description, (legacy_key, analysis, ttl) in found.items():
+                    # PTTL is in milliseconds, and negative when the key has no expiry
+                    expiry = max(ttl // 1000, 1) if ttl > 0 else self.expiry
+                    self._queue_analysis(pipeline, description, analysis, expiry)
+                    pipeline.delete(legacy_key)
+                await pipeline.execute()
+            logger.info(f"Migrated {len(found)} legacy URL-keyed cache entries")
+        except Exception as e:
+            logger.error(f"Error migrating legacy cache entries: {str(e)}", exc_info=True)
+
+    @staticmethod
+    def validation_key(
+        description: str,
+        experience_years: Optional[int] = None,
+        required_skills: Optional[List[str]] = None
+    ) -> str:
+        """Key a validation verdict on the description and the user profile it was checked against."""
+        description_hash = content_hash(description)
+        skills = sorted({skill.strip().lower() for skill in required_skills or [] if skill.strip()})
+        profile_hash = hashlib.sha256(json.dumps([experience_years, skills]).encode()).hexdigest()[:16]
+        return f"job_validation:{description_hash}:{profile_hash}"
+
+    async def get_validations(
+        self,
+        descriptions: List[str],
+        experience_years: Optional[int] = None,
+        required_skills: Optional[List[str]] = None
+    ) -> List[Optional[bool]]:
+        """
+        Retrieve validation verdicts for several descriptions in one MGET.
+        Returns a list aligned with descriptions, with None for each miss.
+        """
+        if not descriptions:
+            return []
+
+        cache_keys = [self.validation_key(d, experience_years, required_skills) for d in descriptions]
+        results: List[Optional[bool]] = [self.local.get(key) for key in cache_keys]
+        l1_hits = sum(1 for result in results if result is not None)
+
+        remote = [i for i, result in enumerate(results) if result is None]
+        hits = 0
+        if remote:
+            try:
+                cached_values = await self.redis.mget([cache_keys[i] for i in remote])
+            except Exception as e:
+                logger.error(f"Error retrieving validations from cache: {str(e)}", exc_info=True)
+                return results
+
+            for i, value in zip(remote, cached_values):
+                if value is not None:
+                    results[i] = value == b"1"
+                    self.local.set(cache_keys[i], results[i])
+                    hits += 1
+
+        misses = len(descriptions) - l1_hits - hits
+        logger.debug(f"Validation cache lookup: {l1_hits} L1 hits, {hits} hits, {misses} misses")
+        await self._record_stats(validation_l1_hits=l1_hits, validation_hits=hits, validation_misses=misses)
+        return results
+
+    async def get_validation(
+        self,
+        description: str,
+        experience_years: Optional[int] = None,
+        required_skills: Optional[List[str]] = None
+    ) -> Optional[bool]:
+        """Retrieve a single validation verdict, or None if not cached."""
+        return (await self.get_validations([description], experience_years, required_skills))[0]
+
+    async def set_validations(
+        self,
+        verdicts: Dict[str, bool],
+        experience_years: Optional[int] = None,
+        required_skills: Optional[List[str]] = None
+    ) -> None:
+        """Store validation verdicts keyed by description, with their own expiration."""
+        if not verdicts:
+            return
+
+        cache_keys = []
+        try:
+            async with self.redis.pipeline(transaction=False) as pipeline:
+                for description, is_valid in verdicts.items():
+                    cache_key = self.validation_key(description, experience_years, required_skills)
+                    cache_keys.append(cache_key)
+                    self.local.set(cache_key, is_valid)
+                    pipeline.setex(cache_key, settings.VALIDATION_CACHE_EXPIRATION, b"1" if is_valid else b"0")
+                self._publish_invalidation(pipeline, cache_keys)
+                await pipeline.execute()
+            logger.debug(f"Cached {len(verdicts)} validation verdicts")
+        except Exception as e:
+            logger.error(f"Error storing validations in cache: {str(e)}", exc_info=True)
+
+    async def set_validation(
+        self,
+        description: str,
+        is_valid: bool,
+        experience_years: Optional[int] = None,
+        required_skills: Optional[List[str]] = None
+    ) -> None:
+        """Store a single validation verdict."""
+        await self.set_validations({description: is_valid}, experience_years, required_skills)
@@ -0,0 +1,104 @@
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import time
+import zlib
+from app.cache.connection import get_sync_redis
+from app.config import get_settings
+from app.services.job_frames import dumps_json
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+class ScrapeResultCache:
+    """
+    Cache of scrape results keyed on normalized search parameters.
+    Values are zlib-compressed JSON. Runs on the blocking Redis client, so it
+    must only be used from scrape worker threads.
+    """
+
+    def __init__(self):
+        logger.info("Initializing ScrapeResultCache...")
+        self.redis = get_sync_redis()
+        logger.info("ScrapeResultCache initialized successfully")
+
+    @staticmethod
+    def make_key(resolved: Dict) -> str:
+        """Build a cache key from resolved scrape parameters, ignoring case, padding and site order."""
+        normalized = {
+            "search_term": resolved['search_term'].strip().lower(),
+            "location": resolved['location'].strip().lower(),
+            "site_name": sorted(site.strip().lower() for site in resolved['site_name']),
+            "hours_old": resolved['hours_old'],
+            "country_indeed": resolved['country_indeed'].strip().lower(),
+        }
+        digest = hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+        return f"job_scrape:{digest}"
+
+    @staticmethod
+    def ttl_for(hours_old: int) -> int:
+        """A wider posting window tolerates older results, up to CACHE_EXPIRATION."""
+        ttl = int(hours_old * 3600 * settings.SCRAPE_CACHE_TTL_RATIO)
+        return max(settings.SCRAPE_CACHE_MIN_TTL, min(ttl, settings.CACHE_EXPIRATION))
+
+    def get_results(self, resolved: Dict) -> Optional[Tuple[List[Dict], bool]]:
+        """
+        Return (jobs, needs_refresh) for a usable entry, or None on a miss.
+        An entry is only usable if it was scraped for at least as many results
+        as requested; needs_refresh is set once it is past the refresh point.
+        """
+        cache_key = self.make_key(resolved)
+        logger.debug(f"Attempting to retrieve cache entry for key: {cache_key}")
+
+        try:
+            cached_data = self.redis.get(cache_key)
+            if not cached_data:
+                logger.debug(f"Cache miss for key: {cache_key}")
+                return None
+            entry = json.loads(zlib.decompress(cached_data))
+        except Exception as e:
+            logger.error(f"Error retrieving from cache for key {cache_key}: {str(e)}", exc_info=True)
+            return None
+
+        if entry["results_wanted"] < resolved['results_wanted']:
+            logger.debug(f"Cache entry for key {cache_key} has too few results")
+            return None
+
+        age = time.time() - entry["scraped_at"]
+        needs_refresh = age > self.ttl_for(resolved['hours_old']) * settings.SCRAPE_CACHE_REFRESH_AFTER
+        logger.debug(f"Cache hit for key: {cache_key} (age {age:.0f}s, refresh: {needs_refresh})")
+        return entry["jobs"], needs_refresh
+
+    def set_results(self, resolved: Dict, jobs: List[Dict]) -> None:
+        """Store scrape results compressed, with a TTL derived from hours_old."""
+        cache_key = self.make_key(resolved)
+        ttl = self.ttl_for(resolved['hours_old'])
+        entry = {
+            "scraped_at": time.time(),
+            "results_wanted": resolved['results_wanted'],
+            "jobs": jobs,
+        }
+
+        try:
+            payload = zlib.compress(dumps_json(entry))
+            self.redis.setex(cache_key, ttl, payload)
+            logger.debug(f"Cached {len(jobs)} jobs for key: {cache_key} ({len(payload)} bytes, {ttl}s expiration)")
+        except Exception as e:
+            logger.error(f"Error storing in cache for key {cache_key}: {str(e)}", exc_info=True)
+
+    def acquire_refresh_lock(self, resolved: Dict) -> bool:
+        """Claim the background refresh of an entry so only one worker re-scrapes it."""
+        lock_key = f"{self.make_key(resolved)}:refreshing"
+        try:
+            return bool(self.redis.set(lock_key, 1, nx=True, ex=self.ttl_for(resolved['hours_old'])))
+        except Exception as e:
+            logger.error(f"Error acquiring refresh lock {lock_key}: {str(e)}")
+            return False
+
+    def release_refresh_lock(self, resolved: Dict) -> None:
+        lock_key = f"{self.make_key(resolved)}:refreshing"
+        try:
+            self.redis.delete(lock_key)
+        except Exception as e:
+            logger.error(f"Error releasing refresh lock {lock_key}: {str(e)}")
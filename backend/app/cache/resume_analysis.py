@@ -0,0 +1,89 @@
+from typing import Dict, Optional
+import hashlib
+import json
+import zlib
+from app.cache.connection import get_redis
+from app.cache.local import LocalCache
+from app.config import get_settings
+from app.llm.prompts import get_resume_analysis_prompt
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+def file_hash(file_content: bytes) -> str:
+    """SHA-256 of the uploaded bytes, so re-uploads of the same file share entries."""
+    return hashlib.sha256(file_content).hexdigest()
+
+def prompt_version() -> str:
+    """Fingerprint of the resume prompt and models; changing any of them invalidates cached parameters."""
+    models = {"ollama": settings.OLLAMA_MODEL, "gemini": settings.GEMINI_MODEL}
+    provider = settings.LLM_PROVIDER.lower()
+    # A composite client can route to any of its providers, so all of their models count
+    providers = [name.lower() for name in settings.LLM_COMPOSITE_PROVIDERS] if provider == "composite" else [provider]
+    routes = ",".join(f"{name}={models.get(name)}" for name in providers)
+    fingerprint = f"{provider}:{routes}:{get_resume_analysis_prompt('')}"
+    return hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+
+class ResumeAnalysisCache:
+    """
+    Two-stage cache for resume uploads, keyed by the SHA-256 of the file.
+    Extracted text and the parsed search parameters are stored separately
+    with their own TTLs: text depends only on the file and the extraction
+    limits, while parameters are also keyed on the prompt version, so a
+    prompt change re-runs the LLM without re-extracting. A small in-process
+    LRU sits in front of Redis, and Redis errors degrade to misses.
+    """
+
+    def __init__(self):
+        logger.info("Initializing ResumeAnalysisCache...")
+        self.redis = get_redis()
+        self.local = LocalCache(settings.RESUME_CACHE_L1_MAX_ENTRIES, settings.L1_CACHE_TTL)
+        logger.info("ResumeAnalysisCache initialized successfully")
+
+    @staticmethod
+    def text_key(digest: str) -> str:
+        return f"resume_text:{digest}:{settings.RESUME_MAX_PAGES}:{settings.RESUME_MAX_CHARS}"
+
+    @staticmethod
+    def params_key(digest: str) -> str:
+        return f"resume_params:{digest}:{prompt_version()}"
+
+    async def get_text(self, digest: str) -> Optional[str]:
+        """Extracted resume text, or None on a miss."""
+        value = await self._get(self.text_key(digest))
+        return zlib.decompress(value).decode() if value is not None else None
+
+    async def set_text(self, digest: str, text: str) -> None:
+        await self._set(self.text_key(digest), zlib.compress(text.encode()), settings.RESUME_TEXT_CACHE_EXPIRATION)
+
+    async def get_params(self, digest: str) -> Optional[Dict]:
+        """Parsed search parameters, or None on a miss."""
+        value = await self._get(self.params_key(digest))
+        return json.loads(value) if value is not None else None
+
+    async def set_params(self, digest: str, params: Dict) -> None:
+        await self._set(self.params_key(digest), json.dumps(params).encode(), settings.RESUME_PARAMS_CACHE_EXPIRATION)
+
+    async def _get(self, cache_key: str) -> Optional[bytes]:
+        value = self.local.get(cache_key)
+        if value is not None:
+            logger.debug(f"L1 cache hit for key: {cache_key}")
+            return value
+        try:
+            value = await self.redis.get(cache_key)
+        except Exception as e:
+            logger.error(f"Error retrieving from cache for key {cache_key}: {str(e)}", exc_info=True)
+            return None
+        if value is None:
+            logger.debug(f"Cache miss for key: {cache_key}")
+            return None
+        self.local.set(cache_key, value)
+        return value
+
+    async def _set(self, cache_key: str, value: bytes, expiry: int) -> None:
+        self.local.set(cache_key, value)
+        try:
+            await self.redis.setex(cache_key, expiry, value)
+        except Exception as e:
+            logger.error(f"Error storing in cache for key {cache_key}: {str(e)}", exc_info=True)
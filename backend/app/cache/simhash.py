@@ -0,0 +1,45 @@
+from typing import List
+import hashlib
+import re
+import numpy as np
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4  # Any two signatures within 3 bits share at least one band
+SHINGLE_SIZE = 3
+
+_WORD_RE = re.compile(r"\w+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """Lower-case and collapse whitespace so formatting-only changes hash identically."""
+    return _WHITESPACE_RE.sub(" ", text).strip().lower()
+
+def content_hash(text: str) -> str:
+    """SHA-256 of the normalized text, used as the content address of a posting."""
+    return hashlib.sha256(normalize_text(text).encode()).hexdigest()
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over word shingles; near-identical texts differ in few bits."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+
+    values = np.array(
+        [hashlib.blake2b(shingle.encode(), digest_size=8).digest() for shingle in shingles],
+        dtype="S8"
+    )
+    # One row of 64 bits per shingle, most significant bit first
+    bits = np.unpackbits(values.view(np.uint8)).reshape(-1, SIMHASH_BITS)
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return int("".join("1" if bit else "0" for bit in majority), 2)
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def bands(signature: int) -> List[int]:
+    """Split a signature into SIMHASH_BANDS equal chunks for bucketed lookup."""
+    width = SIMHASH_BITS // SIMHASH_BANDS
+    mask = (1 << width) - 1
+    return [signature >> (i * width) & mask for i in range(SIMHASH_BANDS)]
@@ -15,12 +15,61 @@ class Settings(BaseSettings):
     DEFAULT_HOURS_OLD: int = 72
     DEFAULT_SITE_NAME: List[str] = ["linkedin"]
 
+    # Scrape Worker Pool Configuration
+    SCRAPE_MAX_CONCURRENCY: int = 2  # Scrapes running at once per worker process
+    SCRAPE_MAX_QUEUED: int = 20  # Scrapes allowed to wait for a free slot
+    SCRAPE_JOB_TTL: int = 900  # Seconds a finished scrape job stays pollable
+
     # LLM Provider Configuration
-    LLM_PROVIDER: str = "gemini"  # can be "ollama" or "gemini"
+    LLM_PROVIDER: str = "gemini"  # can be "ollama", "gemini" or "composite"
+    LLM_COMPOSITE_PROVIDERS: List[str] = ["ollama", "gemini"]  # Preference order for "composite"
+
+    # Composite Provider Failover and Hedging
+    LLM_HEDGING: bool = True  # Send a copy of slow calls to the next provider
+    LLM_HEDGE_PERCENTILE: float = 0.95  # Hedge once a call is slower than this share of recent calls
+    LLM_HEDGE_DEFAULT_DELAY: float = 20.0  # Seconds before hedging while latency history is short
+    LLM_HEALTH_WINDOW: int = 50  # Recent calls per provider used for health and latency stats
+    LLM_HEALTH_MIN_SAMPLES: int = 10  # Calls needed before a provider can be judged
+    LLM_FAILOVER_ERROR_RATE: float = 0.5  # Error rate above which a provider is routed around
+    LLM_FAILOVER_MAX_LATENCY: float = 60.0  # Median seconds above which a provider is routed around
+    LLM_FAILOVER_COOLDOWN: float = 30.0  # Seconds an unhealthy provider is skipped
+    LLM_RECENT_REQUESTS: int = 100  # Per-request provider records kept for /api/v1/llm/stats
     
     # Ollama Configuration
     OLLAMA_API_URL: str = "http://localhost:11434"
     OLLAMA_MODEL: str = "mistral"
+    OLLAMA_KEEP_ALIVE: str = "30m"  # Keep the model loaded between bursts of requests
+    OLLAMA_NUM_CTX: int = 8192  # Context window; large enough for packed prompts
+
+    # Structured Output Configuration
+    LLM_STRUCTURED_OUTPUT: bool = True  # Send JSON schemas (Gemini response_schema, Ollama format)
+    LLM_PARSE_RETRIES: int = 1  # Extra attempts when a reply cannot be parsed
+
+    # LLM Transport Configuration (Ollama HTTP client)
+    OLLAMA_MAX_CONNECTIONS: int = 20  # Connection pool size
+    OLLAMA_MAX_KEEPALIVE_CONNECTIONS: int = 10  # Idle connections kept open for reuse
+    OLLAMA_KEEPALIVE_EXPIRY: float = 30.0  # Seconds an idle connection is kept
+    OLLAMA_CONNECT_TIMEOUT: float = 5.0  # Seconds to establish a connection
+    OLLAMA_READ_TIMEOUT: float = 180.0  # Seconds between bytes; long generations need headroom
+    OLLAMA_WRITE_TIMEOUT: float = 10.0
+    OLLAMA_POOL_TIMEOUT: float = 10.0  # Seconds to wait for a free pooled connection
+    LLM_RETRY_MAX_TRIES: int = 3  # Attempts per request, including the first
+    LLM_RETRY_MAX_TIME: float = 60.0  # Seconds after which a request is no longer retried
+    LLM_RETRY_BUDGET_RATIO: float = 0.2  # Retries allowed per request, averaged over time
+    LLM_RETRY_BUDGET_MAX: float = 10.0  # Retry tokens that can be saved up
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive failures before failing fast
+    LLM_CIRCUIT_RESET_TIMEOUT: float = 30.0  # Seconds to fail fast before probing again
+
+    # LLM Scheduler Configuration (shared by all services, per provider)
+    OLLAMA_MAX_PARALLEL: int = 4  # Upper bound for the adaptive limit; match OLLAMA_NUM_PARALLEL
+    GEMINI_MAX_PARALLEL: int = 32
+    LLM_SCHEDULER_INITIAL_LIMIT: int = 4
+    LLM_SCHEDULER_MIN_LIMIT: int = 1
+    LLM_SCHEDULER_LATENCY_TARGET: float = 60.0  # Seconds; slower calls count as congestion
+    LLM_SCHEDULER_BACKOFF_RATIO: float = 0.5  # Multiplier applied to the limit on congestion
+    LLM_SCHEDULER_MAX_QUEUED: int = 200  # Calls allowed to wait; interactive calls may use all of it
+    LLM_SCHEDULER_VALIDATION_QUEUE_SHARE: float = 0.75  # Share of the queue validation calls may fill
+    LLM_SCHEDULER_BULK_QUEUE_SHARE: float = 0.5  # Share of the queue bulk analysis may fill
     
     # Gemini Configuration
     GEMINI_API_KEY: str = ""  # Will be set from environment
@@ -28,9 +77,120 @@ class Settings(BaseSettings):
     
     # Redis Configuration
     REDIS_URL: str = "redis://localhost:6379/0"  # Default local Redis URL
+    REDIS_MAX_CONNECTIONS: int = 50  # Shared async connection pool size
+    REDIS_SOCKET_TIMEOUT: float = 0.5  # Seconds before a slow command counts as a miss
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 0.5  # Seconds before an unreachable Redis counts as a miss
     
     # Cache Configuration
     CACHE_EXPIRATION: int = 86400  # 24 hours in seconds
+    ANALYSIS_CACHE_EXPIRATION: int = 604800  # 7 days in seconds
+    ANALYSIS_SCHEMA_VERSION: int = 1  # Bump when prompts or analysis fields change to invalidate old entries
+    LEGACY_URL_KEY_FALLBACK: bool = True  # Move URL-keyed analyses to content keys on read; off once they have expired
+    CACHE_COMPRESSION: str = "zlib"  # can be "zlib", "zstd" (needs zstandard) or "none"
+    CACHE_COMPRESSION_MIN_BYTES: int = 512  # Smaller values are stored uncompressed
+    VALIDATION_CACHE_EXPIRATION: int = 259200  # 3 days; verdicts expire independently of analyses
+    NEAR_DUPLICATE_DETECTION: bool = True  # Reuse analyses of lightly edited reposts
+    NEAR_DUPLICATE_MAX_DISTANCE: int = 3  # Max differing SimHash bits (of 64) to count as a repost
+    NEAR_DUPLICATE_BAND_MAX_MEMBERS: int = 256  # Per SimHash band; the soonest-expiring members are dropped first
+
+    # In-process (L1) Cache Configuration
+    L1_CACHE_MAX_ENTRIES: int = 1000  # Per worker; 0 disables the L1 tier
+    L1_CACHE_TTL: int = 300  # Seconds; bounds staleness if an invalidation is missed
+    L1_CACHE_RECONNECT_DELAY: float = 5.0  # Seconds between invalidation listener reconnects
+
+    # Scrape Output Configuration
+    # Columns returned for each scraped job; the rest are dropped right after scraping.
+    # An empty list keeps every column jobspy returns.
+    SCRAPE_COLUMNS: List[str] = [
+        "id", "site", "job_url", "job_url_direct", "title", "company", "location",
+        "date_posted", "job_type", "interval", "min_amount", "max_amount", "currency",
+        "is_remote", "description", "company_url"
+    ]
+
+    # Job Store Configuration
+    JOB_STORE_ENABLED: bool = True  # Keep every scraped posting in a local SQLite store
+    JOB_STORE_PATH: str = "data/jobs.sqlite3"
+    JOB_STORE_RETENTION_DAYS: int = 30  # Postings not seen for this long are pruned
+    JOB_STORE_MAX_RESULTS: int = 1000  # Upper bound on the limit of a job store search
+    DELTA_SCRAPE_ENABLED: bool = True  # Re-scrapes of a recent query only fetch postings newer than its watermark
+    DELTA_SCRAPE_OVERLAP_HOURS: float = 1.0  # Extra hours re-scraped to catch postings indexed late
+
+    # Search Index Configuration
+    SEARCH_INDEX_ENABLED: bool = True  # Full-text index over stored jobs; needs the job store
+    SEARCH_INDEX_PATH: str = "data/search_index"  # Written as .bin (memory-mapped postings) and .json
+    SEARCH_INDEX_SAVE_EVERY: int = 200  # Save after this many newly indexed jobs
+    SEARCH_INDEX_TITLE_WEIGHT: int = 3  # A title word counts as this many description words
+    SEARCH_BM25_K1: float = 1.2
+    SEARCH_BM25_B: float = 0.75
+
+    # Scrape Result Cache Configuration
+    SCRAPE_CACHE_TTL_RATIO: float = 1 / 60  # Seconds cached per second of hours_old window, capped at CACHE_EXPIRATION
+    SCRAPE_CACHE_MIN_TTL: int = 60  # Floor so very narrow windows are still worth caching
+    SCRAPE_CACHE_REFRESH_AFTER: float = 0.5  # Fraction of TTL after which hits trigger a background refresh
+
+    # Local Job Matcher Configuration
+    MATCHER_ENABLED: bool = True  # Reject clear mismatches without the LLM
+    MATCHER_YEARS_TOLERANCE: int = 2  # Years a posting may exceed the profile before rejecting outright
+    MATCHER_MIN_DESCRIPTION_CHARS: int = 300  # Shorter descriptions are never rejected for missing skills
+
+    # Job Description Pre-processing (applied before prompt construction)
+    PREPROCESS_ENABLED: bool = True
+    PREPROCESS_MAX_TOKENS: int = 1500  # Descriptions are cut to about this many tokens
+    PREPROCESS_BOILERPLATE_PHRASES: List[str] = [
+        "equal opportunity employer",
+        "equal employment opportunity",
+        "without regard to race",
+        "regard to race, color",
+        "reasonable accommodation",
+        "e-verify",
+        "affirmative action",
+        "drug-free workplace",
+        "privacy notice",
+        "privacy policy",
+        "by applying for this",
+        "by submitting your application",
+        "recruitment agencies",
+        "unsolicited resumes",
+    ]  # A sentence containing one is dropped, not its whole paragraph
+    PREPROCESS_BOILERPLATE_HEADINGS: List[str] = [
+        "benefits",
+        "our benefits",
+        "perks",
+        "benefits and perks",
+        "perks and benefits",
+        "what we offer",
+        "equal opportunity",
+        "equal opportunity employer",
+        "eeo",
+        "eeo statement",
+        "privacy notice",
+        "disclaimer",
+        "how to apply",
+    ]  # Matched against the whole heading line, ignoring case and a trailing colon
+    PREPROCESS_REPEAT_THRESHOLD: int = 5  # Different jobs a paragraph must appear in to be learned as boilerplate
+    PREPROCESS_REPEAT_MIN_CHARS: int = 120  # Shorter paragraphs are never learned as boilerplate
+    PREPROCESS_MAX_TRACKED_PARAGRAPHS: int = 50000
+    PREPROCESS_CACHE_MAX_ENTRIES: int = 5000  # Cleaned descriptions kept per worker
+    PREPROCESS_CACHE_TTL: int = 3600
+
+    # Resume Extraction Configuration
+    RESUME_MAX_BYTES: int = 5 * 1024 * 1024  # Larger uploads are rejected
+    RESUME_MAX_PAGES: int = 10  # Later PDF pages are ignored
+    RESUME_MAX_CHARS: int = 20000  # Extraction stops once this much text is collected
+    RESUME_EXTRACTION_WORKERS: int = 2  # Worker processes for PDF/DOCX parsing
+    RESUME_EXTRACTION_TASKS_PER_WORKER: int = 50  # Workers are replaced after this many files
+    RESUME_EXTRACTION_TIMEOUT: float = 15.0  # Seconds before a stuck extraction is killed
+
+    # Resume Cache Configuration
+    RESUME_TEXT_CACHE_EXPIRATION: int = 2592000  # 30 days; extracted text only changes with the file
+    RESUME_PARAMS_CACHE_EXPIRATION: int = 604800  # 7 days; also keyed on the prompt version
+    RESUME_CACHE_L1_MAX_ENTRIES: int = 200  # Per worker; 0 disables the L1 tier
+
+    # Batch Analysis Configuration
+    MAX_BATCH_SIZE: int = 100  # Max jobs accepted by a single batch request
+    LLM_PACKED_ANALYSIS: bool = True  # Analyze several batch misses per LLM request
+    LLM_PACK_TOKEN_BUDGET: int = 6000  # Estimated description tokens per packed request
+    LLM_PACK_MAX_JOBS: int = 8  # Max jobs per packed request
 
     class Config:
         case_sensitive = True
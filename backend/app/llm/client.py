@@ -1,13 +1,16 @@
 import httpx
 import json
-from typing import Dict, Optional, List
+from typing import AsyncIterator, Dict, Optional, List
 from app.config import get_settings
 import logging
 import backoff
-from .prompts import get_system_prompt, get_analysis_prompt, get_validation_prompt
+from .prompts import ANALYSIS_JSON_SCHEMA, get_system_prompt, get_analysis_prompt, get_validation_prompt
 from .parser import ResponseParser
 import google.generativeai as genai
 from .interfaces import LLMClient
+from .composite import CompositeLLMClient
+from .resilience import CircuitBreaker, RetryBudget, is_retryable
+from .scheduler import get_scheduler
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -16,31 +19,216 @@ class OllamaClient(LLMClient):
     def __init__(self):
         self.api_url = settings.OLLAMA_API_URL
         self.model = settings.OLLAMA_MODEL
-        self.client = httpx.AsyncClient()
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.OLLAMA_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(
+                connect=settings.OLLAMA_CONNECT_TIMEOUT,
+                read=settings.OLLAMA_READ_TIMEOUT,
+                write=settings.OLLAMA_WRITE_TIMEOUT,
+                pool=settings.OLLAMA_POOL_TIMEOUT
+            )
+        )
+        self.retry_budget = RetryBudget(settings.LLM_RETRY_BUDGET_RATIO, settings.LLM_RETRY_BUDGET_MAX)
+        self.breaker = CircuitBreaker(
+            "ollama",
+            failure_threshold=settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.LLM_CIRCUIT_RESET_TIMEOUT
+        )
+        self.scheduler = get_scheduler("ollama", settings.OLLAMA_MAX_PARALLEL)
+        self.requests = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        # Jittered exponential backoff, only for overload/transport errors and while budget remains
+        retry = backoff.on_exception(
+            backoff.expo,
+            httpx.HTTPError,
+            max_tries=settings.LLM_RETRY_MAX_TRIES,
+            max_time=settings.LLM_RETRY_MAX_TIME,
+            jitter=backoff.full_jitter,
+            giveup=lambda e: not is_retryable(e) or not self.retry_budget.can_retry(),
+            on_backoff=lambda details: self.retry_budget.spend()
+        )
+        self.post_with_retry = retry(self._post)
+        self.open_stream_with_retry = retry(self._open_stream)
+
+    def stats(self) -> Dict:
+        """Pool usage, retry and circuit breaker metrics."""
+        return {
+            "provider": "ollama",
+            "requests": self.requests,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "max_connections": settings.OLLAMA_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+            **self.retry_budget.stats(),
+            **self.breaker.stats(),
+            "scheduler": self.scheduler.stats()
+        }
+
+    def _payload(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        temperature: float,
+        stream: bool,
+        json_schema: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Request body; keep_alive and num_ctx keep the model and its prompt
+        prefix cache warm. Output is only constrained when a json_schema is
+        given, so free-form prompts such as validation are not forced into JSON.
+        """
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "system": system_prompt,
+            "stream": stream,
+            "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+            "options": {
+                "temperature": temperature,
+                "num_ctx": settings.OLLAMA_NUM_CTX
+            }
+        }
+        if json_schema:
+            payload["format"] = json_schema
+        return payload
+
+    async def _post(self, payload: Dict) -> httpx.Response:
+        """One attempt at a generate call, guarded by the circuit breaker."""
+        self.breaker.before_call()
+        self._start_request()
+        try:
+            response = await self.client.post(f"{self.api_url}/api/generate", json=payload)
+            response.raise_for_status()
+        except Exception as e:
+            self._record_error(e)
+            raise
+        except BaseException:
+            self.breaker.abandon()
+            raise
+        finally:
+            self.in_flight -= 1
+        self.breaker.record_success()
+        return response
+
+    async def _open_stream(self, payload: Dict) -> httpx.Response:
+        """
+        One attempt at opening a streamed generate call, guarded by the
+        circuit breaker. Returns once the status line is in, before any of
+        the body has been read; the caller closes the response.
+        """
+        self.breaker.before_call()
+        self._start_request()
+        try:
+            request = self.client.build_request("POST", f"{self.api_url}/api/generate", json=payload)
+            response = await self.client.send(request, stream=True)
+            try:
+                response.raise_for_status()
+            except BaseException:
+                await response.aclose()
+                raise
+        except Exception as e:
+            self.in_flight -= 1
+            self._record_error(e)
+            raise
+        except BaseException:
+            self.in_flight -= 1
+            self.breaker.abandon()
+            raise
+        self.breaker.record_success()
+        return response
+
+    def _start_request(self) -> None:
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _record_error(self, error: Exception) -> None:
+        self.failures += 1
+        # Only overload and transport errors say the backend is unhealthy
+        if is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
 
     async def generate(
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        json_schema: Optional[Dict] = None
     ) -> str:
         """Generate a response using Ollama."""
         try:
-            response = await self.client.post(
-                f"{self.api_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "system": system_prompt,
-                    "temperature": temperature
-                }
-            )
-            response.raise_for_status()
+            async with self.scheduler.slot():
+                self.retry_budget.deposit()
+                response = await self.post_with_retry(
+                    self._payload(prompt, system_prompt, temperature, stream=False, json_schema=json_schema)
+                )
             return response.json()["response"]
         except Exception as e:
             logger.error(f"Error generating response with Ollama: {str(e)}")
             raise
 
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        json_schema: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response from Ollama. Closing the stream closes the connection,
+        which stops generation. Opening the stream is retried with backoff like
+        generate; once the first byte has arrived it is not, since chunks may
+        already have been consumed.
+        """
+        async with self.scheduler.slot():
+            stream = self._stream(prompt, system_prompt, temperature, json_schema)
+            try:
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                await stream.aclose()
+
+    async def _stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        temperature: float,
+        json_schema: Optional[Dict]
+    ) -> AsyncIterator[str]:
+        self.retry_budget.deposit()
+        try:
+            response = await self.open_stream_with_retry(
+                self._payload(prompt, system_prompt, temperature, stream=True, json_schema=json_schema)
+            )
+        except Exception as e:
+            logger.error(f"Error opening response stream with Ollama: {str(e)}")
+            raise
+        try:
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    break
+        except Exception as e:
+            self._record_error(e)
+            logger.error(f"Error streaming response with Ollama: {str(e)}")
+            raise
+        finally:
+            await response.aclose()
+            self.in_flight -= 1
+
     async def analyze_job(
         self,
         job_description: str,
@@ -61,15 +249,16 @@ class OllamaClient(LLMClient):
                 required_skills=required_skills
             )
             
-            # Generate response with lower temperature for more focused output
-            response = await self.generate(
+            # Generate response with lower temperature for more focused output;
+            # an unparsable reply is retried once before giving up
+            parsed_response = await self.generate_json(
                 prompt=analysis_prompt,
                 system_prompt=system_prompt,
-                temperature=0.3
+                temperature=0.3,
+                json_schema=ANALYSIS_JSON_SCHEMA
             )
             
-            # Parse and validate response
-            parsed_response = ResponseParser.parse_json_response(response)
+            # Validate response
             validated_response = ResponseParser.validate_analysis_response(parsed_response)
             
             return validated_response
@@ -82,7 +271,8 @@ class OllamaClient(LLMClient):
                 "key_skills": [],
                 "required_experience": "Error during analysis",
                 "company_culture": "Error during analysis",
-                "estimated_salary_range": "Error during analysis"
+                "estimated_salary_range": "Error during analysis",
+                "error": str(e)
             }
 
     async def validate_job(
@@ -100,9 +290,11 @@ class OllamaClient(LLMClient):
                 required_skills=required_skills
             )
             
-            # Generate response with very low temperature for consistent validation
-            response = await self.generate(
+            # Generate response with very low temperature for consistent validation,
+            # stopping as soon as the model has committed to a verdict
+            response = await self.generate_until(
                 prompt=validation_prompt,
+                stop=lambda text: ResponseParser.early_validation_verdict(text) is not None,
                 system_prompt=system_prompt,
                 temperature=0.1
             )
@@ -112,34 +304,73 @@ class OllamaClient(LLMClient):
             
         except Exception as e:
             logger.error(f"Error validating job: {str(e)}")
-            return False
+            raise
 
 class GeminiClient(LLMClient):
     def __init__(self):
         genai.configure(api_key=settings.GEMINI_API_KEY)
         self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
+        self.scheduler = get_scheduler("gemini", settings.GEMINI_MAX_PARALLEL)
+
+    def stats(self) -> Dict:
+        return {"provider": "gemini", "scheduler": self.scheduler.stats()}
+
+    @staticmethod
+    def _generation_config(temperature: float, json_schema: Optional[Dict]) -> "genai.types.GenerationConfig":
+        """Generation settings; a json_schema switches on Gemini's structured JSON output."""
+        if json_schema:
+            return genai.types.GenerationConfig(
+                temperature=temperature,
+                response_mime_type="application/json",
+                response_schema=json_schema
+            )
+        return genai.types.GenerationConfig(temperature=temperature)
 
     async def generate(
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        json_schema: Optional[Dict] = None
     ) -> str:
         """Generate a response using Gemini."""
         try:
             full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
             
-            response = await self.model.generate_content_async(
-                full_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=temperature
+            async with self.scheduler.slot():
+                response = await self.model.generate_content_async(
+                    full_prompt,
+                    generation_config=self._generation_config(temperature, json_schema)
                 )
-            )
             return response.text
         except Exception as e:
             logger.error(f"Error generating response with Gemini: {str(e)}")
             raise
 
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        json_schema: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """Stream a response from Gemini chunk by chunk."""
+        try:
+            full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
+
+            async with self.scheduler.slot():
+                response = await self.model.generate_content_async(
+                    full_prompt,
+                    generation_config=self._generation_config(temperature, json_schema),
+                    stream=True
+                )
+                async for chunk in response:
+                    if chunk.text:
+                        yield chunk.text
+        except Exception as e:
+            logger.error(f"Error streaming response with Gemini: {str(e)}")
+            raise
+
     async def analyze_job(
         self,
         job_description: str,
@@ -159,13 +390,13 @@ class GeminiClient(LLMClient):
                 required_skills=required_skills
             )
             
-            response = await self.generate(
+            parsed_response = await self.generate_json(
                 prompt=analysis_prompt,
                 system_prompt=system_prompt,
-                temperature=0.3
+                temperature=0.3,
+                json_schema=ANALYSIS_JSON_SCHEMA
             )
             
-            parsed_response = ResponseParser.parse_json_response(response)
             validated_response = ResponseParser.validate_analysis_response(parsed_response)
             
             return validated_response
@@ -178,7 +409,8 @@ class GeminiClient(LLMClient):
                 "key_skills": [],
                 "required_experience": "Error during analysis",
                 "company_culture": "Error during analysis",
-                "estimated_salary_range": "Error during analysis"
+                "estimated_salary_range": "Error during analysis",
+                "error": str(e)
             }
 
     async def validate_job(
@@ -196,8 +428,9 @@ class GeminiClient(LLMClient):
                 required_skills=required_skills
             )
             
-            response = await self.generate(
+            response = await self.generate_until(
                 prompt=validation_prompt,
+                stop=lambda text: ResponseParser.early_validation_verdict(text) is not None,
                 system_prompt=system_prompt,
                 temperature=0.1
             )
@@ -206,13 +439,37 @@ class GeminiClient(LLMClient):
             
         except Exception as e:
             logger.error(f"Error validating job with Gemini: {str(e)}")
-            return False
+            raise
+
+PROVIDERS = {
+    "ollama": OllamaClient,
+    "gemini": GeminiClient,
+}
+
+_client = None
 
 def get_llm_client() -> LLMClient:
-    """Get the appropriate LLM client based on configuration."""
-    if settings.LLM_PROVIDER.lower() == "ollama":
-        return OllamaClient()
-    elif settings.LLM_PROVIDER.lower() == "gemini":
-        return GeminiClient()
+    """
+    Process-wide LLM client for the configured provider, so every service
+    shares one connection pool, circuit breaker, retry budget and stats.
+    """
+    global _client
+    if _client is None:
+        _client = create_llm_client()
+    return _client
+
+def create_llm_client() -> LLMClient:
+    """Build a new LLM client based on configuration."""
+    provider = settings.LLM_PROVIDER.lower()
+    if provider == "composite":
+        unknown = [name for name in settings.LLM_COMPOSITE_PROVIDERS if name.lower() not in PROVIDERS]
+        if unknown:
+            raise ValueError(f"Unsupported LLM providers in LLM_COMPOSITE_PROVIDERS: {unknown}")
+        return CompositeLLMClient({
+            name.lower(): PROVIDERS[name.lower()]()
+            for name in settings.LLM_COMPOSITE_PROVIDERS
+        })
+    elif provider in PROVIDERS:
+        return PROVIDERS[provider]()
     else:
         raise ValueError(f"Unsupported LLM provider: {settings.LLM_PROVIDER}") 
\ No newline at end of file
@@ -0,0 +1,289 @@
+from typing import AsyncIterator, Dict, List, Optional
+from collections import Counter, deque
+import asyncio
+import time
+from app.config import get_settings
+from .interfaces import LLMClient
+from .parser import ResponseParser
+from .prompts import ANALYSIS_JSON_SCHEMA, get_system_prompt, get_analysis_prompt, get_validation_prompt
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+class BackendHealth:
+    """Rolling window of one backend's recent call outcomes and latencies."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.outcomes = deque(maxlen=settings.LLM_HEALTH_WINDOW)  # (latency, ok)
+        self.unhealthy_until = 0.0
+        self.trips = 0
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.outcomes.append((latency, ok))
+        if self._over_thresholds():
+            logger.warning(f"LLM backend {self.name} unhealthy (error rate {self.error_rate():.0%}); "
+                           f"routing around it for {settings.LLM_FAILOVER_COOLDOWN:.0f}s")
+            self.unhealthy_until = time.monotonic() + settings.LLM_FAILOVER_COOLDOWN
+            self.trips += 1
+            # Start afresh so the backend is judged on the calls after its cooldown
+            self.outcomes.clear()
+
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for _, ok in self.outcomes if not ok) / len(self.outcomes)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        latencies = sorted(latency for latency, ok in self.outcomes if ok)
+        if len(latencies) < settings.LLM_HEALTH_MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(percentile * len(latencies)))]
+
+    def _over_thresholds(self) -> bool:
+        if len(self.outcomes) < settings.LLM_HEALTH_MIN_SAMPLES:
+            return False
+        median = self.latency_percentile(0.5)
+        return (self.error_rate() > settings.LLM_FAILOVER_ERROR_RATE
+                or (median is not None and median > settings.LLM_FAILOVER_MAX_LATENCY))
+
+    def stats(self) -> Dict:
+        return {
+            "healthy": self.healthy(),
+            "times_unhealthy": self.trips,
+            "samples": len(self.outcomes),
+            "error_rate": self.error_rate(),
+            "p50_latency": self.latency_percentile(0.5),
+            "hedge_latency": self.latency_percentile(settings.LLM_HEDGE_PERCENTILE),
+        }
+
+class CompositeLLMClient(LLMClient):
+    """
+    Spreads calls over several providers in preference order. Unhealthy
+    backends (error rate or median latency over the failover thresholds)
+    are skipped for LLM_FAILOVER_COOLDOWN seconds, a failed call fails over
+    to the next backend, and a call slower than the primary's
+    LLM_HEDGE_PERCENTILE latency gets a hedged copy on the next backend;
+    whichever answers first wins and the other is cancelled.
+    """
+
+    def __init__(self, backends: Dict[str, LLMClient]):
+        if not backends:
+            raise ValueError("CompositeLLMClient needs at least one backend")
+        self.backends = backends
+        self.health = {name: BackendHealth(name) for name in backends}
+        self.counts = Counter()
+        self.provider_counts = Counter()
+        # Per-request record of which provider answered and whether a hedge won
+        self.recent = deque(maxlen=settings.LLM_RECENT_REQUESTS)
+
+    def stats(self) -> Dict:
+        return {
+            "provider": "composite",
+            "requests": self.counts["requests"],
+            "hedged": self.counts["hedged"],
+            "hedge_wins": self.counts["hedge_wins"],
+            "failovers": self.counts["failovers"],
+            "providers": dict(self.provider_counts),
+            "backends": {
+                name: {**self.health[name].stats(), **backend.stats()}
+                for name, backend in self.backends.items()
+            },
+            "recent": list(self.recent),
+        }
+
+    def _ordered_backends(self) -> List[str]:
+        """Healthy backends in preference order, then unhealthy ones as a last resort."""
+        names = list(self.backends)
+        return [name for name in names if self.health[name].healthy()] + \
+            [name for name in names if not self.health[name].healthy()]
+
+    async def _call(self, name: str, prompt: str, system_prompt: Optional[str],
+                    temperature: float, json_schema: Optional[Dict]) -> str:
+        started = time.monotonic()
+        try:
+            response = await self.backends[name].generate(
+                prompt,
+                system_prompt=system_prompt,
+                temperature=temperature,
+                json_schema=json_schema
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.health[name].record(time.monotonic() - started, ok=False)
+            raise
+        self.health[name].record(time.monotonic() - started, ok=True)
+        return response
+
+    async def generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        json_schema: Optional[Dict] = None
+    ) -> str:
+        """Generate with failover, hedging slow calls onto the next backend."""
+        self.counts["requests"] += 1
+        started = time.monotonic()
+        order = self._ordered_backends()
+        tasks: Dict[asyncio.Task, str] = {}
+        errors = []
+        hedged = False
+
+        def launch(name: str) -> None:
+            task = asyncio.ensure_future(self._call(name, prompt, system_prompt, temperature, json_schema))
+            tasks[task] = name
+
+        launch(order.pop(0))
+        primary = next(iter(tasks.values()))
+        try:
+            while tasks:
+                timeout = None
+                if settings.LLM_HEDGING and order and not hedged:
+                    delay = self.health[primary].latency_percentile(settings.LLM_HEDGE_PERCENTILE)
+                    timeout = max(0.0, (delay or settings.LLM_HEDGE_DEFAULT_DELAY) - (time.monotonic() - started))
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    hedged = True
+                    self.counts["hedged"] += 1
+                    logger.info(f"LLM call on {primary} is slow; hedging on {order[0]}")
+                    launch(order.pop(0))
+                    continue
+
+                for task in done:
+                    name = tasks.pop(task)
+                    if task.exception() is None:
+                        self._record(name, primary, hedged, started, failover=bool(errors))
+                        return task.result()
+                    errors.append(f"{name}: {task.exception()}")
+                    logger.warning(f"LLM backend {name} failed: {task.exception()}")
+
+                if not tasks and order:
+                    self.counts["failovers"] += 1
+                    logger.info(f"Failing over to LLM backend {order[0]}")
+                    launch(order.pop(0))
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        raise RuntimeError(f"All LLM backends failed: {'; '.join(errors)}")
+
+    def _record(self, name: str, primary: str, hedged: bool, started: float, failover: bool) -> None:
+        hedge_won = hedged and name != primary and not failover
+        self.counts["hedge_wins"] += hedge_won
+        self.provider_counts[name] += 1
+        self.recent.append({
+            "provider": name,
+            "hedged": hedged,
+            "hedge_won": hedge_won,
+            "failover": failover,
+            "latency": round(time.monotonic() - started, 3),
+        })
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        json_schema: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream from the first healthy backend, failing over while nothing has
+        been yielded yet. Streams are not hedged.
+        """
+        self.counts["requests"] += 1
+        started = time.monotonic()
+        errors = []
+        for index, name in enumerate(self._ordered_backends()):
+            if index:
+                self.counts["failovers"] += 1
+            yielded = False
+            stream = self.backends[name].generate_stream(
+                prompt,
+                system_prompt=system_prompt,
+                temperature=temperature,
+                json_schema=json_schema
+            )
+            try:
+                async for chunk in stream:
+                    yielded = True
+                    yield chunk
+            except Exception as e:
+                self.health[name].record(time.monotonic() - started, ok=False)
+                if yielded:
+                    raise
+                errors.append(f"{name}: {str(e)}")
+                logger.warning(f"LLM backend {name} failed before streaming: {str(e)}")
+                continue
+            finally:
+                await stream.aclose()
+            self.health[name].record(time.monotonic() - started, ok=True)
+            self._record(name, name, False, started, failover=bool(errors))
+            return
+        raise RuntimeError(f"All LLM backends failed: {'; '.join(errors)}")
+
+    async def analyze_job(
+        self,
+        job_description: str,
+        focus_areas: List[str],
+        summary_length: str = "medium",
+        experience_years: Optional[int] = None,
+        required_skills: Optional[List[str]] = None
+    ) -> Dict:
+        """Analyze a job description on whichever backend answers first."""
+        try:
+            analysis_prompt = get_analysis_prompt(
+                job_description=job_description,
+                focus_areas=focus_areas,
+                summary_length=summary_length,
+                experience_years=experience_years,
+                required_skills=required_skills
+            )
+            parsed_response = await self.generate_json(
+                prompt=analysis_prompt,
+                system_prompt=get_system_prompt(),
+                temperature=0.3,
+                json_schema=ANALYSIS_JSON_SCHEMA
+            )
+            return ResponseParser.validate_analysis_response(parsed_response)
+        except Exception as e:
+            logger.error(f"Error analyzing job description: {str(e)}")
+            return {
+                "valid": False,
+                "summary": f"Error analyzing job description: {str(e)}",
+                "key_skills": [],
+                "required_experience": "Error during analysis",
+                "company_culture": "Error during analysis",
+                "estimated_salary_range": "Error during analysis",
+                "error": str(e)
+            }
+
+    async def validate_job(
+        self,
+        job_description: str,
+        experience_years: Optional[int] = None,
+        required_skills: Optional[List[str]] = None
+    ) -> bool:
+        """Quick validation, stopping generation once a verdict is written."""
+        try:
+            validation_prompt = get_validation_prompt(
+                job_description=job_description,
+                experience_years=experience_years,
+                required_skills=required_skills
+            )
+            response = await self.generate_until(
+                prompt=validation_prompt,
+                stop=lambda text: ResponseParser.early_validation_verdict(text) is not None,
+                system_prompt=get_system_prompt(),
+                temperature=0.1
+            )
+            return ResponseParser.parse_validation_response(response)
+        except Exception as e:
+            logger.error(f"Error validating job: {str(e)}")
+            raise
@@ -1,5 +1,18 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+from app.config import get_settings
+from .prompts import (
+    ANALYSIS_JSON_SCHEMA,
+    PACKED_ANALYSIS_JSON_SCHEMA,
+    get_system_prompt,
+    get_analysis_prompt,
+    get_packed_analysis_prompt
+)
+from .parser import IncrementalJSONParser, ResponseParseError, ResponseParser
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
 
 class LLMClient(ABC):
     @abstractmethod
@@ -19,11 +32,130 @@ class LLMClient(ABC):
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        json_schema: Optional[Dict] = None
     ) -> str:
-        """Generate a response using the LLM."""
+        """Generate a response using the LLM, constrained to json_schema when given."""
         pass
 
+    def stats(self) -> Dict:
+        """Transport metrics for this client, if it keeps any."""
+        return {}
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        json_schema: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Yield the response in chunks as it is generated. Providers without
+        streaming support yield the whole response once.
+        """
+        yield await self.generate(prompt, system_prompt=system_prompt, temperature=temperature, json_schema=json_schema)
+
+    async def generate_json(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        json_schema: Optional[Dict] = None,
+        expected: Union[type, Tuple[type, ...]] = dict
+    ) -> Any:
+        """
+        Generate and decode a JSON reply, using structured output when
+        LLM_STRUCTURED_OUTPUT is on. An unparsable reply is retried up to
+        LLM_PARSE_RETRIES times; ResponseParseError is raised if none parse.
+        """
+        schema = json_schema if settings.LLM_STRUCTURED_OUTPUT else None
+        for attempt in range(settings.LLM_PARSE_RETRIES + 1):
+            response = await self.generate(
+                prompt,
+                system_prompt=system_prompt,
+                temperature=temperature,
+                json_schema=schema
+            )
+            try:
+                parsed = ResponseParser.extract_json(response, expected=expected)
+            except ResponseParseError:
+                if attempt == settings.LLM_PARSE_RETRIES:
+                    if attempt:
+                        ResponseParser.record_retry(recovered=False)
+                    raise
+                logger.warning(f"Unparsable model response; retrying ({attempt + 1}/{settings.LLM_PARSE_RETRIES})")
+                continue
+            if attempt:
+                ResponseParser.record_retry(recovered=True)
+            return parsed
+
+    async def generate_until(
+        self,
+        prompt: str,
+        stop: Callable[[str], bool],
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7
+    ) -> str:
+        """Stream a response, aborting generation as soon as stop(text so far) is true."""
+        text = ""
+        stream = self.generate_stream(prompt, system_prompt=system_prompt, temperature=temperature)
+        try:
+            async for chunk in stream:
+                text += chunk
+                if stop(text):
+                    break
+        finally:
+            await stream.aclose()
+        return text
+
+    async def stream_analysis(
+        self,
+        job_description: str,
+        focus_areas: List[str],
+        summary_length: str = "medium",
+        experience_years: Optional[int] = None,
+        required_skills: Optional[List[str]] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Yield (field, value) pairs of a job analysis as soon as the model has
+        written each one. Falls back to parsing the full reply when it did not
+        contain a streamable JSON object, and yields an "error" field if that
+        fails too or if the reply ended before the object was closed.
+        """
+        prompt = get_analysis_prompt(
+            job_description=job_description,
+            focus_areas=focus_areas,
+            summary_length=summary_length,
+            experience_years=experience_years,
+            required_skills=required_skills
+        )
+        parser = IncrementalJSONParser()
+        text = ""
+        stream = self.generate_stream(
+            prompt,
+            system_prompt=get_system_prompt(),
+            temperature=0.3,
+            json_schema=ANALYSIS_JSON_SCHEMA if settings.LLM_STRUCTURED_OUTPUT else None
+        )
+        try:
+            async for chunk in stream:
+                text += chunk
+                for field, value in parser.feed(chunk):
+                    yield field, value
+        finally:
+            await stream.aclose()
+
+        if parser.fields and not parser.complete:
+            yield "error", "Model response ended before the analysis was complete"
+        elif not parser.fields:
+            try:
+                parsed = ResponseParser.extract_json(text)
+            except ResponseParseError as e:
+                yield "error", str(e)
+                return
+            for field, value in parsed.items():
+                yield field, value
+
     @abstractmethod
     async def validate_job(
         self,
@@ -31,5 +163,37 @@ class LLMClient(ABC):
         experience_years: Optional[int] = None,
         required_skills: Optional[List[str]] = None
     ) -> bool:
-        """Quick validation of job requirements."""
-        pass 
\ No newline at end of file
+        """
+        Quick validation of job requirements. Raises when no verdict could be
+        obtained (transport error, overload, unparseable reply), so callers
+        never cache an outage as a "does not match" verdict.
+        """
+        pass
+
+    async def analyze_jobs_packed(
+        self,
+        jobs: Dict[str, str],
+        focus_areas: List[str],
+        summary_length: str = "medium",
+        experience_years: Optional[int] = None,
+        required_skills: Optional[List[str]] = None
+    ) -> Dict[str, Dict]:
+        """
+        Analyze several jobs in one request; jobs maps a short id to its description.
+        Returns analyses keyed by id; ids missing from the reply are omitted.
+        """
+        prompt = get_packed_analysis_prompt(
+            jobs=jobs,
+            focus_areas=focus_areas,
+            summary_length=summary_length,
+            experience_years=experience_years,
+            required_skills=required_skills
+        )
+        parsed = await self.generate_json(
+            prompt=prompt,
+            system_prompt=get_system_prompt(),
+            temperature=0.3,
+            json_schema=PACKED_ANALYSIS_JSON_SCHEMA,
+            expected=(list, dict)
+        )
+        return ResponseParser.parse_packed_analysis_response(parsed, list(jobs))
@@ -1,41 +1,155 @@
 import json
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
+from collections import Counter
 import logging
 import re
 
 logger = logging.getLogger(__name__)
 
+class ResponseParseError(ValueError):
+    """The model's reply did not contain the expected JSON."""
+
+# Parse outcomes in this process; failures are wasted LLM calls
+_parse_stats = Counter()
+_JSON_START_RE = re.compile(r"[\[{]")
+
+_VALID_FIELD_RE = re.compile(r'"valid"\s*:\s*(true|false)', re.IGNORECASE)
+_LEADING_BOOL_RE = re.compile(r'^(?:```(?:json)?\s*)?(true|false)\b', re.IGNORECASE)
+
+class IncrementalJSONParser:
+    """
+    Parses a streamed JSON object one top-level field at a time.
+    feed() returns the fields completed by each new chunk, so callers can use
+    the summary before the model has finished writing the rest of the object.
+    Text before the opening brace (e.g. a ```json fence) is skipped.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = 0
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+        self.field_start = 0
+        self.fields: Dict[str, Any] = {}
+
+    @property
+    def complete(self) -> bool:
+        return self.started and self.depth == 0
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self.buffer += chunk
+        completed: List[Tuple[str, Any]] = []
+        while self.position < len(self.buffer) and not self.complete:
+            char = self.buffer[self.position]
+            self.position += 1
+            if not self.started:
+                if char == "{":
+                    self.started, self.depth, self.field_start = True, 1, self.position
+                continue
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    completed.extend(self._close_field(self.position - 1))
+            elif char == "," and self.depth == 1:
+                completed.extend(self._close_field(self.position - 1))
+                self.field_start = self.position
+        return completed
+
+    def _close_field(self, end: int) -> List[Tuple[str, Any]]:
+        segment = self.buffer[self.field_start:end].strip()
+        if not segment:
+            return []
+        try:
+            parsed = json.loads("{" + segment + "}")
+        except json.JSONDecodeError:
+            logger.warning(f"Skipping unparsable streamed field: {segment[:80]}")
+            return []
+        self.fields.update(parsed)
+        return list(parsed.items())
+
 class ResponseParser:
     @staticmethod
-    def parse_json_response(response: str) -> Dict:
+    def extract_json(response: str, expected: Union[type, Tuple[type, ...]] = dict) -> Any:
         """
-        Parse the JSON response from the LLM.
-        Handles potential JSON formatting issues in the response.
+        Decode the first JSON value of the expected type in a reply, tolerating
+        code fences and prose around it (each candidate start is tried with
+        raw_decode, so trailing text does not matter).
+        Raises ResponseParseError when the reply contains no such value.
         """
+        _parse_stats["attempts"] += 1
         try:
-            # Try to parse the response directly
-            return json.loads(response)
+            parsed = json.loads(response)
+            if isinstance(parsed, expected):
+                return parsed
         except json.JSONDecodeError:
-            logger.warning("Failed to parse response directly, attempting cleanup")
+            pass
+
+        decoder = json.JSONDecoder()
+        for match in _JSON_START_RE.finditer(response):
             try:
-                # Find the first { and last } to extract JSON
-                start = response.find('{')
-                end = response.rfind('}') + 1
-                if start >= 0 and end > start:
-                    cleaned_json = response[start:end]
-                    return json.loads(cleaned_json)
-                else:
-                    raise ValueError("No JSON object found in response")
-            except (json.JSONDecodeError, ValueError) as e:
-                logger.error(f"Failed to parse cleaned response: {e}")
-                return {
-                    "valid": False,
-                    "summary": "Failed to parse model response",
-                    "key_skills": [],
-                    "required_experience": None,
-                    "company_culture": None,
-                    "estimated_salary_range": None
-                }
+                parsed, _ = decoder.raw_decode(response, match.start())
+            except json.JSONDecodeError:
+                continue
+            if isinstance(parsed, expected):
+                _parse_stats["repaired"] += 1
+                return parsed
+
+        _parse_stats["failed"] += 1
+        logger.warning(f"No usable JSON in model response: {response[:200]!r}")
+        raise ResponseParseError("Failed to parse model response")
+
+    @staticmethod
+    def record_retry(recovered: bool) -> None:
+        _parse_stats["retries"] += 1
+        if not recovered:
+            _parse_stats["unrecovered"] += 1
+
+    @staticmethod
+    def stats() -> Dict:
+        """Parse-failure rate per attempt, plus how many calls still failed after a retry."""
+        attempts = _parse_stats["attempts"]
+        return {
+            "parse_attempts": attempts,
+            "parse_repaired": _parse_stats["repaired"],
+            "parse_failed": _parse_stats["failed"],
+            "parse_retries": _parse_stats["retries"],
+            "parse_unrecovered": _parse_stats["unrecovered"],
+            "parse_failure_rate": _parse_stats["failed"] / attempts if attempts else 0.0,
+        }
+
+    @staticmethod
+    def parse_json_response(response: str) -> Dict:
+        """
+        Parse the JSON response from the LLM.
+        Handles potential JSON formatting issues in the response. On failure
+        the placeholder analysis carries an "error" field so it is never cached.
+        """
+        try:
+            return ResponseParser.extract_json(response)
+        except ResponseParseError as e:
+            return {
+                "valid": False,
+                "summary": "Failed to parse model response",
+                "key_skills": [],
+                "required_experience": None,
+                "company_culture": None,
+                "estimated_salary_range": None,
+                "error": str(e)
+            }
 
     @staticmethod
     def validate_analysis_response(parsed_response: Dict) -> Dict:
@@ -68,30 +182,81 @@ class ResponseParser:
         """
         Parse the validation response from the LLM.
         Looks for clear indicators of validity in the response.
+        Raises ResponseParseError when the reply holds no clear verdict, so an
+        empty or garbled reply is never mistaken for "does not match".
         """
+        # Try to parse as JSON first
         try:
-            # Try to parse as JSON first
+            parsed = json.loads(response)
+            if isinstance(parsed, bool):
+                return parsed
+            if isinstance(parsed, dict) and "valid" in parsed:
+                return bool(parsed["valid"])
+        except json.JSONDecodeError:
+            pass
+
+        # A leading boolean or "valid" field, possibly cut short by an early stop
+        verdict = ResponseParser.early_validation_verdict(response)
+        if verdict is not None:
+            return verdict
+
+        # If not JSON, look for clear text indicators
+        response_lower = response.lower().strip()
+        positive_indicators = ["true", "yes", "valid", "matches", "suitable", "appropriate"]
+        negative_indicators = ["false", "no", "invalid", "does not match", "unsuitable", "inappropriate"]
+
+        # Count matches for each indicator
+        positive_matches = sum(1 for indicator in positive_indicators if indicator in response_lower)
+        negative_matches = sum(1 for indicator in negative_indicators if indicator in response_lower)
+
+        if positive_matches == negative_matches:
+            raise ResponseParseError(f"No clear validation verdict in response: {response[:100]!r}")
+        return positive_matches > negative_matches
+
+    @staticmethod
+    def parse_packed_analysis_response(response: Union[str, list, dict], job_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Parse a packed analysis response (a JSON array of objects with an "id"),
+        given as text or already decoded.
+        Returns validated analyses keyed by job id. Ids that are missing,
+        unknown, duplicated or malformed are left out so the caller can
+        retry them one at a time.
+        """
+        parsed = response
+        if isinstance(response, str):
             try:
-                parsed = json.loads(response)
-                if isinstance(parsed, bool):
-                    return parsed
-                if isinstance(parsed, dict) and "valid" in parsed:
-                    return bool(parsed["valid"])
-            except json.JSONDecodeError:
-                pass
+                parsed = ResponseParser.extract_json(response, expected=(list, dict))
+            except ResponseParseError:
+                return {}
 
-            # If not JSON, look for clear text indicators
-            response_lower = response.lower().strip()
-            positive_indicators = ["true", "yes", "valid", "matches", "suitable", "appropriate"]
-            negative_indicators = ["false", "no", "invalid", "does not match", "unsuitable", "inappropriate"]
+        if isinstance(parsed, dict):
+            # Tolerate {"jobs": [...]} wrappers
+            parsed = next((value for value in parsed.values() if isinstance(value, list)), [])
+        if not isinstance(parsed, list):
+            return {}
 
-            # Count matches for each indicator
-            positive_matches = sum(1 for indicator in positive_indicators if indicator in response_lower)
-            negative_matches = sum(1 for indicator in negative_indicators if indicator in response_lower)
+        expected = set(job_ids)
+        results: Dict[str, Dict] = {}
+        for item in parsed:
+            if not isinstance(item, dict) or "summary" not in item:
+                continue
+            job_id = str(item.get("id", "")).strip()
+            if job_id not in expected or job_id in results:
+                continue
+            results[job_id] = ResponseParser.validate_analysis_response(item)
 
-            # Return True if there are more positive matches than negative
-            return positive_matches > negative_matches
+        missing = len(expected) - len(results)
+        if missing:
+            logger.warning(f"Packed response missing or malformed for {missing} of {len(expected)} jobs")
+        return results
 
-        except Exception as e:
-            logger.error(f"Error parsing validation response: {e}")
-            return False 
\ No newline at end of file
+    @staticmethod
+    def early_validation_verdict(partial_response: str) -> Optional[bool]:
+        """
+        Verdict from the start of a streamed validation response, or None if
+        the model has not committed to one yet. Lets generation stop early.
+        """
+        match = _LEADING_BOOL_RE.match(partial_response.strip()) or _VALID_FIELD_RE.search(partial_response)
+        if match:
+            return match.group(1).lower() == "true"
+        return None
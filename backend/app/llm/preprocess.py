@@ -0,0 +1,189 @@
+from typing import Dict, List, Set
+import html
+import re
+from app.cache.local import LocalCache
+from app.cache.simhash import SIMHASH_BITS, content_hash, normalize_text, simhash
+from app.config import get_settings
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_BLOCK_TAG_RE = re.compile(r"<\s*(?:br|/p|/div|/li|/h\d|/tr)\s*/?>", re.IGNORECASE)
+_LIST_ITEM_RE = re.compile(r"<\s*li[^>]*>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_MD_LINK_RE = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+_MD_HEADING_RE = re.compile(r"^\s{0,3}#{1,6}\s*", re.MULTILINE)
+_MD_EMPHASIS_RE = re.compile(r"(\*\*|__|\*|`)")
+_MD_ESCAPE_RE = re.compile(r"\\([\\`*_{}\[\]()#+\-.!&|>~])")
+_BULLET_RE = re.compile(r"^\s*(?:[-•·▪●◦*]|\d+[.)])\s+", re.MULTILINE)
+_URL_RE = re.compile(r"https?://\S+")
+_SPACES_RE = re.compile(r"[ \t ]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+# Lines worth keeping even inside a boilerplate section, since they feed the salary estimate
+_SALARY_RE = re.compile(r"[$€£]\s?\d|\b(?:salary|compensation|pay range|per hour|hourly rate)\b", re.IGNORECASE)
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+_HEADING_PUNCTUATION = ":-–—.!? "
+_MAX_HEADING_CHARS = 60
+_FAMILY_BITS = 16  # Reposts of one job share their top SimHash bits, so they count once
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+def normalize_markup(text: str) -> str:
+    """Turn HTML or markdown into plain text, one paragraph or list item per line."""
+    text = html.unescape(text)
+    text = _BLOCK_TAG_RE.sub("\n", text)
+    text = _LIST_ITEM_RE.sub("\n- ", text)
+    text = _TAG_RE.sub(" ", text)
+    text = _MD_LINK_RE.sub(r"\1", text)
+    text = _MD_ESCAPE_RE.sub(r"\1", text)
+    text = _MD_HEADING_RE.sub("", text)
+    text = _MD_EMPHASIS_RE.sub("", text)
+    text = _BULLET_RE.sub("- ", text)
+    text = _URL_RE.sub("", text)
+    text = _SPACES_RE.sub(" ", text)
+    lines = [line.strip() for line in text.splitlines()]
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens, at a line or sentence boundary where possible."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max_tokens * 4]
+    boundary = max(cut.rfind("\n"), cut.rfind(". "))
+    if boundary > len(cut) // 2:
+        cut = cut[:boundary + 1]
+    return cut.rstrip()
+
+class DescriptionPreprocessor:
+    """
+    Shrinks job descriptions before they are put into prompts: normalizes
+    markup, drops boilerplate and truncates to PREPROCESS_MAX_TOKENS.
+    Sentences containing one of PREPROCESS_BOILERPLATE_PHRASES are dropped,
+    as are sections under a heading that is exactly one of
+    PREPROCESS_BOILERPLATE_HEADINGS, and paragraphs (such as a company's
+    standard blurb) learned from recurring across many different jobs.
+    Reposts of the same job count once, so a role's own requirements are
+    never learned as boilerplate. Cleaned text is cached in-process by
+    content hash.
+    """
+
+    def __init__(self):
+        self.phrases = [phrase.lower() for phrase in settings.PREPROCESS_BOILERPLATE_PHRASES]
+        self.headings = {heading.lower() for heading in settings.PREPROCESS_BOILERPLATE_HEADINGS}
+        self.cache = LocalCache(settings.PREPROCESS_CACHE_MAX_ENTRIES, settings.PREPROCESS_CACHE_TTL)
+        # Paragraph fingerprint -> job families (SimHash prefixes) it appeared in
+        self.paragraph_sources: Dict[str, Set[int]] = {}
+        self.prompts = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def clean(self, description: str) -> str:
+        """Cleaned description for prompts; the raw text is returned unchanged when disabled."""
+        if not settings.PREPROCESS_ENABLED:
+            return description
+
+        key = content_hash(description)
+        cleaned = self.cache.get(key)
+        if cleaned is None:
+            cleaned = self._clean(description)
+            self.cache.set(key, cleaned)
+
+        self.prompts += 1
+        self.tokens_before += estimate_tokens(description)
+        self.tokens_after += estimate_tokens(cleaned)
+        return cleaned
+
+    def stats(self) -> Dict:
+        saved = self.tokens_before - self.tokens_after
+        return {
+            "enabled": settings.PREPROCESS_ENABLED,
+            "prompts": self.prompts,
+            "avg_tokens_before": self.tokens_before / self.prompts if self.prompts else 0.0,
+            "avg_tokens_after": self.tokens_after / self.prompts if self.prompts else 0.0,
+            "avg_tokens_saved": saved / self.prompts if self.prompts else 0.0,
+            "saved_ratio": saved / self.tokens_before if self.tokens_before else 0.0,
+            "learned_boilerplate": sum(
+                1 for sources in self.paragraph_sources.values()
+                if len(sources) >= settings.PREPROCESS_REPEAT_THRESHOLD
+            ),
+            "cache": self.cache.stats(),
+        }
+
+    def _clean(self, description: str) -> str:
+        paragraphs = normalize_markup(description).split("\n")
+        fingerprints = [self._fingerprint(paragraph) for paragraph in paragraphs]
+        self._learn(simhash(description) >> (SIMHASH_BITS - _FAMILY_BITS), fingerprints)
+
+        kept: List[str] = []
+        in_boilerplate_section = False
+        for paragraph, fingerprint in zip(paragraphs, fingerprints):
+            if self._is_heading(paragraph):
+                in_boilerplate_section = paragraph.strip(_HEADING_PUNCTUATION).lower() in self.headings
+                if in_boilerplate_section:
+                    continue
+            if _SALARY_RE.search(paragraph):
+                kept.append(paragraph)
+                continue
+            if in_boilerplate_section or self._is_learned_boilerplate(fingerprint):
+                continue
+            paragraph = self._drop_boilerplate_sentences(paragraph)
+            if paragraph:
+                kept.append(paragraph)
+
+        cleaned = _BLANK_LINES_RE.sub("\n\n", "\n".join(kept)).strip()
+        return truncate_to_tokens(cleaned, settings.PREPROCESS_MAX_TOKENS)
+
+    def _is_learned_boilerplate(self, fingerprint: str) -> bool:
+        return len(self.paragraph_sources.get(fingerprint, ())) >= settings.PREPROCESS_REPEAT_THRESHOLD
+
+    def _drop_boilerplate_sentences(self, paragraph: str) -> str:
+        """Remove only the sentences that contain a boilerplate phrase."""
+        lowered = paragraph.lower()
+        if not any(phrase in lowered for phrase in self.phrases):
+            return paragraph
+        sentences = _SENTENCE_END_RE.split(paragraph)
+        return " ".join(
+            sentence for sentence in sentences
+            if not any(phrase in sentence.lower() for phrase in self.phrases)
+        )
+
+    @staticmethod
+    def _is_heading(paragraph: str) -> bool:
+        stripped = paragraph.rstrip(":").strip()
+        return 0 < len(stripped) <= _MAX_HEADING_CHARS and not stripped.startswith("- ") and (
+            paragraph.endswith(":") or stripped.isupper()
+            or (len(stripped.split()) <= 4 and stripped.istitle())
+        )
+
+    @staticmethod
+    def _fingerprint(paragraph: str) -> str:
+        """Only long paragraphs are tracked; short lines repeat across postings by nature."""
+        if len(paragraph) < settings.PREPROCESS_REPEAT_MIN_CHARS:
+            return ""
+        return content_hash(normalize_text(paragraph))[:16]
+
+    def _learn(self, family: int, fingerprints: List[str]) -> None:
+        """Record which job family each long paragraph was seen in."""
+        for fingerprint in fingerprints:
+            if not fingerprint:
+                continue
+            sources = self.paragraph_sources.setdefault(fingerprint, set())
+            if len(sources) < settings.PREPROCESS_REPEAT_THRESHOLD:
+                sources.add(family)
+
+        if len(self.paragraph_sources) > settings.PREPROCESS_MAX_TRACKED_PARAGRAPHS:
+            # Forget the rarest half so memory stays bounded
+            ranked = sorted(self.paragraph_sources.items(), key=lambda item: len(item[1]), reverse=True)
+            self.paragraph_sources = dict(ranked[:settings.PREPROCESS_MAX_TRACKED_PARAGRAPHS // 2])
+
+_preprocessor = None
+
+def get_preprocessor() -> DescriptionPreprocessor:
+    """Process-wide preprocessor, so learned boilerplate is shared by every prompt."""
+    global _preprocessor
+    if _preprocessor is None:
+        _preprocessor = DescriptionPreprocessor()
+    return _preprocessor
@@ -1,72 +1,78 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
+from .preprocess import estimate_tokens, get_preprocessor
 
 def get_system_prompt() -> str:
     return """You are a job analysis assistant. Your task is to analyze job descriptions and provide structured information about the job requirements, skills, and company culture. Be precise and factual in your analysis."""
 
-def get_validation_prompt(
-    job_description: str,
-    experience_years: Optional[int] = None,
-    required_skills: Optional[List[str]] = None
-) -> str:
-    prompt = f"""Quickly validate if the following job description matches the specified requirements.
-
-Job Description:
-{job_description}
+# Prompts put every static instruction first and the per-request content
+# last, so consecutive prompts share the longest possible prefix and a local
+# model can reuse its KV cache for it. Keep new static text above the
+# profile and description sections.
 
-"""
-    
-    if experience_years is not None:
-        prompt += f"Required Experience: {experience_years} years\n"
-    if required_skills:
-        prompt += f"Required Skills: {', '.join(required_skills)}\n"
-    
-    prompt += """
+_VALIDATION_INSTRUCTIONS = """Quickly validate if the job description below matches the specified requirements.
 Respond with a simple boolean value (true/false) indicating whether the job matches the requirements.
 Focus on the key requirements and skills, ignoring minor mismatches.
 """
-    return prompt
-
-def get_analysis_prompt(
-    job_description: str,
-    focus_areas: List[str],
-    summary_length: str = "medium",
-    experience_years: Optional[int] = None,
-    required_skills: Optional[List[str]] = None
-) -> str:
-    prompt = f"""Analyze the following job description and provide a structured response in JSON format.
 
-Job Description:
-{job_description}
-
-Focus Areas: {', '.join(focus_areas)}
-Summary Length: {summary_length}
-Make sure estimated salary range is very concise and to the point, should not exceed 10 words. 
-"""
-    
-    if experience_years is not None:
-        prompt += f"Experience Years: {experience_years}\n"
-    if required_skills:
-        prompt += f"Required Skills: {', '.join(required_skills)}\n"
-    
-    prompt += """
-Provide a JSON response with the following structure:
-{
+_ANALYSIS_SCHEMA = """{
     "valid": boolean,
     "summary": string,
     "key_skills": string[],
     "required_experience": string,
     "company_culture": string,
     "estimated_salary_range": string
+}"""
+
+# JSON schemas for structured output (Gemini response_schema, Ollama format).
+# Field order matters: "valid" comes first so streamed replies can be cut short.
+ANALYSIS_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "valid": {"type": "boolean"},
+        "summary": {"type": "string"},
+        "key_skills": {"type": "array", "items": {"type": "string"}},
+        "required_experience": {"type": "string"},
+        "company_culture": {"type": "string"},
+        "estimated_salary_range": {"type": "string"}
+    },
+    "required": ["valid", "summary", "key_skills", "required_experience", "company_culture", "estimated_salary_range"]
+}
+
+PACKED_ANALYSIS_JSON_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {"id": {"type": "string"}, **ANALYSIS_JSON_SCHEMA["properties"]},
+        "required": ["id", *ANALYSIS_JSON_SCHEMA["required"]]
+    }
 }
+
+_ANALYSIS_INSTRUCTIONS = f"""Analyze the job description below and provide a structured response in JSON format.
+Make sure estimated salary range is very concise and to the point, should not exceed 10 words.
+
+Provide a JSON response with the following structure:
+{_ANALYSIS_SCHEMA}
 """
-    return prompt
 
-def get_resume_analysis_prompt(resume_text: str) -> str:
-    prompt = f"""Analyze the following resume and extract relevant information for job searching.
-Return the information in a JSON format that can be used to search for matching jobs.
+_PACKED_ANALYSIS_INSTRUCTIONS = """Analyze each of the job descriptions below and provide a structured response in JSON format.
+Make sure estimated salary range is very concise and to the point, should not exceed 10 words.
 
-Resume:
-{resume_text}
+Provide a JSON array with exactly one object per job, each with the following structure:
+[
+    {
+        "id": string (the job id from its "### Job" heading),
+        "valid": boolean,
+        "summary": string,
+        "key_skills": string[],
+        "required_experience": string,
+        "company_culture": string,
+        "estimated_salary_range": string
+    }
+]
+"""
+
+_RESUME_INSTRUCTIONS = """Analyze the resume below and extract relevant information for job searching.
+Return the information in a JSON format that can be used to search for matching jobs.
 
 Extract the following information:
 1. Job title or role that best matches the candidate's experience and skills
@@ -75,12 +81,12 @@ Extract the following information:
 4. Key skills and technologies
 
 Return the information in this JSON format:
-{{
+{
     "search_term": "string (job title/role)",
     "location": "string (preferred location)",
     "experience_years": number,
     "required_skills": ["string", "string", ...]
-}}
+}
 
 Make sure to:
 - Use the most recent and relevant job title/role
@@ -88,4 +94,87 @@ Make sure to:
 - If location is not specified, leave it as an empty string
 - Calculate experience years based on the most relevant experience
 """
-    return prompt 
\ No newline at end of file
+
+def _profile_section(experience_years: Optional[int], required_skills: Optional[List[str]]) -> str:
+    section = ""
+    if experience_years is not None:
+        section += f"Experience Years: {experience_years}\n"
+    if required_skills:
+        section += f"Required Skills: {', '.join(required_skills)}\n"
+    return section
+
+def get_validation_prompt(
+    job_description: str,
+    experience_years: Optional[int] = None,
+    required_skills: Optional[List[str]] = None
+) -> str:
+    prompt = _VALIDATION_INSTRUCTIONS + "\n"
+    if experience_years is not None:
+        prompt += f"Required Experience: {experience_years} years\n"
+    if required_skills:
+        prompt += f"Required Skills: {', '.join(required_skills)}\n"
+    prompt += f"""
+Job Description:
+{get_preprocessor().clean(job_description)}
+"""
+    return prompt
+
+def get_analysis_prompt(
+    job_description: str,
+    focus_areas: List[str],
+    summary_length: str = "medium",
+    experience_years: Optional[int] = None,
+    required_skills: Optional[List[str]] = None
+) -> str:
+    prompt = _ANALYSIS_INSTRUCTIONS + f"""
+Focus Areas: {', '.join(focus_areas)}
+Summary Length: {summary_length}
+"""
+    prompt += _profile_section(experience_years, required_skills)
+    prompt += f"""
+Job Description:
+{get_preprocessor().clean(job_description)}
+"""
+    return prompt
+
+def get_resume_analysis_prompt(resume_text: str) -> str:
+    return _RESUME_INSTRUCTIONS + f"""
+Resume:
+{resume_text}
+"""
+
+def pack_jobs(descriptions: List[str], token_budget: int, max_jobs: int) -> List[List[int]]:
+    """
+    Greedily group job indices so each group's descriptions fit in token_budget.
+    A description larger than the budget gets a group of its own.
+    """
+    packs: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    for index, description in enumerate(descriptions):
+        tokens = estimate_tokens(description)
+        if current and (used + tokens > token_budget or len(current) >= max_jobs):
+            packs.append(current)
+            current, used = [], 0
+        current.append(index)
+        used += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+def get_packed_analysis_prompt(
+    jobs: Dict[str, str],
+    focus_areas: List[str],
+    summary_length: str = "medium",
+    experience_years: Optional[int] = None,
+    required_skills: Optional[List[str]] = None
+) -> str:
+    """Analysis prompt for several jobs at once; jobs maps a short job id to its description."""
+    prompt = _PACKED_ANALYSIS_INSTRUCTIONS + f"""
+Focus Areas: {', '.join(focus_areas)}
+Summary Length: {summary_length}
+"""
+    prompt += _profile_section(experience_years, required_skills)
+    for job_id, description in jobs.items():
+        prompt += f"\n### Job {job_id}\n{get_preprocessor().clean(description)}\n"
+    return prompt
@@ -0,0 +1,116 @@
+from typing import Dict
+import time
+import httpx
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Statuses that mean the backend is busy or briefly unavailable, not that the request is wrong
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+class CircuitOpenError(Exception):
+    """Raised without calling the backend while the circuit breaker is open."""
+
+def is_retryable(error: Exception) -> bool:
+    """Transport failures, timeouts and overload statuses are worth retrying."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUSES
+    return isinstance(error, httpx.TransportError)
+
+class RetryBudget:
+    """
+    Caps retries at a fraction of recent requests so retries cannot multiply
+    load on a struggling backend. Every request deposits `ratio` tokens and
+    every retry spends one; the balance is capped, and starts full so a
+    quiet client can still retry.
+    """
+
+    def __init__(self, ratio: float, max_tokens: float):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.retries = 0
+        self.exhausted = 0
+
+    def deposit(self) -> None:
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def can_retry(self) -> bool:
+        if self.tokens < 1:
+            self.exhausted += 1
+            return False
+        return True
+
+    def spend(self) -> None:
+        self.tokens = max(0.0, self.tokens - 1)
+        self.retries += 1
+
+    def stats(self) -> Dict:
+        return {
+            "retries": self.retries,
+            "retry_budget_exhausted": self.exhausted,
+            "retry_budget_tokens": round(self.tokens, 2),
+        }
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and fails fast for
+    `reset_timeout` seconds. Then a single probe request is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.rejected = 0
+        self.times_opened = 0
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go ahead."""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            logger.info(f"Circuit {self.name} half-open; probing backend")
+
+        if self.state == self.OPEN or (self.state == self.HALF_OPEN and self.probe_in_flight):
+            self.rejected += 1
+            raise CircuitOpenError(f"Circuit {self.name} is open; backend is unavailable or overloaded")
+        if self.state == self.HALF_OPEN:
+            self.probe_in_flight = True
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit {self.name} closed")
+        self.state = self.CLOSED
+        self.failures = 0
+        self.probe_in_flight = False
+
+    def abandon(self) -> None:
+        """The call was cancelled before an outcome; let another probe through."""
+        self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+                logger.warning(f"Circuit {self.name} opened after {self.failures} consecutive failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        return {
+            "circuit_state": self.state,
+            "circuit_consecutive_failures": self.failures,
+            "circuit_times_opened": self.times_opened,
+            "circuit_rejected": self.rejected,
+        }
@@ -0,0 +1,161 @@
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Tuple, TypeVar
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+import asyncio
+import heapq
+import itertools
+import time
+import httpx
+from app.config import get_settings
+from .resilience import CircuitOpenError, RETRYABLE_STATUSES
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+T = TypeVar("T")
+
+class Priority(IntEnum):
+    """Lower values are served first."""
+    INTERACTIVE = 0  # A user is waiting on this call, e.g. resume analysis
+    VALIDATION = 1  # Quick verdicts for cached analyses
+    BULK = 2  # Job analysis for search results
+
+class SchedulerOverloadedError(Exception):
+    """Raised when a call is shed because the queue for its priority is full."""
+
+_current_priority: ContextVar[Priority] = ContextVar("llm_priority", default=Priority.BULK)
+
+@contextmanager
+def llm_priority(priority: Priority):
+    """Run the LLM calls made inside this block (and tasks started from it) at priority."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+def is_overload(error: BaseException) -> bool:
+    """Errors that mean the provider is saturated, so concurrency should back off."""
+    if isinstance(error, (CircuitOpenError, httpx.TimeoutException)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUSES or error.response.status_code >= 500
+    # google.api_core errors carry the HTTP status as .code
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and (code == 429 or code >= 500)
+
+class LLMScheduler:
+    """
+    Priority queue in front of one LLM provider with an adaptive concurrency
+    limit. The limit grows by about one per limit's worth of fast successful
+    calls and is cut multiplicatively on overload errors or latency above
+    LLM_SCHEDULER_LATENCY_TARGET (AIMD), within [min_limit, max_limit].
+    Waiting calls are admitted highest priority first; when the queue fills
+    up, bulk work is shed before validation, and validation before
+    interactive calls.
+    """
+
+    def __init__(self, name: str, max_limit: int):
+        self.name = name
+        self.min_limit = settings.LLM_SCHEDULER_MIN_LIMIT
+        self.max_limit = max(max_limit, self.min_limit)
+        self.limit = float(min(settings.LLM_SCHEDULER_INITIAL_LIMIT, self.max_limit))
+        self.queue_limits = {
+            Priority.INTERACTIVE: settings.LLM_SCHEDULER_MAX_QUEUED,
+            Priority.VALIDATION: int(settings.LLM_SCHEDULER_MAX_QUEUED * settings.LLM_SCHEDULER_VALIDATION_QUEUE_SHARE),
+            Priority.BULK: int(settings.LLM_SCHEDULER_MAX_QUEUED * settings.LLM_SCHEDULER_BULK_QUEUE_SHARE),
+        }
+        self.in_flight = 0
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self.sequence = itertools.count()
+        self.last_decrease = 0.0
+        self.completed = 0
+        self.overloads = 0
+        self.shed = {priority.name.lower(): 0 for priority in Priority}
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one concurrency slot at the current priority for the duration of the block."""
+        await self._acquire(_current_priority.get())
+        started = time.monotonic()
+        overloaded = False
+        try:
+            yield
+        except BaseException as e:
+            overloaded = is_overload(e)
+            raise
+        finally:
+            self._release(time.monotonic() - started, overloaded)
+
+    async def run(self, fn: Callable[[], Awaitable[T]]) -> T:
+        async with self.slot():
+            return await fn()
+
+    def stats(self) -> Dict:
+        return {
+            "limit": round(self.limit, 2),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "queued": self._queued(),
+            "completed": self.completed,
+            "overloads": self.overloads,
+            "shed": dict(self.shed),
+        }
+
+    def _queued(self) -> int:
+        return sum(1 for _, _, waiter in self.waiters if not waiter.done())
+
+    async def _acquire(self, priority: Priority) -> None:
+        if self.in_flight < int(self.limit) and not self._queued():
+            self.in_flight += 1
+            return
+
+        if self._queued() >= self.queue_limits[priority]:
+            self.shed[priority.name.lower()] += 1
+            logger.warning(f"Shedding {priority.name.lower()} LLM call for {self.name}: {self._queued()} calls queued")
+            raise SchedulerOverloadedError(f"LLM provider {self.name} is overloaded; try again later")
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.sequence), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Admitted just as we were cancelled; pass the slot on
+                self.in_flight -= 1
+                self._wake()
+            raise
+
+    def _release(self, latency: float, overloaded: bool) -> None:
+        self.in_flight -= 1
+        self.completed += 1
+        now = time.monotonic()
+        if overloaded or latency > settings.LLM_SCHEDULER_LATENCY_TARGET:
+            self.overloads += overloaded
+            # Cut at most once per latency window so one burst of failures is one signal
+            if now - self.last_decrease >= min(latency, settings.LLM_SCHEDULER_LATENCY_TARGET):
+                self.limit = max(self.min_limit, self.limit * settings.LLM_SCHEDULER_BACKOFF_RATIO)
+                self.last_decrease = now
+                logger.info(f"LLM concurrency for {self.name} reduced to {self.limit:.2f}")
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+
+    def _wake(self) -> None:
+        while self.waiters and self.in_flight < int(self.limit):
+            _, _, waiter = heapq.heappop(self.waiters)
+            if waiter.done():
+                continue  # Cancelled while queued
+            self.in_flight += 1
+            waiter.set_result(None)
+
+_schedulers: Dict[str, LLMScheduler] = {}
+
+def get_scheduler(provider: str, max_limit: int) -> LLMScheduler:
+    """Shared scheduler per provider, so every service's calls are coordinated."""
+    if provider not in _schedulers:
+        _schedulers[provider] = LLMScheduler(provider, max_limit)
+    return _schedulers[provider]
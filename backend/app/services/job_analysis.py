@@ -1,15 +1,32 @@
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from collections import Counter
+import asyncio
 from app.llm.client import get_llm_client
+from app.llm.parser import ResponseParser
+from app.llm.prompts import pack_jobs
+from app.llm.scheduler import Priority, llm_priority
+from app.cache.codec import ANALYSIS_FIELDS
 from app.cache.job_analysis import JobAnalysisCache
+from app.cache.simhash import content_hash
+from app.config import get_settings
+from app.services.job_matcher import JobMatcher
+from app.services.single_flight import SingleFlight
 import logging
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 class JobAnalysisService:
     def __init__(self):
         logger.info("Initializing JobAnalysisService...")
         self.llm_client = get_llm_client()
         self.cache = JobAnalysisCache()
+        # Concurrent misses for the same job share one LLM call
+        self.analysis_flights = SingleFlight("analysis")
+        self.validation_flights = SingleFlight("validation")
+        self.matcher = JobMatcher()
+        # Where each validity verdict came from: rules, cache, llm or analysis
+        self.validation_sources = Counter()
         logger.info("JobAnalysisService initialized successfully")
 
     async def analyze_job(
@@ -23,8 +40,10 @@ class JobAnalysisService:
     ) -> Dict:
         """
         Analyze a job description and extract relevant information.
-        First checks cache, then uses LLM if not cached.
+        First checks the content-addressed cache (including near-duplicate
+        reposts), then uses LLM if not cached.
         For cached results, performs a quick validation check.
+        The response's validation_source says which stage decided validity.
         """
         try:
             logger.info(f"Starting job analysis for URL: {url}")
@@ -33,51 +52,505 @@ class JobAnalysisService:
 
             # Check cache first
             logger.info(f"Checking cache for URL: {url}")
-            cached_analysis = self.cache.get_analysis(url)
+            cached_analysis = await self.cache.get_analysis(description, url)
             
             if cached_analysis:
                 logger.info(f"Cache hit for URL: {url}")
                 # Perform quick validation
                 logger.info(f"Performing validation check for cached analysis")
-                is_valid = await self.llm_client.validate_job(
-                    job_description=description,
-                    experience_years=experience_years,
-                    required_skills=required_skills
-                )
+                try:
+                    is_valid, source = await self.validate_job(
+                        description=description,
+                        experience_years=experience_years,
+                        required_skills=required_skills
+                    )
+                except Exception as e:
+                    # No verdict was obtained; report it rather than guessing "invalid"
+                    logger.warning(f"Validation failed for URL: {url}: {str(e)}")
+                    return {
+                        "valid": False,
+                        "analysis": cached_analysis,
+                        "validation_source": "error",
+                        "error": str(e)
+                    }
                 
                 return {
                     "valid": is_valid,
-                    "analysis": cached_analysis
+                    "analysis": cached_analysis,
+                    "validation_source": source
                 }
 
             # If not in cache, proceed with full analysis
             logger.info(f"Cache miss for URL: {url}. Proceeding with LLM analysis")
-            analysis = await self.llm_client.analyze_job(
-                job_description=description,
-                focus_areas=focus_areas or ['skills', 'requirements', 'culture'],
+            analysis = await self._llm_analyze(
+                description=description,
+                focus_areas=focus_areas,
                 summary_length=summary_length,
                 experience_years=experience_years,
                 required_skills=required_skills
             )
             
             # Extract analysis part for caching
-            analysis_part = {
-                "summary": analysis["summary"],
-                "key_skills": analysis["key_skills"],
-                "required_experience": analysis["required_experience"],
-                "company_culture": analysis["company_culture"],
-                "estimated_salary_range": analysis["estimated_salary_range"]
-            }
+            analysis_part = self._extract_analysis_part(analysis)
+
+            # Failed analyses are returned but never cached, so the next view retries
+            if analysis.get("error"):
+                logger.warning(f"Analysis failed for URL: {url}; not caching: {analysis['error']}")
+                return {
+                    "valid": False,
+                    "analysis": analysis_part,
+                    "validation_source": "error",
+                    "error": analysis["error"]
+                }
             
             # Cache the analysis part
             logger.info(f"Caching analysis results for URL: {url}")
-            self.cache.set_analysis(url, analysis_part)
+            await self.cache.set_analysis(description, analysis_part)
+
+            # The model's verdict stands; rules only short-circuit before a call.
+            # Caching it lets repeat views agree with this one
+            is_valid = analysis["valid"]
+            await self.cache.set_validation(description, is_valid, experience_years, required_skills)
+            self.validation_sources["analysis"] += 1
             
             return {
-                "valid": analysis["valid"],
-                "analysis": analysis_part
+                "valid": is_valid,
+                "analysis": analysis_part,
+                "validation_source": "analysis"
             }
             
         except Exception as e:
             logger.error(f"Error analyzing job for URL {url}: {str(e)}", exc_info=True)
-            raise 
\ No newline at end of file
+            raise 
+
+    async def analyze_job_stream(
+        self,
+        description: str,
+        url: str,
+        focus_areas: Optional[List[str]] = None,
+        summary_length: str = "medium",
+        experience_years: Optional[int] = None,
+        required_skills: Optional[List[str]] = None,
+        valid_only: bool = False
+    ) -> AsyncIterator[Dict]:
+        """
+        Streaming variant of analyze_job. Yields a {"event": "field"} event for
+        each analysis field as soon as the model has written it, then a
+        {"event": "done"} event shaped like analyze_job's response.
+        With valid_only, generation stops as soon as the job is known not to
+        match, and the done event carries no analysis.
+        """
+        logger.info(f"Starting streamed job analysis for URL: {url}")
+
+        cached_analysis = await self.cache.get_analysis(description, url)
+        if cached_analysis:
+            logger.info(f"Cache hit for URL: {url}")
+            if not valid_only:
+                for field, value in cached_analysis.items():
+                    yield {"event": "field", "field": field, "value": value}
+            try:
+                is_valid, source = await self.validate_job(description, experience_years, required_skills)
+            except Exception as e:
+                logger.warning(f"Validation failed for URL: {url}: {str(e)}")
+                yield {"event": "error", "detail": str(e)}
+                return
+            if valid_only and is_valid:
+                for field, value in cached_analysis.items():
+                    yield {"event": "field", "field": field, "value": value}
+            yield {
+                "event": "done",
+                "valid": is_valid,
+                "analysis": cached_analysis if is_valid or not valid_only else None,
+                "validation_source": source
+            }
+            return
+
+        rule_verdict = self._rule_verdict(description, experience_years, required_skills)
+        if valid_only and rule_verdict is False:
+            self.validation_sources["rules"] += 1
+            yield {"event": "done", "valid": False, "analysis": None, "validation_source": "rules"}
+            return
+
+        logger.info(f"Cache miss for URL: {url}. Streaming LLM analysis")
+        fields = {}
+        aborted = False
+        # The scheduler slot is held by a producer task, not across the
+        # yields below, so a slow client cannot keep it once generation is done
+        queue: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.create_task(self._relay_analysis(
+            queue,
+            job_description=description,
+            focus_areas=focus_areas or ['skills', 'requirements', 'culture'],
+            summary_length=summary_length,
+            experience_years=experience_years,
+            required_skills=required_skills
+        ))
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                field, value = item
+                fields[field] = value
+                if field == "valid":
+                    if valid_only and value is False:
+                        logger.info(f"Job at {url} does not match; aborting generation")
+                        aborted = True
+                        break
+                elif field in ANALYSIS_FIELDS:
+                    yield {"event": "field", "field": field, "value": value}
+        finally:
+            # Stops generation early when aborted or when the client went away
+            producer.cancel()
+            await asyncio.wait([producer])
+        if not producer.cancelled():
+            producer.result()
+
+        missing = [field for field in ("valid",) + ANALYSIS_FIELDS if field not in fields]
+        if "error" not in fields and missing and not aborted:
+            fields["error"] = f"Model response is missing fields: {', '.join(missing)}"
+
+        if "error" in fields:
+            logger.warning(f"Streamed analysis failed for URL: {url}; not caching: {fields['error']}")
+            yield {"event": "error", "detail": fields["error"]}
+            return
+
+        if aborted:
+            await self.cache.set_validation(description, False, experience_years, required_skills)
+            self.validation_sources["analysis"] += 1
+            yield {"event": "done", "valid": False, "analysis": None, "validation_source": "analysis"}
+            return
+
+        analysis = ResponseParser.validate_analysis_response(fields)
+        analysis_part = self._extract_analysis_part(analysis)
+        logger.info(f"Caching analysis results for URL: {url}")
+        await self.cache.set_analysis(description, analysis_part)
+
+        is_valid = analysis["valid"]
+        await self.cache.set_validation(description, is_valid, experience_years, required_skills)
+        self.validation_sources["analysis"] += 1
+
+        yield {"event": "done", "valid": is_valid, "analysis": analysis_part, "validation_source": "analysis"}
+
+    async def _relay_analysis(self, queue: asyncio.Queue, **kwargs) -> None:
+        """Stream an analysis into queue; None marks the end."""
+        try:
+            stream = self.llm_client.stream_analysis(**kwargs)
+            try:
+                async for item in stream:
+                    queue.put_nowait(item)
+                    # Let the consumer act on each field, e.g. abort on "valid"
+                    await asyncio.sleep(0)
+            finally:
+                await stream.aclose()
+        finally:
+            queue.put_nowait(None)
+
+    async def get_cache_stats(self) -> Dict:
+        """Cache hit rates across all workers, plus this worker's coalescing counts."""
+        stats = await self.cache.get_stats()
+        stats.update(self.analysis_flights.stats())
+        stats.update(self.validation_flights.stats())
+        stats["validation_sources"] = dict(self.validation_sources)
+        return stats
+
+    async def validate_job(
+        self,
+        description: str,
+        experience_years: Optional[int] = None,
+        required_skills: Optional[List[str]] = None
+    ) -> Tuple[bool, str]:
+        """
+        Check a job against the user profile. A cached verdict for the same
+        description and profile is reused, clear mismatches are rejected by
+        the local matcher, and only the rest go to the LLM.
+        Returns (is_valid, source) with source one of cache, rules or llm.
+        Raises when the LLM gives no verdict; nothing is cached in that case.
+        """
+        # The cache goes first so a model verdict, once given, is never overruled
+        cached_verdict = await self.cache.get_validation(description, experience_years, required_skills)
+        if cached_verdict is not None:
+            logger.info("Validation cache hit")
+            self.validation_sources["cache"] += 1
+            return cached_verdict, "cache"
+
+        is_valid = self._rule_verdict(description, experience_years, required_skills)
+        if is_valid is not None:
+            self.validation_sources["rules"] += 1
+            return is_valid, "rules"
+
+        logger.info("Validation cache miss. Proceeding with LLM validation")
+        is_valid = await self._llm_validate(description, experience_years, required_skills)
+        await self.cache.set_validation(description, is_valid, experience_years, required_skills)
+        self.validation_sources["llm"] += 1
+        return is_valid, "llm"
+
+    async def analyze_jobs(
+        self,
+        jobs: List[Dict],
+        focus_areas: Optional[List[str]] = None,
+        summary_length: str = "medium",
+        experience_years: Optional[int] = None,
+        required_skills: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """
+        Analyze a batch of jobs sharing the same search parameters.
+        Cached analyses and verdicts are resolved with one MGET each, clear
+        mismatches without a cached verdict are rejected by the local matcher,
+        only the misses are sent to the LLM (bounded by the LLM scheduler and
+        coalesced with identical in-flight calls), and new entries are
+        written back pipelined.
+        Returns one result per job, in input order. Failed jobs, including
+        ones whose validation got no verdict, carry an "error" field instead
+        of failing the whole batch.
+        """
+        logger.info(f"Starting batch job analysis for {len(jobs)} jobs")
+        urls = [job["url"] for job in jobs]
+
+        descriptions = [job["description"] for job in jobs]
+
+        cached_analyses = await self.cache.get_analyses(descriptions, urls)
+        cached_verdicts = await self.cache.get_validations(descriptions, experience_years, required_skills)
+        # Reject clear mismatches locally; a cached model verdict takes precedence
+        rule_verdicts = [
+            self._rule_verdict(description, experience_years, required_skills) if verdict is None else None
+            for description, verdict in zip(descriptions, cached_verdicts)
+        ]
+        hits = sum(1 for cached in cached_analyses if cached)
+        settled = sum(1 for verdict in rule_verdicts if verdict is not None)
+        logger.info(f"Batch cache lookup: {hits} hits, {len(jobs) - hits} misses, "
+                    f"{settled} verdicts settled by rules")
+
+        # Analyze misses several per request; anything the packed replies miss is retried singly
+        packed_runs: List[Optional[Callable[[], Awaitable[Optional[Dict]]]]] = [None] * len(jobs)
+        if settings.LLM_PACKED_ANALYSIS:
+            misses = {}
+            for i, cached in enumerate(cached_analyses):
+                key = self._analysis_key(descriptions[i], focus_areas, summary_length, experience_years, required_skills)
+                # Duplicates and jobs already in flight elsewhere coalesce instead of being packed
+                if not cached and key not in misses and key not in self.analysis_flights.calls:
+                    misses[key] = i
+            if len(misses) > 1:
+                runs = self._packed_analyze(
+                    descriptions=[descriptions[i] for i in misses.values()],
+                    focus_areas=focus_areas,
+                    summary_length=summary_length,
+                    experience_years=experience_years,
+                    required_skills=required_skills
+                )
+                for i, run in zip(misses.values(), runs):
+                    packed_runs[i] = run
+
+        async def process(
+            job: Dict,
+            cached_analysis: Optional[dict],
+            rule_verdict: Optional[bool],
+            cached_verdict: Optional[bool],
+            packed_run: Optional[Callable[[], Awaitable[Optional[Dict]]]]
+        ) -> Dict:
+            if cached_analysis and cached_verdict is not None:
+                return {"valid": cached_verdict, "analysis": cached_analysis, "cached": True, "source": "cache"}
+            if cached_analysis and rule_verdict is not None:
+                return {"valid": rule_verdict, "analysis": cached_analysis, "cached": True, "source": "rules"}
+
+            if cached_analysis:
+                is_valid = await self._llm_validate(job["description"], experience_years, required_skills)
+                return {"valid": is_valid, "analysis": cached_analysis, "cached": True, "source": "llm"}
+
+            analysis = await self._llm_analyze(
+                description=job["description"],
+                focus_areas=focus_areas,
+                summary_length=summary_length,
+                experience_years=experience_years,
+                required_skills=required_skills,
+                packed=packed_run
+            )
+            if analysis.get("error"):
+                raise RuntimeError(analysis["error"])
+            return {
+                "valid": analysis["valid"],
+                "analysis": self._extract_analysis_part(analysis),
+                "cached": False,
+                "source": "analysis"
+            }
+
+        outcomes = await asyncio.gather(
+            *(process(*args) for args in zip(jobs, cached_analyses, rule_verdicts, cached_verdicts, packed_runs)),
+            return_exceptions=True
+        )
+
+        results = []
+        to_cache = {}
+        new_verdicts = {}
+        for url, description, outcome in zip(urls, descriptions, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Error analyzing job for URL {url}: {str(outcome)}")
+                results.append({"url": url, "error": str(outcome)})
+                continue
+            if not outcome["cached"]:
+                to_cache[description] = outcome["analysis"]
+            if outcome["source"] in ("llm", "analysis"):
+                new_verdicts[description] = outcome["valid"]
+            self.validation_sources[outcome["source"]] += 1
+            results.append({
+                "url": url,
+                "valid": outcome["valid"],
+                "analysis": outcome["analysis"],
+                "validation_source": outcome["source"]
+            })
+
+        logger.info(f"Caching {len(to_cache)} new analyses from batch")
+        await self.cache.set_analyses(to_cache)
+        await self.cache.set_validations(new_verdicts, experience_years, required_skills)
+
+        logger.info(f"Batch job analysis completed for {len(jobs)} jobs")
+        return results
+
+    @staticmethod
+    def _analysis_key(
+        description: str,
+        focus_areas: Optional[List[str]],
+        summary_length: str,
+        experience_years: Optional[int],
+        required_skills: Optional[List[str]]
+    ) -> Tuple:
+        """Single-flight key for a full analysis of one job under one profile."""
+        return (
+            content_hash(description),
+            tuple(focus_areas or ['skills', 'requirements', 'culture']),
+            summary_length,
+            experience_years,
+            tuple(sorted(skill.strip().lower() for skill in required_skills or [])),
+        )
+
+    async def _llm_analyze(
+        self,
+        description: str,
+        focus_areas: Optional[List[str]],
+        summary_length: str,
+        experience_years: Optional[int],
+        required_skills: Optional[List[str]],
+        packed: Optional[Callable[[], Awaitable[Optional[Dict]]]] = None
+    ) -> Dict:
+        """
+        Full LLM analysis, coalesced per job and profile.
+        When packed is given the job's share of a packed request is used, and
+        the job is only analyzed on its own if that share comes back empty.
+        """
+        focus_areas = focus_areas or ['skills', 'requirements', 'culture']
+        key = self._analysis_key(description, focus_areas, summary_length, experience_years, required_skills)
+
+        async def run() -> Dict:
+            if packed is not None:
+                analysis = await packed()
+                if analysis is not None:
+                    return analysis
+            return await self.llm_client.analyze_job(
+                job_description=description,
+                focus_areas=focus_areas,
+                summary_length=summary_length,
+                experience_years=experience_years,
+                required_skills=required_skills
+            )
+
+        return await self.analysis_flights.do(key, run)
+
+    def _packed_analyze(
+        self,
+        descriptions: List[str],
+        focus_areas: Optional[List[str]],
+        summary_length: str,
+        experience_years: Optional[int],
+        required_skills: Optional[List[str]]
+    ) -> List[Optional[Callable[[], Awaitable[Optional[Dict]]]]]:
+        """
+        Start packed LLM requests for descriptions within LLM_PACK_TOKEN_BUDGET.
+        Returns, aligned with descriptions, a callable awaiting each job's
+        analysis from its pack (None where a pack failed or its reply skipped
+        or mangled that job), or None for jobs left to the single-job path.
+        A pack is cancelled once every job waiting on it has gone.
+        """
+        focus_areas = focus_areas or ['skills', 'requirements', 'culture']
+        packs = [pack for pack in pack_jobs(descriptions, settings.LLM_PACK_TOKEN_BUDGET, settings.LLM_PACK_MAX_JOBS)
+                 if len(pack) > 1]  # Single-job packs are not worth packing
+        logger.info(f"Packing {sum(len(pack) for pack in packs)}/{len(descriptions)} job analyses "
+                    f"into {len(packs)} LLM requests")
+
+        async def run(pack: List[int]) -> Dict[str, Dict]:
+            reply = await self.llm_client.analyze_jobs_packed(
+                jobs={str(n + 1): descriptions[i] for n, i in enumerate(pack)},
+                focus_areas=focus_areas,
+                summary_length=summary_length,
+                experience_years=experience_years,
+                required_skills=required_skills
+            )
+            logger.info(f"Packed analysis returned {len(reply)}/{len(pack)} jobs; retrying the rest individually")
+            return reply
+
+        def share(task: asyncio.Task, waiting: List[int], n: int) -> Callable[[], Awaitable[Optional[Dict]]]:
+            async def await_share() -> Optional[Dict]:
+                try:
+                    reply = await asyncio.shield(task)
+                except Exception as e:
+                    logger.error(f"Packed analysis request failed: {str(e)}")
+                    return None
+                finally:
+                    waiting[0] -= 1
+                    if waiting[0] == 0 and not task.done():
+                        task.cancel()
+                return reply.get(str(n + 1))
+            return await_share
+
+        runs: List[Optional[Callable[[], Awaitable[Optional[Dict]]]]] = [None] * len(descriptions)
+        for pack in packs:
+            task = asyncio.ensure_future(run(pack))
+            # Retrieve a failure even if no job is left to look at it
+            task.add_done_callback(lambda task: task.cancelled() or task.exception())
+            waiting = [len(pack)]
+            for n, i in enumerate(pack):
+                runs[i] = share(task, waiting, n)
+        return runs
+
+    async def _llm_validate(
+        self,
+        description: str,
+        experience_years: Optional[int],
+        required_skills: Optional[List[str]]
+    ) -> bool:
+        """LLM validation, coalesced per job and profile and queued ahead of bulk analyses."""
+        key = self.cache.validation_key(description, experience_years, required_skills)
+
+        async def run() -> bool:
+            with llm_priority(Priority.VALIDATION):
+                return await self.llm_client.validate_job(
+                    job_description=description,
+                    experience_years=experience_years,
+                    required_skills=required_skills
+                )
+
+        return await self.validation_flights.do(key, run)
+
+    def _rule_verdict(
+        self,
+        description: str,
+        experience_years: Optional[int],
+        required_skills: Optional[List[str]]
+    ) -> Optional[bool]:
+        """Local matcher verdict, or None when the case is ambiguous or the matcher is disabled."""
+        if not settings.MATCHER_ENABLED:
+            return None
+        decision = self.matcher.evaluate(description, experience_years, required_skills)
+        if decision.verdict is not None:
+            logger.debug(f"Matcher decided valid={decision.verdict}: {decision.reason}")
+        return decision.verdict
+
+    @staticmethod
+    def _extract_analysis_part(analysis: Dict) -> Dict:
+        """Strip the per-user validity flag, keeping only the cacheable analysis."""
+        return {
+            "summary": analysis["summary"],
+            "key_skills": analysis["key_skills"],
+            "required_experience": analysis["required_experience"],
+            "company_culture": analysis["company_culture"],
+            "estimated_salary_range": analysis["estimated_salary_range"]
+        }
@@ -0,0 +1,94 @@
+from typing import Any, Dict, List, Optional
+import json
+import numpy as np
+import pandas as pd
+import logging
+
+try:
+    import orjson
+except ImportError:  # Optional; the stdlib encoder is used when orjson is unavailable
+    orjson = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # Optional; Arrow responses are only offered when pyarrow is installed
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+def select_columns(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Keep only the wanted columns (in their given order); an empty list keeps everything."""
+    if not columns:
+        return df
+    return df[[column for column in columns if column in df.columns]]
+
+def _clean_column(series: pd.Series) -> np.ndarray:
+    """Object array with nulls as None and floats rendered as strings."""
+    values = series.to_numpy()
+    if pd.api.types.is_float_dtype(series.dtype):
+        missing = np.isnan(values)
+        # numpy renders floats with the shortest repr, the same as str()
+        cleaned = values.astype(str).astype(object)
+    else:
+        missing = series.isna().to_numpy()
+        if not missing.any():
+            return values
+        cleaned = values.astype(object)
+    cleaned[missing] = None
+    return cleaned
+
+def clean_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Column-at-a-time equivalent of replacing NaN with None and stringifying floats."""
+    return pd.DataFrame(
+        {column: _clean_column(df[column]) for column in df.columns},
+        index=df.index,
+        columns=df.columns
+    )
+
+def frame_to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Row dicts built from whole-column lists, which is much cheaper than
+    DataFrame.to_dict('records') and yields plain Python values.
+    """
+    columns = list(df.columns)
+    return [dict(zip(columns, row)) for row in zip(*(df[column].tolist() for column in columns))]
+
+def _default(value: Any) -> Any:
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+def dumps_json(data: Any) -> bytes:
+    """Serialize straight to JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, default=_default, separators=(",", ":")).encode()
+
+def arrow_available() -> bool:
+    return pa is not None
+
+def _arrow_column(values: List[Any]):
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed types, e.g. dates from a fresh scrape next to strings from the cache
+        return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+
+def records_to_arrow(records: List[Dict[str, Any]], columns: Optional[List[str]] = None) -> bytes:
+    """Encode records as an Arrow IPC stream."""
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+    if columns is None:
+        columns = list(records[0]) if records else []
+    table = pa.table({
+        column: _arrow_column([record.get(column) for record in records])
+        for column in columns
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
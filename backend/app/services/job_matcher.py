@@ -0,0 +1,184 @@
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+import re
+from app.config import get_settings
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Canonical skill -> aliases seen in postings. Matching is case-insensitive.
+SKILL_ALIASES: Dict[str, List[str]] = {
+    "kubernetes": ["k8s", "kube"],
+    "javascript": ["js", "ecmascript"],
+    "typescript": ["ts"],
+    "python": ["py", "python3"],
+    "golang": ["go lang"],
+    "postgresql": ["postgres", "psql"],
+    "mongodb": ["mongo"],
+    "amazon web services": ["aws"],
+    "google cloud platform": ["gcp", "google cloud"],
+    "microsoft azure": ["azure"],
+    "react": ["react.js", "reactjs"],
+    "node.js": ["node", "nodejs"],
+    "vue": ["vue.js", "vuejs"],
+    "angular": ["angularjs", "angular.js"],
+    "machine learning": ["ml"],
+    "artificial intelligence": ["ai"],
+    "natural language processing": ["nlp"],
+    "large language models": ["llm", "llms"],
+    "continuous integration": ["ci/cd", "ci", "cicd"],
+    "c++": ["cpp"],
+    "c#": ["csharp", "c sharp"],
+    ".net": ["dotnet"],
+    "elasticsearch": ["elastic search", "elk"],
+    "terraform": ["tf"],
+    "sql": ["mysql", "t-sql", "tsql"],
+    "rest": ["restful", "rest api", "rest apis"],
+    "graphql": ["gql"],
+    "ruby on rails": ["rails", "ror"],
+    "objective-c": ["objc", "objective c"],
+}
+
+# Terms that are also everyday words or too short to be telling ("go to
+# market", "the rest of the team", "TS" as a time zone). Finding one never
+# counts as a match; it only keeps the matcher from rejecting.
+AMBIGUOUS_TERMS = frozenset({
+    "go", "rest", "node", "react", "rails", "swift", "rust", "spring", "express", "kube",
+    "ts", "js", "ai", "ml", "ci", "tf", "elk", "gql", "ror",
+})
+
+_ALIAS_TO_CANONICAL: Dict[str, str] = {
+    alias: canonical
+    for canonical, aliases in SKILL_ALIASES.items()
+    for alias in [canonical, *aliases]
+}
+
+# Requirement phrasing only: "5+ years of experience", "3-5 years' relevant
+# experience", "at least 4 yrs Python experience". "Founded 25 years ago"
+# and similar company history do not match.
+_YEARS_RE = re.compile(
+    r"(?:at\s+least|minimum(?:\s+of)?|min\.?)?\s*(?<!\d)(\d{1,2})\s*\+?\s*"
+    r"(?:(?:-|–|to)\s*\d{1,2}\s*\+?\s*)?(?:years?|yrs?)"
+    r"(?:['’]|\s+of)?(?:\s+[\w+#./-]+)?\s+experience\b",
+    re.IGNORECASE
+)
+
+def canonical_skill(skill: str) -> str:
+    skill = skill.strip().lower()
+    return _ALIAS_TO_CANONICAL.get(skill, skill)
+
+class SkillAutomaton:
+    """
+    Aho–Corasick automaton over skill terms, so a description is scanned
+    once for every skill and alias at the same time. Matches only count at
+    word boundaries, so "go" does not match inside "good".
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[str]] = [[]]
+
+        for term in terms:
+            state = 0
+            for char in term:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append(term)
+
+        # Breadth-first construction of failure links; depth-1 states fail to the root
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, text: str) -> Set[str]:
+        """Return every term occurring in text at word boundaries."""
+        text = text.lower()
+        found: Set[str] = set()
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for term in self.output[state]:
+                start = end - len(term) + 1
+                before = text[start - 1] if start > 0 else " "
+                after = text[end + 1] if end + 1 < len(text) else " "
+                if not before.isalnum() and not after.isalnum():
+                    found.add(term)
+        return found
+
+@lru_cache(maxsize=256)
+def _automaton(extra_terms: FrozenSet[str]) -> SkillAutomaton:
+    return SkillAutomaton(set(_ALIAS_TO_CANONICAL) | extra_terms)
+
+@dataclass
+class MatchDecision:
+    verdict: Optional[bool]  # None means ambiguous: ask the LLM
+    reason: str
+    matched_skills: List[str] = field(default_factory=list)
+    required_years: Optional[int] = None
+
+class JobMatcher:
+    """
+    Deterministic job/profile matcher that rejects clear mismatches locally
+    and leaves everything else (verdict None) to the LLM. It never accepts
+    a job that has requirements to check, so it cannot overrule the model.
+    """
+
+    def extract_required_years(self, description: str) -> Optional[int]:
+        """Smallest "N years of experience" figure in the description."""
+        candidates = [int(match.group(1)) for match in _YEARS_RE.finditer(description)]
+        return min(candidates) if candidates else None
+
+    def match_skills(self, description: str, required_skills: List[str]) -> Tuple[List[str], List[str], List[str]]:
+        """
+        Split required skills into (matched, uncertain, missing), honouring
+        aliases. A skill only found through an ambiguous term is uncertain.
+        """
+        wanted = {canonical_skill(skill): skill for skill in required_skills if skill.strip()}
+        unknown = frozenset(canonical for canonical in wanted if canonical not in _ALIAS_TO_CANONICAL)
+        found: Dict[str, bool] = {}  # canonical -> found through an unambiguous term
+        for term in _automaton(unknown).find(description):
+            canonical = _ALIAS_TO_CANONICAL.get(term, term)
+            found[canonical] = found.get(canonical, False) or term not in AMBIGUOUS_TERMS
+        matched = [skill for canonical, skill in wanted.items() if found.get(canonical)]
+        uncertain = [skill for canonical, skill in wanted.items() if found.get(canonical) is False]
+        missing = [skill for canonical, skill in wanted.items() if canonical not in found]
+        return matched, uncertain, missing
+
+    def evaluate(
+        self,
+        description: str,
+        experience_years: Optional[int] = None,
+        required_skills: Optional[List[str]] = None
+    ) -> MatchDecision:
+        if experience_years is None and not required_skills:
+            return MatchDecision(True, "no profile requirements to check")
+
+        required_years = self.extract_required_years(description)
+        if (experience_years is not None and required_years is not None
+                and required_years > experience_years + settings.MATCHER_YEARS_TOLERANCE):
+            return MatchDecision(False, f"requires {required_years}+ years", required_years=required_years)
+
+        if not required_skills:
+            return MatchDecision(None, "ambiguous", required_years=required_years)
+
+        matched, uncertain, missing = self.match_skills(description, required_skills)
+        if not matched and not uncertain and len(description) >= settings.MATCHER_MIN_DESCRIPTION_CHARS:
+            return MatchDecision(False, "none of the required skills mentioned", required_years=required_years)
+        return MatchDecision(None, "ambiguous", matched_skills=matched, required_years=required_years)
@@ -1,9 +1,16 @@
-from typing import Dict, List
+from typing import AsyncIterator, Callable, Dict, List, Optional
+import asyncio
+import math
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from jobspy import scrape_jobs
 import pandas as pd
-import numpy as np
 import logging
 from app.config import get_settings
+from app.cache.job_scraping import ScrapeResultCache
+from app.services.job_frames import clean_frame, frame_to_records, select_columns
+from app.store.job_store import get_job_store, job_key
+from app.store.search_index import get_search_index
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -13,17 +20,26 @@ class JobScrapingService:
         logger.info("Initializing JobScrapingService...")
         self.settings = settings
         self.INVALID_JOB_BUFFER_FACTOR = 3  # Scrape 3 times more jobs to account for invalid ones
+        self.cache = ScrapeResultCache()
+        self.store = get_job_store() if settings.JOB_STORE_ENABLED else None
+        self.search_index = None
+        if self.store is not None and settings.SEARCH_INDEX_ENABLED:
+            self.search_index = get_search_index()
+            if not self.search_index.live_docs():
+                self.search_index.rebuild(self.store)
+            self.store.add_prune_listener(self.search_index.remove_jobs)
+        self.refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scrape-refresh")
         logger.info("JobScrapingService initialized successfully")
 
     def clean_job_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """Clean the DataFrame by handling NaN values."""
         logger.debug("Starting job data cleaning...")
-        # Replace NaN values with None (which will become null in JSON)
-        df = df.replace({np.nan: None})
-        
-        # Convert float values to strings to avoid precision issues
-        for col in df.select_dtypes(include=['float64']).columns:
-            df[col] = df[col].apply(lambda x: str(x) if x is not None else None)
+        # Drop unused columns first so nothing below touches them
+        df = select_columns(df, settings.SCRAPE_COLUMNS)
+
+        # NaN becomes None (null in JSON) and floats become strings to avoid
+        # precision issues, one whole column at a time
+        df = clean_frame(df)
         
         logger.debug(f"Data cleaning completed. DataFrame shape: {df.shape}")
         return df
@@ -34,53 +50,290 @@ class JobScrapingService:
         logger.debug(f"Location '{location}' mapped to country: {country}")
         return country
 
-    def scrape_jobs(self, params: Dict) -> List[Dict]:
-        """Scrape jobs based on provided parameters."""
+    def resolve_params(self, params: Dict) -> Dict:
+        """Apply defaults to raw request parameters."""
+        location = params.get('location', '')
+        site_name = params.get('site_name', self.settings.DEFAULT_SITE_NAME)
+        if isinstance(site_name, str):
+            site_name = [site_name]
+        return {
+            'search_term': params.get('search_term', ''),
+            'location': location,
+            'results_wanted': int(params.get('results_wanted', self.settings.DEFAULT_RESULTS_WANTED)),
+            'hours_old': int(params.get('hours_old', self.settings.DEFAULT_HOURS_OLD)),
+            'site_name': list(site_name),
+            'country_indeed': params.get('country_indeed') or self.get_country_from_location(location),
+        }
+
+    def scrape_site(self, site: str, resolved: Dict, hours_old: Optional[int] = None) -> pd.DataFrame:
+        """Scrape a single site, with the invalid-job buffer applied; hours_old narrows the window."""
+        # Calculate actual number of jobs to scrape with buffer
+        actual_results_wanted = int(resolved['results_wanted'] * self.INVALID_JOB_BUFFER_FACTOR)
+        logger.info(f"Scraping {actual_results_wanted} jobs from {site} to account for potential invalidations "
+                    f"(requested: {resolved['results_wanted']})")
+
+        return scrape_jobs(
+            site_name=[site],
+            search_term=resolved['search_term'],
+            location=resolved['location'],
+            results_wanted=actual_results_wanted,
+            hours_old=hours_old or resolved['hours_old'],
+            country_indeed=resolved['country_indeed'],
+            linkedin_fetch_description=True
+        )
+
+    def scrape_jobs(
+        self,
+        params: Dict,
+        progress_callback: Optional[Callable[[str, int], None]] = None
+    ) -> List[Dict]:
+        """
+        Scrape jobs based on provided parameters.
+        Results are served from the scrape cache when possible; aging entries
+        are returned immediately while a background refresh re-scrapes them.
+        Sites are scraped in parallel; progress_callback, if given, is called
+        with (site, jobs_found) as each site finishes and may raise to abort.
+        """
         try:
             logger.info("Starting job scraping process")
             logger.debug(f"Input parameters: {params}")
-            
-            # Extract parameters with defaults
-            search_term = params.get('search_term', '')
-            location = params.get('location', '')
-            results_wanted = int(params.get('results_wanted', self.settings.DEFAULT_RESULTS_WANTED))
-            hours_old = int(params.get('hours_old', self.settings.DEFAULT_HOURS_OLD))
-            site_name = params.get('site_name', self.settings.DEFAULT_SITE_NAME)
-            
-            # Calculate actual number of jobs to scrape with buffer
-            actual_results_wanted = int(results_wanted * self.INVALID_JOB_BUFFER_FACTOR)
-            logger.info(f"Scraping {actual_results_wanted} jobs to account for potential invalidations (requested: {results_wanted})")
-            
-            # Determine country based on location
-            country_indeed = params.get('country_indeed') or self.get_country_from_location(location)
-            logger.info(f"Using country '{country_indeed}' for Indeed scraping")
-            
-            # Scrape jobs
-            logger.info("Initiating job scraping...")
-            jobs_df = scrape_jobs(
-                site_name=site_name,
-                search_term=search_term,
-                location=location,
-                results_wanted=actual_results_wanted,
-                hours_old=hours_old,
-                country_indeed=country_indeed,
-                linkedin_fetch_description=True
-            )
-            
-            logger.info(f"Scraping completed. Found {len(jobs_df)} jobs")
-            
-            # Clean and format the data
-            logger.info("Cleaning and formatting job data...")
-            jobs_df = self.clean_job_data(jobs_df)
-            
-            # Limit to requested number of jobs
-            if len(jobs_df) > results_wanted:
-                jobs_df = jobs_df.head(results_wanted)
-                logger.info(f"Limited results to requested {results_wanted} jobs")
-            
-            logger.info("Job scraping process completed successfully")
-            return jobs_df.to_dict('records')
-            
+
+            resolved = self.resolve_params(params)
+
+            jobs = self.cached_results(resolved)
+            if jobs is not None:
+                if progress_callback:
+                    for site in resolved['site_name']:
+                        progress_callback(site, sum(1 for job in jobs if job.get('site') == site))
+                return jobs
+
+            jobs = self.scrape_resolved(resolved, progress_callback)
+            self.cache.set_results(resolved, jobs)
+            return jobs
+
         except Exception as e:
             logger.error(f"Error during job scraping: {str(e)}", exc_info=True)
-            raise 
\ No newline at end of file
+            raise
+
+    def cached_results(self, resolved: Dict) -> Optional[List[Dict]]:
+        """Cached jobs for a search, scheduling a background refresh when aging, or None on a miss."""
+        cached = self.cache.get_results(resolved)
+        if cached is None:
+            return None
+        jobs, needs_refresh = cached
+        jobs = jobs[:resolved['results_wanted']]
+        logger.info(f"Serving {len(jobs)} jobs from scrape cache")
+        if needs_refresh:
+            self.schedule_refresh(resolved)
+        return jobs
+
+    def schedule_refresh(self, resolved: Dict) -> None:
+        """Re-scrape a cached search in the background, once across all workers."""
+        if not self.cache.acquire_refresh_lock(resolved):
+            logger.debug("Background refresh already in progress")
+            return
+
+        def refresh() -> None:
+            try:
+                logger.info("Refreshing cached scrape results in background")
+                self.cache.set_results(resolved, self.scrape_resolved(resolved))
+            except Exception as e:
+                logger.error(f"Error refreshing cached scrape results: {str(e)}", exc_info=True)
+            finally:
+                self.cache.release_refresh_lock(resolved)
+
+        self.refresh_executor.submit(refresh)
+
+    def scrape_resolved(
+        self,
+        resolved: Dict,
+        progress_callback: Optional[Callable[[str, int], None]] = None
+    ) -> List[Dict]:
+        """Scrape all sites for already-resolved parameters, bypassing the cache."""
+        results_wanted = resolved['results_wanted']
+        logger.info(f"Using country '{resolved['country_indeed']}' for Indeed scraping")
+
+        # Scrape each site in its own thread so progress can be reported per site
+        logger.info(f"Initiating job scraping for sites: {resolved['site_name']}")
+        jobs: List[Dict] = []
+        executor = ThreadPoolExecutor(max_workers=len(resolved['site_name']) or 1)
+        try:
+            futures = {
+                executor.submit(self.scrape_site_records, site, resolved): site
+                for site in resolved['site_name']
+            }
+            for future in as_completed(futures):
+                site = futures[future]
+                site_jobs = future.result()
+                logger.info(f"Scraping completed for {site}. Found {len(site_jobs)} jobs")
+                jobs.extend(site_jobs)
+                if progress_callback:
+                    progress_callback(site, len(site_jobs))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        logger.info(f"Scraping completed. Found {len(jobs)} jobs")
+
+        # Limit to requested number of jobs
+        if len(jobs) > results_wanted:
+            jobs = jobs[:results_wanted]
+            logger.info(f"Limited results to requested {results_wanted} jobs")
+
+        logger.info("Job scraping process completed successfully")
+        return jobs
+
+    def delta_hours(self, site: str, resolved: Dict) -> Optional[int]:
+        """
+        Hours to scrape when this query was scraped recently enough that only
+        postings newer than its watermark are missing, or None for a full scrape.
+        """
+        if self.store is None or not settings.DELTA_SCRAPE_ENABLED:
+            return None
+        watermark = self.store.get_watermark(
+            resolved['search_term'], resolved['location'], site, resolved['country_indeed']
+        )
+        if watermark is None or watermark['results_wanted'] < resolved['results_wanted']:
+            return None
+        # Stored postings must reach back as far as the requested window
+        if watermark['covered_from'] > time.time() - resolved['hours_old'] * 3600:
+            return None
+
+        elapsed_hours = (time.time() - watermark['scraped_at']) / 3600
+        hours = math.ceil(elapsed_hours + settings.DELTA_SCRAPE_OVERLAP_HOURS)
+        return hours if hours < resolved['hours_old'] else None
+
+    def scrape_site_records(self, site: str, resolved: Dict) -> List[Dict]:
+        """
+        Scrape and clean a single site, returning JSON-ready records.
+        A query scraped recently only fetches postings newer than its
+        watermark and fills in the rest from the job store.
+        """
+        delta_hours = self.delta_hours(site, resolved)
+        if delta_hours is not None:
+            logger.info(f"Delta scraping {site}: last {delta_hours}h instead of {resolved['hours_old']}h")
+
+        started = time.time()
+        site_df = self.clean_job_data(self.scrape_site(site, resolved, hours_old=delta_hours))
+        jobs = frame_to_records(site_df)
+        self.store_jobs(jobs, resolved)
+        if self.store is None:
+            return jobs
+
+        hours_scraped = delta_hours or resolved['hours_old']
+        covered_from = started - hours_scraped * 3600
+        if delta_hours is not None:
+            watermark = self.store.get_watermark(
+                resolved['search_term'], resolved['location'], site, resolved['country_indeed']
+            )
+            covered_from = min(covered_from, watermark['covered_from']) if watermark else covered_from
+        self.store.set_watermark(
+            resolved['search_term'], resolved['location'], site, resolved['country_indeed'],
+            scraped_at=started,
+            covered_from=covered_from,
+            results_wanted=resolved['results_wanted'],
+            jobs=jobs
+        )
+
+        if delta_hours is not None:
+            jobs = self.merge_stored(jobs, site, resolved)
+        return jobs
+
+    def merge_stored(self, jobs: List[Dict], site: str, resolved: Dict) -> List[Dict]:
+        """Fresh postings first, then stored ones from the requested window that the delta did not return."""
+        limit = int(resolved['results_wanted'] * self.INVALID_JOB_BUFFER_FACTOR)
+        try:
+            stored = self.store.query_jobs(
+                resolved['search_term'], resolved['location'], site,
+                since=time.time() - resolved['hours_old'] * 3600,
+                limit=limit
+            )
+        except Exception as e:
+            logger.error(f"Error reading stored jobs for {site}: {str(e)}", exc_info=True)
+            stored = []
+        seen = {job_key(job) for job in jobs}
+        merged = jobs + [job for job in stored if job_key(job) not in seen]
+        logger.info(f"Merged {len(jobs)} new jobs from {site} with {len(merged) - len(jobs)} stored jobs")
+        return merged[:limit]
+
+    def store_jobs(self, jobs: List[Dict], resolved: Dict) -> None:
+        """Keep freshly scraped postings in the local job store and search index."""
+        if self.store is not None and jobs:
+            # The store is a local copy; failing to write it must not fail the scrape
+            try:
+                stored = self.store.upsert_jobs(jobs, resolved['search_term'], resolved['location'])
+                logger.info(f"Stored {stored} jobs in the job store")
+            except Exception as e:
+                logger.error(f"Error updating job store: {str(e)}", exc_info=True)
+        if self.search_index is not None and jobs:
+            try:
+                self.search_index.add_jobs(jobs)
+            except Exception as e:
+                logger.error(f"Error updating search index: {str(e)}", exc_info=True)
+
+    async def stream_jobs(
+        self,
+        params: Dict,
+        submit: Callable[..., Future]
+    ) -> AsyncIterator[Dict]:
+        """
+        Scrape every site in parallel and yield events as each site finishes:
+        {"event": "jobs", "site", "jobs"} per site batch, {"event": "error",
+        "site", "detail"} if a site fails, and a final {"event": "done", "total"}.
+        results_wanted is enforced across all sites combined.
+        Cached results are streamed per site without scraping. Each site runs
+        through submit(func, *args), which returns a Future, so streams share
+        the scrape pool with queued scrapes.
+        """
+        resolved = self.resolve_params(params)
+        results_wanted = resolved['results_wanted']
+        loop = asyncio.get_running_loop()
+
+        # The scrape cache uses blocking Redis calls, so keep it off the event loop
+        cached = await loop.run_in_executor(None, self.cached_results, resolved)
+        if cached is not None:
+            for site in resolved['site_name']:
+                records = [job for job in cached if job.get('site') == site]
+                if records:
+                    yield {"event": "jobs", "site": site, "jobs": records}
+            yield {"event": "done", "total": len(cached)}
+            return
+
+        logger.info(f"Starting streamed job scraping for sites: {resolved['site_name']}")
+        tasks = {
+            asyncio.wrap_future(submit(self.scrape_site_records, site, resolved)): site
+            for site in resolved['site_name']
+        }
+        jobs: List[Dict] = []
+        failed = False
+        try:
+            pending = set(tasks)
+            while pending and len(jobs) < results_wanted:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    site = tasks[task]
+                    try:
+                        records = task.result()
+                    except Exception as e:
+                        logger.error(f"Error scraping {site}: {str(e)}", exc_info=True)
+                        failed = True
+                        yield {"event": "error", "site": site, "detail": str(e)}
+                        continue
+
+                    records = records[:results_wanted - len(jobs)]
+                    jobs.extend(records)
+                    logger.info(f"Streaming {len(records)} jobs from {site} ({len(jobs)}/{results_wanted})")
+                    if records:
+                        yield {"event": "jobs", "site": site, "jobs": records}
+                    if len(jobs) >= results_wanted:
+                        break
+
+            # Sites finish in the same order scrape_resolved would see them,
+            # so the first results_wanted jobs match what it would cache
+            if not failed:
+                await loop.run_in_executor(None, self.cache.set_results, resolved, jobs)
+            logger.info(f"Streamed job scraping completed. Sent {len(jobs)} jobs")
+            yield {"event": "done", "total": len(jobs)}
+        finally:
+            # Sites still queued never start once their future is cancelled;
+            # running threads cannot be interrupted and finish into the store
+            for task in tasks:
+                task.cancel()
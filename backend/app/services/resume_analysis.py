@@ -1,71 +1,191 @@
-from typing import Dict
+from typing import Dict, List, Optional, Set
+from concurrent.futures import Future, ProcessPoolExecutor
+import asyncio
 import logging
+import multiprocessing
+from app.cache.resume_analysis import ResumeAnalysisCache, file_hash
+from app.config import get_settings
 from app.llm.client import get_llm_client
 from app.llm.prompts import get_resume_analysis_prompt
+from app.llm.scheduler import Priority, llm_priority
 import fitz  # PyMuPDF
 import docx
 import io
 import json
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+PDF_TYPE = "application/pdf"
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+class ResumeTooLargeError(ValueError):
+    """The uploaded file exceeds RESUME_MAX_BYTES."""
+
+class ResumeExtractionTimeoutError(Exception):
+    """Text extraction took longer than RESUME_EXTRACTION_TIMEOUT."""
+
+# Extraction runs in worker processes, so these are module-level functions
+
+def extract_pdf_text(file_content: bytes, max_pages: int, max_chars: int) -> str:
+    """Collect text page by page, stopping at max_pages or once max_chars are gathered."""
+    parts: List[str] = []
+    collected = 0
+    with fitz.open(stream=io.BytesIO(file_content), filetype="pdf") as doc:
+        for page_number in range(min(doc.page_count, max_pages)):
+            text = doc.load_page(page_number).get_text()
+            parts.append(text)
+            collected += len(text)
+            if collected >= max_chars:
+                break
+    return "".join(parts)[:max_chars]
+
+def extract_docx_text(file_content: bytes, max_chars: int) -> str:
+    """Collect paragraph text, stopping once max_chars are gathered."""
+    parts: List[str] = []
+    collected = 0
+    for paragraph in docx.Document(io.BytesIO(file_content)).paragraphs:
+        parts.append(paragraph.text + "\n")
+        collected += len(parts[-1])
+        if collected >= max_chars:
+            break
+    return "".join(parts)[:max_chars]
 
 class ResumeAnalysisService:
     def __init__(self):
         logger.info("Initializing ResumeAnalysisService...")
         self.llm_client = get_llm_client()
+        self.cache = ResumeAnalysisCache()
+        self.extraction_pool: Optional[ProcessPoolExecutor] = None
+        # Calls still running in each pool, and pools waiting for theirs to finish
+        self.pool_calls: Dict[ProcessPoolExecutor, Set[Future]] = {}
+        self.retiring_pools: Set[ProcessPoolExecutor] = set()
+        self.retire_tasks: Set[asyncio.Task] = set()
         logger.info("ResumeAnalysisService initialized successfully")
 
-    def extract_text_from_pdf(self, file_content: bytes) -> str:
-        """Extract text from PDF file using PyMuPDF."""
+    def _pool(self) -> ProcessPoolExecutor:
+        """Started lazily; spawned workers are recycled so a bad file cannot leak memory for long."""
+        if self.extraction_pool is None:
+            self.extraction_pool = ProcessPoolExecutor(
+                max_workers=settings.RESUME_EXTRACTION_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=settings.RESUME_EXTRACTION_TASKS_PER_WORKER
+            )
+        return self.extraction_pool
+
+    async def _retire_pool(self, pool: ProcessPoolExecutor, hung: Future) -> None:
+        """
+        Stop using a pool whose worker is stuck, e.g. on a malicious file.
+        New calls go to a fresh pool at once; the old one's processes are
+        killed only after its other in-flight calls have finished, each being
+        bounded by its own timeout, so one bad file does not fail the rest.
+        """
+        if self.extraction_pool is pool:
+            self.extraction_pool = None
+        if pool in self.retiring_pools:
+            return
+        self.retiring_pools.add(pool)
         try:
-            pdf_file = io.BytesIO(file_content)
-            doc = fitz.open(stream=pdf_file, filetype="pdf")
-            text = ""
-            for page in doc:
-                text += page.get_text()
-            doc.close()
-            return text
-        except Exception as e:
-            logger.error(f"Error extracting text from PDF: {str(e)}")
-            raise
+            running = [
+                asyncio.wrap_future(future) for future in self.pool_calls.get(pool, ())
+                if future is not hung and not future.done()
+            ]
+            if running:
+                await asyncio.wait(running, timeout=settings.RESUME_EXTRACTION_TIMEOUT)
+        finally:
+            self._kill_pool(pool)
+            self.retiring_pools.discard(pool)
+
+    def _kill_pool(self, pool: ProcessPoolExecutor) -> None:
+        # ProcessPoolExecutor cannot cancel a running call, so stop its processes directly
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+        self.pool_calls.pop(pool, None)
 
-    def extract_text_from_docx(self, file_content: bytes) -> str:
-        """Extract text from DOCX file."""
+    def shutdown(self) -> None:
+        if self.extraction_pool is not None:
+            self.extraction_pool.shutdown(wait=False, cancel_futures=True)
+            self.extraction_pool = None
+        for pool in list(self.retiring_pools):
+            self._kill_pool(pool)
+
+    async def extract_text(self, file_content: bytes, file_type: str) -> str:
+        """
+        Extract resume text in the process pool, off the event loop.
+        Raises ResumeTooLargeError, ResumeExtractionTimeoutError, or
+        ValueError for unsupported file types.
+        """
+        if len(file_content) > settings.RESUME_MAX_BYTES:
+            raise ResumeTooLargeError(
+                f"Resume is {len(file_content)} bytes (max {settings.RESUME_MAX_BYTES})"
+            )
+
+        if file_type == PDF_TYPE:
+            args = (extract_pdf_text, file_content, settings.RESUME_MAX_PAGES, settings.RESUME_MAX_CHARS)
+        elif file_type == DOCX_TYPE:
+            args = (extract_docx_text, file_content, settings.RESUME_MAX_CHARS)
+        else:
+            raise ValueError(f"Unsupported file type: {file_type}")
+
+        pool = self._pool()
+        future = pool.submit(*args)
+        calls = self.pool_calls.setdefault(pool, set())
+        calls.add(future)
+        future.add_done_callback(calls.discard)
         try:
-            docx_file = io.BytesIO(file_content)
-            doc = docx.Document(docx_file)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
+            return await asyncio.wait_for(asyncio.wrap_future(future), settings.RESUME_EXTRACTION_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error(f"Resume text extraction timed out after {settings.RESUME_EXTRACTION_TIMEOUT}s")
+            task = asyncio.create_task(self._retire_pool(pool, future))
+            self.retire_tasks.add(task)
+            task.add_done_callback(self.retire_tasks.discard)
+            raise ResumeExtractionTimeoutError(
+                f"Resume could not be processed within {settings.RESUME_EXTRACTION_TIMEOUT}s"
+            )
         except Exception as e:
-            logger.error(f"Error extracting text from DOCX: {str(e)}")
+            logger.error(f"Error extracting text from resume: {str(e)}")
             raise
 
     async def analyze_resume(self, file_content: bytes, file_type: str) -> Dict:
         """Analyze resume and extract job search parameters."""
         try:
             logger.info("Starting resume analysis")
-            
-            # Extract text based on file type
-            if file_type == "application/pdf":
-                text = self.extract_text_from_pdf(file_content)
-            elif file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-                text = self.extract_text_from_docx(file_content)
-            else:
+
+            # Reject oversized or unsupported files before hashing them
+            if len(file_content) > settings.RESUME_MAX_BYTES:
+                raise ResumeTooLargeError(
+                    f"Resume is {len(file_content)} bytes (max {settings.RESUME_MAX_BYTES})"
+                )
+            if file_type not in (PDF_TYPE, DOCX_TYPE):
                 raise ValueError(f"Unsupported file type: {file_type}")
 
+            digest = file_hash(file_content)
+            cached_params = await self.cache.get_params(digest)
+            if cached_params is not None:
+                logger.info("Resume analysis served from cache")
+                return cached_params
+
+            text = await self.cache.get_text(digest)
+            if text is None:
+                # Extract text in a worker process
+                text = await self.extract_text(file_content, file_type)
+                await self.cache.set_text(digest, text)
+
             # Get the analysis prompt
             prompt = get_resume_analysis_prompt(text)
             
-            # Generate response with lower temperature for more focused output
-            response = await self.llm_client.generate(
-                prompt=prompt,
-                temperature=0.3
-            )
+            # Generate response with lower temperature for more focused output;
+            # a user is waiting, so this goes ahead of bulk job analysis
+            with llm_priority(Priority.INTERACTIVE):
+                response = await self.llm_client.generate(
+                    prompt=prompt,
+                    temperature=0.3
+                )
             
             # Parse the response
             parsed_response = self.parse_resume_analysis(response)
+            await self.cache.set_params(digest, parsed_response)
             
             logger.info("Resume analysis completed successfully")
             return parsed_response
@@ -0,0 +1,190 @@
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+import threading
+import time
+import uuid
+import logging
+from app.config import get_settings
+from app.services.job_scraping import JobScrapingService
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+class ScrapeJobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class ScrapeQueueFullError(Exception):
+    """Raised when too many scrape jobs are already waiting to run."""
+
+class ScrapeCancelledError(Exception):
+    """Raised inside a worker to abandon a scrape that was cancelled."""
+
+@dataclass
+class ScrapeJob:
+    id: str
+    params: Dict
+    status: ScrapeJobStatus = ScrapeJobStatus.PENDING
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: Dict[str, int] = field(default_factory=dict)
+    result: Optional[List[Dict]] = None
+    error: Optional[str] = None
+    future: Optional[Future] = field(default=None, repr=False)
+    cancel_requested: bool = False
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (ScrapeJobStatus.COMPLETED, ScrapeJobStatus.FAILED, ScrapeJobStatus.CANCELLED)
+
+    def to_dict(self) -> Dict:
+        """Public view of the job; the result is only included once completed."""
+        data = {
+            "job_id": self.id,
+            "status": self.status.value,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": dict(self.progress),
+            "jobs_found": sum(self.progress.values()),
+            "error": self.error,
+        }
+        if self.status == ScrapeJobStatus.COMPLETED:
+            data["result"] = self.result
+        return data
+
+class ScrapeJobManager:
+    """
+    Runs blocking jobspy scrapes in a dedicated thread pool so they never
+    occupy the event loop. At most SCRAPE_MAX_CONCURRENCY scrapes run at
+    once, and at most SCRAPE_MAX_QUEUED may wait behind them.
+    Finished jobs are kept for SCRAPE_JOB_TTL seconds for polling.
+    """
+
+    def __init__(self, scraping_service: JobScrapingService):
+        logger.info("Initializing ScrapeJobManager...")
+        self.scraping_service = scraping_service
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.SCRAPE_MAX_CONCURRENCY,
+            thread_name_prefix="scrape"
+        )
+        self.jobs: Dict[str, ScrapeJob] = {}
+        # Streamed site scrapes submitted but not yet started
+        self.queued_calls = 0
+        self.lock = threading.Lock()
+        logger.info(f"ScrapeJobManager initialized with {settings.SCRAPE_MAX_CONCURRENCY} workers")
+
+    def submit(self, params: Dict) -> ScrapeJob:
+        """Queue a scrape and return its job handle immediately."""
+        with self.lock:
+            self._check_capacity()
+            job = ScrapeJob(id=uuid.uuid4().hex, params=params)
+            self.jobs[job.id] = job
+
+        job.future = self.executor.submit(self._run, job)
+        logger.info(f"Queued scrape job {job.id}")
+        return job
+
+    def stream(self, params: Dict) -> AsyncIterator[Dict]:
+        """
+        Streamed counterpart of submit(): the scrape's sites run in the same
+        thread pool and wait under the same queue limit. The limit is checked
+        here, so a full queue is rejected before any response has started.
+        """
+        with self.lock:
+            self._check_capacity()
+        return self.scraping_service.stream_jobs(params, submit=self._submit_call)
+
+    def _submit_call(self, func: Callable, *args) -> Future:
+        """Run one call in the scrape pool; it counts as queued until it starts."""
+        with self.lock:
+            self.queued_calls += 1
+
+        def run():
+            self._dequeue_call()
+            return func(*args)
+
+        future = self.executor.submit(run)
+        # A cancelled call never started, so it is still counted as queued
+        future.add_done_callback(lambda f: self._dequeue_call() if f.cancelled() else None)
+        return future
+
+    def _dequeue_call(self) -> None:
+        with self.lock:
+            self.queued_calls -= 1
+
+    def get(self, job_id: str) -> Optional[ScrapeJob]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[ScrapeJob]:
+        """
+        Cancel a scrape. Pending jobs never start; running jobs stop at the
+        next site boundary and their partial results are discarded.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+
+        job.cancel_requested = True
+        if job.future is not None and job.future.cancel():
+            self._finish(job, ScrapeJobStatus.CANCELLED)
+        logger.info(f"Cancellation requested for scrape job {job_id}")
+        return job
+
+    def shutdown(self) -> None:
+        logger.info("Shutting down ScrapeJobManager...")
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: ScrapeJob) -> List[Dict]:
+        if job.cancel_requested:
+            self._finish(job, ScrapeJobStatus.CANCELLED)
+            raise ScrapeCancelledError(job.id)
+
+        job.status = ScrapeJobStatus.RUNNING
+        job.started_at = time.time()
+        logger.info(f"Running scrape job {job.id}")
+
+        def on_progress(site: str, jobs_found: int) -> None:
+            job.progress[site] = jobs_found
+            if job.cancel_requested:
+                raise ScrapeCancelledError(job.id)
+
+        try:
+            job.result = self.scraping_service.scrape_jobs(job.params, progress_callback=on_progress)
+            self._finish(job, ScrapeJobStatus.COMPLETED)
+            return job.result
+        except ScrapeCancelledError:
+            self._finish(job, ScrapeJobStatus.CANCELLED)
+            raise
+        except Exception as e:
+            job.error = str(e)
+            self._finish(job, ScrapeJobStatus.FAILED)
+            raise
+
+    def _finish(self, job: ScrapeJob, status: ScrapeJobStatus) -> None:
+        job.status = status
+        job.finished_at = time.time()
+        logger.info(f"Scrape job {job.id} {status.value}")
+
+    def _check_capacity(self) -> None:
+        """Raise ScrapeQueueFullError if too many scrapes are waiting. Caller holds the lock."""
+        self._prune()
+        pending = self.queued_calls + sum(1 for job in self.jobs.values() if job.status == ScrapeJobStatus.PENDING)
+        if pending >= settings.SCRAPE_MAX_QUEUED:
+            raise ScrapeQueueFullError(f"Too many queued scrapes ({pending})")
+
+    def _prune(self) -> None:
+        """Drop finished jobs older than SCRAPE_JOB_TTL. Caller holds the lock."""
+        cutoff = time.time() - settings.SCRAPE_JOB_TTL
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished and job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
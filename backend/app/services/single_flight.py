@@ -0,0 +1,64 @@
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key within this process.
+    The first caller starts the work as a task; every concurrent caller with
+    the same key awaits that task instead of starting its own.
+    A cancelled caller never cancels the work for the others; the task is
+    only cancelled once its last waiter has gone. Errors reach every waiter,
+    and the key is released as soon as the task finishes, so nothing leaks.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls: Dict[Hashable, _Call] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self.calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self.calls[key] = call
+            self.started += 1
+            call.task.add_done_callback(lambda task: self._release(key, call))
+        else:
+            self.coalesced += 1
+            logger.debug(f"Coalesced {self.name} call onto in-flight request")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                logger.debug(f"Last waiter for {self.name} call cancelled; cancelling request")
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            f"{self.name}_started": self.started,
+            f"{self.name}_coalesced": self.coalesced,
+            f"{self.name}_in_flight": len(self.calls),
+        }
+
+    def _release(self, key: Hashable, call: _Call) -> None:
+        if self.calls.get(key) is call:
+            del self.calls[key]
+        # Mark the outcome as retrieved even if every waiter has already gone
+        if not call.task.cancelled():
+            call.task.exception()
@@ -0,0 +1,364 @@
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from app.config import get_settings
+from app.services.job_frames import dumps_json
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Bump when the schema changes; older tables other than jobs are rebuilt
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    site TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    title TEXT,
+    company TEXT,
+    location TEXT,
+    date_posted TEXT,
+    posted_at REAL NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (site, job_id)
+);
+CREATE TABLE IF NOT EXISTS job_searches (
+    search_term TEXT NOT NULL,
+    location TEXT NOT NULL,
+    site TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (search_term, location, site, job_id)
+);
+CREATE TABLE IF NOT EXISTS scrape_watermarks (
+    search_term TEXT NOT NULL,
+    location TEXT NOT NULL,
+    site TEXT NOT NULL,
+    country TEXT NOT NULL,
+    scraped_at REAL NOT NULL,
+    covered_from REAL NOT NULL,
+    results_wanted INTEGER NOT NULL,
+    newest_posted TEXT,
+    PRIMARY KEY (search_term, location, site, country)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_site ON jobs (site);
+CREATE INDEX IF NOT EXISTS idx_jobs_location ON jobs (location COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_jobs_posted_at ON jobs (posted_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_last_seen ON jobs (last_seen);
+CREATE INDEX IF NOT EXISTS idx_job_searches_job ON job_searches (site, job_id);
+"""
+
+UPSERT_JOB = """
+INSERT INTO jobs (site, job_id, title, company, location, date_posted, posted_at, first_seen, last_seen, data)
+VALUES (:site, :job_id, :title, :company, :location, :date_posted, :posted_at, :seen, :seen, :data)
+ON CONFLICT (site, job_id) DO UPDATE SET
+    title = excluded.title,
+    company = excluded.company,
+    location = excluded.location,
+    date_posted = COALESCE(excluded.date_posted, jobs.date_posted),
+    posted_at = CASE WHEN excluded.date_posted IS NOT NULL THEN excluded.posted_at ELSE jobs.posted_at END,
+    last_seen = excluded.last_seen,
+    data = excluded.data
+"""
+
+UPSERT_SEARCH = """
+INSERT INTO job_searches (search_term, location, site, job_id, last_seen) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (search_term, location, site, job_id) DO UPDATE SET last_seen = excluded.last_seen
+"""
+
+UPSERT_WATERMARK = """
+INSERT INTO scrape_watermarks
+    (search_term, location, site, country, scraped_at, covered_from, results_wanted, newest_posted)
+VALUES (:search_term, :location, :site, :country, :scraped_at, :covered_from, :results_wanted, :newest_posted)
+ON CONFLICT (search_term, location, site, country) DO UPDATE SET
+    scraped_at = excluded.scraped_at,
+    covered_from = excluded.covered_from,
+    results_wanted = excluded.results_wanted,
+    newest_posted = NULLIF(MAX(COALESCE(excluded.newest_posted, ''), COALESCE(scrape_watermarks.newest_posted, '')), '')
+"""
+
+def normalize_search_term(search_term: str) -> str:
+    """Also used for locations: case and spacing do not change what a scrape finds."""
+    return " ".join(search_term.lower().split())
+
+def job_key(job: Dict) -> Optional[str]:
+    """A posting's id on its site, falling back to a hash of its URL."""
+    if job.get('id'):
+        return str(job['id'])
+    url = job.get('job_url') or job.get('job_url_direct')
+    return hashlib.sha256(url.encode()).hexdigest()[:32] if url else None
+
+def _posted_date(value) -> Optional[str]:
+    """ISO date of a posting; jobspy gives dates, cached results give strings."""
+    if not value:
+        return None
+    text = value.isoformat() if hasattr(value, "isoformat") else str(value)
+    try:
+        return datetime.date.fromisoformat(text[:10]).isoformat()
+    except ValueError:
+        return None
+
+def _day_start(date_text: str) -> float:
+    day = datetime.date.fromisoformat(date_text)
+    return datetime.datetime(day.year, day.month, day.day, tzinfo=datetime.timezone.utc).timestamp()
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+class JobStore:
+    """
+    Embedded SQLite store of every scraped posting, upserted by site + job id,
+    so searches can be answered locally without re-scraping. Each posting
+    remembers which searches (term and location) found it, and each search
+    keeps a per-site watermark for delta scraping. Posting dates only have day
+    precision, so postings without one are dated by when they were first seen.
+    Postings not seen for JOB_STORE_RETENTION_DAYS are pruned, and prune
+    listeners (e.g. the search index) are told which.
+    Safe to share between threads; write failures are logged, not raised.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        logger.info("Initializing JobStore...")
+        self.path = path or settings.JOB_STORE_PATH
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.prune_listeners: List[Callable[[List[Tuple[str, str]]], None]] = []
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        logger.info(f"JobStore initialized successfully ({self.path})")
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+    def _migrate(self) -> None:
+        (version,) = self.connection.execute("PRAGMA user_version").fetchone()
+        if version < SCHEMA_VERSION:
+            # Only search memberships and watermarks change shape; postings are kept
+            logger.info(f"Upgrading job store schema from version {version} to {SCHEMA_VERSION}")
+            self.connection.executescript("DROP TABLE IF EXISTS job_searches; DROP TABLE IF EXISTS scrape_watermarks;")
+        self.connection.executescript(SCHEMA)
+        self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def upsert_jobs(self, jobs: Iterable[Dict], search_term: str = "", location: str = "") -> int:
+        """
+        Insert or refresh postings and record that a search for search_term in
+        location found them. Returns the number stored.
+        """
+        now = time.time()
+        term = normalize_search_term(search_term)
+        place = normalize_search_term(location)
+        job_rows = []
+        search_rows = []
+        for job in jobs:
+            key = job_key(job)
+            if not job.get('site') or key is None:
+                continue
+            date_posted = _posted_date(job.get('date_posted'))
+            job_rows.append({
+                "site": job['site'],
+                "job_id": key,
+                "title": job.get('title'),
+                "company": job.get('company'),
+                "location": job.get('location'),
+                "date_posted": date_posted,
+                "posted_at": _day_start(date_posted) if date_posted else now,
+                "seen": now,
+                "data": dumps_json(job),
+            })
+            search_rows.append((term, place, job['site'], key, now))
+
+        if not job_rows:
+            return 0
+        try:
+            with self.lock, self.connection:
+                self.connection.executemany(UPSERT_JOB, job_rows)
+                self.connection.executemany(UPSERT_SEARCH, search_rows)
+                pruned = self._prune(now)
+            logger.debug(f"Stored {len(job_rows)} jobs for search term '{term}'")
+        except Exception as e:
+            logger.error(f"Error storing jobs: {str(e)}", exc_info=True)
+            return 0
+        if pruned:
+            logger.info(f"Pruned {len(pruned)} jobs past retention from the job store")
+            self._notify_pruned(pruned)
+        return len(job_rows)
+
+    def search(
+        self,
+        search_term: Optional[str] = None,
+        location: Optional[str] = None,
+        hours_old: Optional[int] = None,
+        sites: Optional[List[str]] = None,
+        limit: int = 100
+    ) -> List[Dict]:
+        """
+        Stored postings, newest first. search_term matches postings previously
+        found by that term or whose title contains it; location matches as a
+        substring; hours_old keeps postings from the days it covers.
+        """
+        clauses = []
+        params: List = []
+        if search_term:
+            term = normalize_search_term(search_term)
+            clauses.append(
+                "(EXISTS (SELECT 1 FROM job_searches s WHERE s.search_term = ? AND s.site = j.site "
+                "AND s.job_id = j.job_id) OR j.title LIKE ? ESCAPE '\\')"
+            )
+            params += [term, f"%{_escape_like(term)}%"]
+        if location:
+            clauses.append("j.location LIKE ? ESCAPE '\\'")
+            params.append(f"%{_escape_like(location.strip())}%")
+        if hours_old:
+            cutoff = datetime.datetime.fromtimestamp(time.time() - hours_old * 3600, datetime.timezone.utc)
+            clauses.append("j.posted_at >= ?")
+            params.append(_day_start(cutoff.date().isoformat()))
+        if sites:
+            clauses.append(f"j.site IN ({', '.join('?' for _ in sites)})")
+            params += list(sites)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = f"SELECT j.data FROM jobs j {where} ORDER BY j.posted_at DESC, j.last_seen DESC LIMIT ?"
+        with self.lock:
+            rows = self.connection.execute(query, params + [limit]).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def get_jobs(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Dict]:
+        """Stored postings by (site, job id); missing keys are left out."""
+        found = {}
+        with self.lock:
+            for site, job_id in keys:
+                row = self.connection.execute(
+                    "SELECT data FROM jobs WHERE site = ? AND job_id = ?", (site, job_id)
+                ).fetchone()
+                if row is not None:
+                    found[(site, job_id)] = json.loads(row[0])
+        return found
+
+    def iter_jobs(self, batch_size: int = 1000) -> Iterator[Dict]:
+        """Every stored posting, read in batches so the lock is not held throughout."""
+        last = ("", "")
+        while True:
+            with self.lock:
+                rows = self.connection.execute(
+                    "SELECT site, job_id, data FROM jobs WHERE (site, job_id) > (?, ?) "
+                    "ORDER BY site, job_id LIMIT ?",
+                    (*last, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for _, _, data in rows:
+                yield json.loads(data)
+            last = rows[-1][:2]
+
+    def query_jobs(self, search_term: str, location: str, site: str, since: float, limit: int) -> List[Dict]:
+        """Postings a search for search_term in location found on site, posted on or after since's day."""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT j.data FROM job_searches s JOIN jobs j ON j.site = s.site AND j.job_id = s.job_id "
+                "WHERE s.search_term = ? AND s.location = ? AND s.site = ? AND j.posted_at >= ? "
+                "ORDER BY j.posted_at DESC, j.last_seen DESC LIMIT ?",
+                (normalize_search_term(search_term), normalize_search_term(location), site,
+                 _day_start(datetime.datetime.fromtimestamp(since, datetime.timezone.utc).date().isoformat()), limit)
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def get_watermark(self, search_term: str, location: str, site: str, country: str) -> Optional[Dict]:
+        """
+        When a query was last scraped on site, how far back that coverage
+        reaches, and the newest posting seen. Read errors are logged and
+        reported as no watermark, which falls back to a full scrape.
+        """
+        try:
+            with self.lock:
+                row = self.connection.execute(
+                    "SELECT scraped_at, covered_from, results_wanted, newest_posted FROM scrape_watermarks "
+                    "WHERE search_term = ? AND location = ? AND site = ? AND country = ?",
+                    (normalize_search_term(search_term), normalize_search_term(location), site, country.lower())
+                ).fetchone()
+        except Exception as e:
+            logger.error(f"Error reading scrape watermark: {str(e)}", exc_info=True)
+            return None
+        if row is None:
+            return None
+        return dict(zip(("scraped_at", "covered_from", "results_wanted", "newest_posted"), row))
+
+    def set_watermark(
+        self,
+        search_term: str,
+        location: str,
+        site: str,
+        country: str,
+        scraped_at: float,
+        covered_from: float,
+        results_wanted: int,
+        jobs: List[Dict]
+    ) -> None:
+        """Record a successful scrape of a query on site; errors are logged, not raised."""
+        dates = [date for date in (_posted_date(job.get('date_posted')) for job in jobs) if date]
+        try:
+            with self.lock, self.connection:
+                self.connection.execute(UPSERT_WATERMARK, {
+                    "search_term": normalize_search_term(search_term),
+                    "location": normalize_search_term(location),
+                    "site": site,
+                    "country": country.lower(),
+                    "scraped_at": scraped_at,
+                    "covered_from": covered_from,
+                    "results_wanted": results_wanted,
+                    "newest_posted": max(dates) if dates else None,
+                })
+        except Exception as e:
+            logger.error(f"Error storing scrape watermark: {str(e)}", exc_info=True)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            jobs, searches, watermarks = self.connection.execute(
+                "SELECT (SELECT COUNT(*) FROM jobs), (SELECT COUNT(DISTINCT search_term) FROM job_searches), "
+                "(SELECT COUNT(*) FROM scrape_watermarks)"
+            ).fetchone()
+        return {"path": self.path, "jobs": jobs, "search_terms": searches, "watermarks": watermarks}
+
+    def add_prune_listener(self, listener: Callable[[List[Tuple[str, str]]], None]) -> None:
+        """Call listener with the (site, job id) keys of postings removed by retention pruning."""
+        self.prune_listeners.append(listener)
+
+    def _notify_pruned(self, pruned: List[Tuple[str, str]]) -> None:
+        for listener in self.prune_listeners:
+            try:
+                listener(pruned)
+            except Exception as e:
+                logger.error(f"Error in job store prune listener: {str(e)}", exc_info=True)
+
+    def _prune(self, now: float) -> List[Tuple[str, str]]:
+        """Delete everything past retention; returns the keys of the postings removed."""
+        cutoff = now - settings.JOB_STORE_RETENTION_DAYS * 86400
+        pruned = [
+            tuple(row) for row in
+            self.connection.execute("SELECT site, job_id FROM jobs WHERE last_seen < ?", (cutoff,))
+        ]
+        self.connection.execute("DELETE FROM jobs WHERE last_seen < ?", (cutoff,))
+        self.connection.execute("DELETE FROM job_searches WHERE last_seen < ?", (cutoff,))
+        # A watermark is only as good as the postings behind it
+        self.connection.execute("DELETE FROM scrape_watermarks WHERE covered_from < ?", (cutoff,))
+        return pruned
+
+_store = None
+
+def get_job_store() -> JobStore:
+    """Process-wide job store, shared by scraping and the search endpoints."""
+    global _store
+    if _store is None:
+        _store = JobStore()
+    return _store
@@ -0,0 +1,326 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from array import array
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import threading
+import zlib
+from app.config import get_settings
+from app.store.job_store import JobStore, job_key
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+INDEX_FORMAT_VERSION = 1
+
+# Words plus tech tokens such as c++, c#, node.js and .net
+_TOKEN_RE = re.compile(r"\.?[a-z0-9]+(?:[+#]+|\.[a-z0-9]+)*")
+_MAX_TOKEN_CHARS = 40
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or our that the this "
+    "to we will with you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    return [
+        token for token in _TOKEN_RE.findall(text.lower())
+        if token not in STOPWORDS and len(token) <= _MAX_TOKEN_CHARS
+    ]
+
+class JobSearchIndex:
+    """
+    Inverted index over scraped job titles and descriptions with BM25
+    ranking. Postings are flat uint32 arrays of (doc id, term frequency)
+    pairs in doc id order; title terms count SEARCH_INDEX_TITLE_WEIGHT times.
+
+    The saved index is one binary file (document lengths, then postings) plus
+    a JSON term dictionary. The binary file is memory-mapped on load, so
+    startup only reads the dictionary. Documents added since are kept in
+    in-memory postings and merged into a new file on save. A posting that is
+    re-scraped with changed text gets a new doc id, and a posting pruned from
+    the job store is removed; either way the old doc id is skipped until the
+    next save drops it.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        logger.info("Initializing JobSearchIndex...")
+        self.path = path or settings.SEARCH_INDEX_PATH
+        self.lock = threading.Lock()
+        self._reset()
+        if os.path.exists(self._meta_path()):
+            try:
+                self._load()
+            except Exception as e:
+                logger.error(f"Error loading search index, starting empty: {str(e)}", exc_info=True)
+                self._reset()
+        logger.info(f"JobSearchIndex initialized successfully ({self.live_docs()} documents)")
+
+    def _reset(self) -> None:
+        self.mapped: Optional[mmap.mmap] = None
+        self.base_view = memoryview(b"").cast("I")
+        self.base_lengths = memoryview(b"").cast("I")
+        self.base_postings = memoryview(b"").cast("I")
+        self.base_terms: Dict[str, Tuple[int, int]] = {}  # term -> (offset, pairs) in base_postings
+        self.base_docs = 0
+        self.new_lengths = array("I")
+        self.new_postings: Dict[str, array] = {}
+        self.doc_keys: List[str] = []
+        self.doc_ids: Dict[str, Tuple[int, int]] = {}  # doc key -> (doc id, text checksum)
+        self.deleted = set()
+        self.total_length = 0
+        self.unsaved = 0
+
+    def _meta_path(self) -> str:
+        return f"{self.path}.json"
+
+    def _data_path(self) -> str:
+        return f"{self.path}.bin"
+
+    def live_docs(self) -> int:
+        return len(self.doc_keys) - len(self.deleted)
+
+    def _length(self, doc_id: int) -> int:
+        if doc_id < self.base_docs:
+            return self.base_lengths[doc_id]
+        return self.new_lengths[doc_id - self.base_docs]
+
+    def add_jobs(self, jobs: Iterable[Dict]) -> int:
+        """Index new or changed postings. Returns how many were (re)indexed."""
+        indexed = 0
+        with self.lock:
+            for job in jobs:
+                key = job_key(job)
+                if not job.get('site') or key is None:
+                    continue
+                doc_key = f"{job['site']}:{key}"
+                text = f"{job.get('title') or ''}\n{job.get('description') or ''}"
+                checksum = zlib.crc32(text.encode())
+                existing = self.doc_ids.get(doc_key)
+                if existing is not None:
+                    if existing[1] == checksum:
+                        continue
+                    self.deleted.add(existing[0])
+                    self.total_length -= self._length(existing[0])
+                self._add_document(doc_key, checksum, job.get('title') or '', job.get('description') or '')
+                indexed += 1
+            self.unsaved += indexed
+            should_save = self.unsaved >= settings.SEARCH_INDEX_SAVE_EVERY
+        if should_save:
+            self.save()
+        return indexed
+
+    def remove_jobs(self, keys: Iterable[Tuple[str, str]]) -> int:
+        """Drop postings by (site, job id), e.g. once pruned from the job store. Returns how many were indexed."""
+        removed = 0
+        with self.lock:
+            for site, key in keys:
+                existing = self.doc_ids.pop(f"{site}:{key}", None)
+                if existing is None:
+                    continue
+                self.deleted.add(existing[0])
+                self.total_length -= self._length(existing[0])
+                removed += 1
+            self.unsaved += removed
+            should_save = self.unsaved >= settings.SEARCH_INDEX_SAVE_EVERY
+        if should_save:
+            self.save()
+        return removed
+
+    def _add_document(self, doc_key: str, checksum: int, title: str, description: str) -> None:
+        doc_id = len(self.doc_keys)
+        frequencies: Dict[str, int] = {}
+        for token in tokenize(title):
+            frequencies[token] = frequencies.get(token, 0) + settings.SEARCH_INDEX_TITLE_WEIGHT
+        for token in tokenize(description):
+            frequencies[token] = frequencies.get(token, 0) + 1
+
+        for token, frequency in frequencies.items():
+            postings = self.new_postings.get(token)
+            if postings is None:
+                postings = self.new_postings[token] = array("I")
+            postings.append(doc_id)
+            postings.append(frequency)
+
+        length = sum(frequencies.values())
+        self.doc_keys.append(doc_key)
+        self.doc_ids[doc_key] = (doc_id, checksum)
+        self.new_lengths.append(length)
+        self.total_length += length
+
+    def _postings(self, term: str) -> Iterable:
+        """The term's base postings from the mapped file, then any added since."""
+        if term in self.base_terms:
+            offset, pairs = self.base_terms[term]
+            yield self.base_postings[offset:offset + pairs * 2]
+        if term in self.new_postings:
+            yield self.new_postings[term]
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        sites: Optional[Iterable[str]] = None
+    ) -> List[Tuple[str, str, float]]:
+        """
+        Top postings for a keyword query as (site, job id, score), best first,
+        optionally restricted to sites. Removed documents are skipped before
+        ranking, so they neither take up result slots nor count towards idf.
+        """
+        terms = set(tokenize(query))
+        sites = set(sites) if sites else None
+        k1, b = settings.SEARCH_BM25_K1, settings.SEARCH_BM25_B
+        scores: Dict[int, float] = {}
+        with self.lock:
+            documents = self.live_docs()
+            if not terms or not documents:
+                return []
+            average_length = self.total_length / documents
+            for term in terms:
+                matches = [
+                    (postings[i], postings[i + 1])
+                    for postings in self._postings(term)
+                    for i in range(0, len(postings), 2)
+                    if postings[i] not in self.deleted
+                ]
+                if not matches:
+                    continue
+                idf = math.log(1 + (documents - len(matches) + 0.5) / (len(matches) + 0.5))
+                for doc_id, tf in matches:
+                    norm = k1 * (1 - b + b * self._length(doc_id) / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+            candidates = scores.items()
+            if sites is not None:
+                candidates = [
+                    (doc_id, score) for doc_id, score in candidates
+                    if self.doc_keys[doc_id].partition(":")[0] in sites
+                ]
+            best = heapq.nlargest(limit, candidates, key=lambda item: item[1])
+            results = []
+            for doc_id, score in best:
+                site, _, key = self.doc_keys[doc_id].partition(":")
+                results.append((site, key, score))
+        return results
+
+    def rebuild(self, store: JobStore) -> int:
+        """Index every posting in the job store, e.g. when no saved index exists yet."""
+        total = 0
+        batch: List[Dict] = []
+        for job in store.iter_jobs():
+            batch.append(job)
+            if len(batch) >= 1000:
+                total += self.add_jobs(batch)
+                batch = []
+        total += self.add_jobs(batch)
+        self.save()
+        logger.info(f"Rebuilt search index from the job store ({total} documents)")
+        return total
+
+    def save(self) -> None:
+        """Write live documents to a new file pair and map it; deleted documents are dropped."""
+        with self.lock:
+            if not self.unsaved and not self.deleted and self.mapped is not None:
+                return
+            live = [doc_id for doc_id in range(len(self.doc_keys)) if doc_id not in self.deleted]
+            renumber = {doc_id: new_id for new_id, doc_id in enumerate(live)}
+
+            lengths = array("I", (self._length(doc_id) for doc_id in live))
+            postings = array("I")
+            terms: Dict[str, Tuple[int, int]] = {}
+            for term in sorted(set(self.base_terms) | set(self.new_postings)):
+                offset = len(postings) // 2
+                for block in self._postings(term):
+                    if not self.deleted:
+                        # Doc ids are unchanged, so the block can be copied whole
+                        postings.frombytes(block.tobytes())
+                        continue
+                    for i in range(0, len(block), 2):
+                        new_id = renumber.get(block[i])
+                        if new_id is not None:
+                            postings.append(new_id)
+                            postings.append(block[i + 1])
+                pairs = len(postings) // 2 - offset
+                if pairs:
+                    terms[term] = (offset * 2, pairs)
+
+            meta = {
+                "version": INDEX_FORMAT_VERSION,
+                "documents": len(live),
+                "docs": [[self.doc_keys[doc_id], self.doc_ids[self.doc_keys[doc_id]][1]] for doc_id in live],
+                "terms": terms,
+            }
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with open(self._data_path() + ".tmp", "wb") as f:
+                lengths.tofile(f)
+                postings.tofile(f)
+            with open(self._meta_path() + ".tmp", "w") as f:
+                json.dump(meta, f, separators=(",", ":"))
+            # The data file is replaced first; a crash in between leaves a
+            # dictionary that no longer matches, which _load rejects
+            os.replace(self._data_path() + ".tmp", self._data_path())
+            os.replace(self._meta_path() + ".tmp", self._meta_path())
+            self._release()
+            self._reset()
+            self._load()
+        logger.info(f"Saved search index ({len(live)} documents, {len(terms)} terms)")
+
+    def _load(self) -> None:
+        with open(self._meta_path()) as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported search index version: {meta.get('version')}")
+
+        documents = meta["documents"]
+        size = os.path.getsize(self._data_path())
+        expected = 4 * (documents + 2 * sum(pairs for _, pairs in meta["terms"].values()))
+        if size != expected:
+            raise ValueError(f"Search index data is {size} bytes, expected {expected}")
+
+        if size:
+            with open(self._data_path(), "rb") as f:
+                self.mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.base_view = memoryview(self.mapped).cast("I")
+            self.base_lengths = self.base_view[:documents]
+            self.base_postings = self.base_view[documents:]
+        self.base_terms = {term: (offset, pairs) for term, (offset, pairs) in meta["terms"].items()}
+        self.base_docs = documents
+        self.doc_keys = [doc_key for doc_key, _ in meta["docs"]]
+        self.doc_ids = {doc_key: (doc_id, checksum) for doc_id, (doc_key, checksum) in enumerate(meta["docs"])}
+        self.total_length = sum(self.base_lengths)
+
+    def _release(self) -> None:
+        """
+        Drop this index's references to the mapped file. The mapping closes
+        once no in-flight search still holds a view of it; until then the
+        replaced file stays readable through it.
+        """
+        self.base_view = self.base_lengths = self.base_postings = memoryview(b"").cast("I")
+        self.mapped = None
+
+    def close(self) -> None:
+        """Save anything added since the last save."""
+        self.save()
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "path": self.path,
+                "documents": self.live_docs(),
+                "terms": len(set(self.base_terms) | set(self.new_postings)),
+                "unsaved": self.unsaved,
+                "deleted": len(self.deleted),
+            }
+
+_index = None
+
+def get_search_index() -> JobSearchIndex:
+    """Process-wide search index, shared by scraping and the search endpoint."""
+    global _index
+    if _index is None:
+        _index = JobSearchIndex()
+    return _index
@@ -1,12 +1,30 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Header, Query
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import json
 import logging
 from pydantic import BaseModel
 from app.config import get_settings
+from app.llm.client import get_llm_client
+from app.llm.parser import ResponseParser
+from app.llm.preprocess import get_preprocessor
+from app.llm.scheduler import SchedulerOverloadedError
+from app.cache.connection import init_redis, close_redis
 from app.services.job_analysis import JobAnalysisService
+from app.services.job_frames import ARROW_MEDIA_TYPE, arrow_available, dumps_json, records_to_arrow
 from app.services.job_scraping import JobScrapingService
-from app.services.resume_analysis import ResumeAnalysisService
+from app.services.resume_analysis import (
+    ResumeAnalysisService,
+    ResumeExtractionTimeoutError,
+    ResumeTooLargeError
+)
+from app.services.scrape_queue import ScrapeJobManager, ScrapeQueueFullError
+from app.store.job_store import get_job_store
+from app.store.search_index import get_search_index
 
 # Configure logging
 logging.basicConfig(
@@ -24,9 +42,24 @@ logger.info("Initializing services...")
 job_analysis_service = JobAnalysisService()
 job_scraping_service = JobScrapingService()
 resume_analysis_service = ResumeAnalysisService()
+scrape_job_manager = ScrapeJobManager(job_scraping_service)
 logger.info("Services initialized successfully")
 
-app = FastAPI(title=settings.PROJECT_NAME)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_redis()
+    job_analysis_service.cache.start_invalidation_listener()
+    yield
+    await job_analysis_service.cache.stop_invalidation_listener()
+    scrape_job_manager.shutdown()
+    resume_analysis_service.shutdown()
+    if job_scraping_service.search_index is not None:
+        job_scraping_service.search_index.close()
+    if job_scraping_service.store is not None:
+        job_scraping_service.store.close()
+    await close_redis()
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -46,6 +79,17 @@ class JobAnalysisRequest(BaseModel):
     experience_years: Optional[int] = None
     required_skills: Optional[List[str]] = None
 
+class BatchJobItem(BaseModel):
+    description: str
+    url: str
+
+class BatchJobAnalysisRequest(BaseModel):
+    jobs: List[BatchJobItem]
+    focus_areas: Optional[List[str]] = None
+    summary_length: Optional[str] = "medium"
+    experience_years: Optional[int] = None
+    required_skills: Optional[List[str]] = None
+
 class JobAnalysisResponse(BaseModel):
     valid: bool
     summary: str
@@ -75,29 +119,229 @@ async def analyze_job(request: JobAnalysisRequest):
         logger.error(f"Error analyzing job: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/v1/summarize/stream")
+async def analyze_job_stream(request: JobAnalysisRequest, valid_only: bool = False):
+    """
+    Analyze a job, streaming each analysis field as a server-sent event as
+    soon as the model has written it, followed by a done event.
+    With valid_only=true, generation stops early for jobs that do not match.
+    """
+    logger.info(f"Received streamed job analysis request for URL: {request.url}")
+
+    async def events():
+        try:
+            async for event in job_analysis_service.analyze_job_stream(
+                description=request.description,
+                url=request.url,
+                focus_areas=request.focus_areas,
+                summary_length=request.summary_length,
+                experience_years=request.experience_years,
+                required_skills=request.required_skills,
+                valid_only=valid_only
+            ):
+                yield f"event: {event['event']}\ndata: {json.dumps(jsonable_encoder(event))}\n\n"
+        except Exception as e:
+            logger.error(f"Error during streamed job analysis: {str(e)}", exc_info=True)
+            yield f"event: error\ndata: {json.dumps({'event': 'error', 'detail': str(e)})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/api/v1/summarize/batch")
+async def analyze_jobs(request: BatchJobAnalysisRequest):
+    """Analyze a batch of jobs, reporting failures per item."""
+    logger.info(f"Received batch job analysis request for {len(request.jobs)} jobs")
+
+    if len(request.jobs) > settings.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(request.jobs)} jobs (max {settings.MAX_BATCH_SIZE})"
+        )
+
+    try:
+        results = await job_analysis_service.analyze_jobs(
+            jobs=[job.dict() for job in request.jobs],
+            focus_areas=request.focus_areas,
+            summary_length=request.summary_length,
+            experience_years=request.experience_years,
+            required_skills=request.required_skills
+        )
+        logger.info(f"Batch job analysis completed for {len(results)} jobs")
+        return {"results": results}
+    except Exception as e:
+        logger.error(f"Error analyzing job batch: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/v1/cache/stats")
+async def cache_stats():
+    """Report analysis cache hit rates, including near-duplicate reuse."""
+    return await job_analysis_service.get_cache_stats()
+
+@app.get("/api/v1/llm/stats")
+async def llm_stats():
+    """
+    Report LLM transport metrics (pool usage, retries, circuit breaker and
+    scheduler state), prompt tokens saved by description pre-processing and
+    the response parse-failure rate.
+    """
+    stats = get_llm_client().stats()
+    stats["preprocessing"] = get_preprocessor().stats()
+    stats["parsing"] = ResponseParser.stats()
+    return stats
+
 @app.post("/api/scrape")
-async def scrape(params: Dict):
-    """Scrape jobs based on provided parameters."""
+async def scrape(params: Dict, accept: Optional[str] = Header(None)):
+    """
+    Scrape jobs based on provided parameters. Results are JSON, or an Arrow
+    IPC stream when the client accepts it and pyarrow is installed.
+    """
     logger.info("Received job scraping request")
     logger.debug(f"Scraping parameters: {params}")
     
     try:
         logger.info("Starting job scraping...")
-        jobs = job_scraping_service.scrape_jobs(params)
+        job = scrape_job_manager.submit(params)
+        jobs = await asyncio.wrap_future(job.future)
         logger.info(f"Job scraping completed successfully. Found {len(jobs)} jobs")
-        return jobs
+        # Records are already JSON-ready, so skip FastAPI's per-value encoding
+        if accept and ARROW_MEDIA_TYPE in accept and arrow_available():
+            return Response(content=records_to_arrow(jobs), media_type=ARROW_MEDIA_TYPE)
+        return Response(content=dumps_json(jobs), media_type="application/json")
+    except ScrapeQueueFullError as e:
+        logger.warning(f"Rejected scraping request: {str(e)}")
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         logger.error(f"Error during scraping: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/jobs")
+async def search_stored_jobs(
+    search_term: Optional[str] = None,
+    location: Optional[str] = None,
+    hours_old: Optional[int] = None,
+    site: Optional[List[str]] = Query(None),
+    limit: int = Query(100, ge=1, le=settings.JOB_STORE_MAX_RESULTS)
+):
+    """Search previously scraped jobs in the local job store, without scraping."""
+    if not settings.JOB_STORE_ENABLED:
+        raise HTTPException(status_code=404, detail="Job store is disabled")
+
+    try:
+        loop = asyncio.get_running_loop()
+        jobs = await loop.run_in_executor(
+            None, lambda: get_job_store().search(search_term, location, hours_old, site, limit)
+        )
+        logger.info(f"Job store search returned {len(jobs)} jobs")
+        return Response(content=dumps_json(jobs), media_type="application/json")
+    except Exception as e:
+        logger.error(f"Error searching job store: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/search")
+async def search_jobs(
+    q: str,
+    site: Optional[List[str]] = Query(None),
+    limit: int = Query(20, ge=1, le=settings.JOB_STORE_MAX_RESULTS)
+):
+    """Keyword search over the titles and descriptions of stored jobs, ranked by BM25."""
+    if not (settings.JOB_STORE_ENABLED and settings.SEARCH_INDEX_ENABLED):
+        raise HTTPException(status_code=404, detail="Search index is disabled")
+
+    def run_search() -> List[Dict]:
+        index = get_search_index()
+        while True:
+            hits = index.search(q, limit, sites=site)
+            stored = get_job_store().get_jobs([(hit_site, job_id) for hit_site, job_id, _ in hits])
+            missing = [(hit_site, job_id) for hit_site, job_id, _ in hits if (hit_site, job_id) not in stored]
+            if not missing:
+                break
+            # Left over from a prune the saved index never saw; drop them and rank again
+            logger.info(f"Removing {len(missing)} stale postings from the search index")
+            index.remove_jobs(missing)
+        return [
+            {**stored[(hit_site, job_id)], "score": round(score, 4)}
+            for hit_site, job_id, score in hits
+        ]
+
+    try:
+        loop = asyncio.get_running_loop()
+        jobs = await loop.run_in_executor(None, run_search)
+        logger.info(f"Search for '{q}' returned {len(jobs)} jobs")
+        return Response(content=dumps_json(jobs), media_type="application/json")
+    except Exception as e:
+        logger.error(f"Error searching jobs: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/scrape/stream")
+async def scrape_stream(params: Dict, format: str = "ndjson"):
+    """
+    Scrape all sites in parallel and stream each site's jobs as soon as it
+    finishes, as NDJSON (default) or server-sent events (format=sse).
+    """
+    logger.info(f"Received streamed job scraping request ({format})")
+    logger.debug(f"Scraping parameters: {params}")
+
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail=f"Unsupported stream format: {format}")
+
+    try:
+        stream = scrape_job_manager.stream(params)
+    except ScrapeQueueFullError as e:
+        logger.warning(f"Rejected streamed scraping request: {str(e)}")
+        raise HTTPException(status_code=429, detail=str(e))
+
+    async def events():
+        try:
+            async for event in stream:
+                payload = dumps_json(event).decode()
+                if format == "sse":
+                    yield f"event: {event['event']}\ndata: {payload}\n\n"
+                else:
+                    yield payload + "\n"
+        except Exception as e:
+            logger.error(f"Error during streamed scraping: {str(e)}", exc_info=True)
+            payload = json.dumps({"event": "error", "detail": str(e)})
+            yield f"event: error\ndata: {payload}\n\n" if format == "sse" else payload + "\n"
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type)
+
+@app.post("/api/scrape/jobs", status_code=202)
+async def submit_scrape(params: Dict):
+    """Queue a scrape and return a job id to poll."""
+    logger.info("Received async job scraping request")
+    logger.debug(f"Scraping parameters: {params}")
+
+    try:
+        job = scrape_job_manager.submit(params)
+        return job.to_dict()
+    except ScrapeQueueFullError as e:
+        logger.warning(f"Rejected scraping request: {str(e)}")
+        raise HTTPException(status_code=429, detail=str(e))
+
+@app.get("/api/scrape/jobs/{job_id}")
+async def get_scrape(job_id: str):
+    """Poll a scrape job for status, per-site progress and, once done, results."""
+    job = scrape_job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Scrape job not found: {job_id}")
+    return job.to_dict()
+
+@app.delete("/api/scrape/jobs/{job_id}")
+async def cancel_scrape(job_id: str):
+    """Cancel a queued or running scrape job."""
+    job = scrape_job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Scrape job not found: {job_id}")
+    return job.to_dict()
+
 @app.post("/api/analyze-resume")
 async def analyze_resume(resume: UploadFile = File(...)):
     """Analyze resume and extract job search parameters."""
     logger.info(f"Received resume analysis request for file: {resume.filename}")
     
     try:
-        # Read file content
-        content = await resume.read()
+        # Read file content, one byte past the limit so oversized files are detected
+        content = await resume.read(settings.RESUME_MAX_BYTES + 1)
         
         # Analyze resume
         logger.info("Starting resume analysis...")
@@ -109,6 +353,14 @@ async def analyze_resume(resume: UploadFile = File(...)):
         logger.info("Resume analysis completed successfully")
         return analysis
         
+    except ResumeTooLargeError as e:
+        logger.warning(f"Rejected resume analysis request: {str(e)}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except ResumeExtractionTimeoutError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except SchedulerOverloadedError as e:
+        logger.warning(f"Rejected resume analysis request: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error analyzing resume: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,178 @@
+"""
+Compare time-to-first-token of the analysis prompt layout against the old
+layout, which put the job description before the static instructions.
+
+Runs against a stub that models prefix (KV) cache reuse by default, or
+against a local Ollama with --ollama. Usage (from backend/):
+    python -m scripts.benchmark_prefix_cache [--jobs jobs.json] [--count N] [--ollama]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import AsyncIterator, Dict, List, Optional
+from app.config import get_settings
+from app.llm.client import OllamaClient
+from app.llm.interfaces import LLMClient
+from app.llm.parser import ResponseParser
+from app.llm.preprocess import estimate_tokens
+from app.llm.prompts import ANALYSIS_JSON_SCHEMA, get_analysis_prompt, get_system_prompt, get_validation_prompt
+
+settings = get_settings()
+
+FOCUS_AREAS = ['skills', 'requirements', 'culture']
+EXPERIENCE_YEARS = 4
+REQUIRED_SKILLS = ['python', 'aws', 'sql']
+
+def legacy_analysis_prompt(job_description: str) -> str:
+    """The layout used before prompts were reordered for prefix caching."""
+    return f"""Analyze the following job description and provide a structured response in JSON format.
+
+Job Description:
+{job_description}
+
+Focus Areas: {', '.join(FOCUS_AREAS)}
+Summary Length: medium
+Make sure estimated salary range is very concise and to the point, should not exceed 10 words.
+Experience Years: {EXPERIENCE_YEARS}
+Required Skills: {', '.join(REQUIRED_SKILLS)}
+
+Provide a JSON response with the following structure:
+{{
+    "valid": boolean,
+    "summary": string,
+    "key_skills": string[],
+    "required_experience": string,
+    "company_culture": string,
+    "estimated_salary_range": string
+}}
+"""
+
+def current_analysis_prompt(job_description: str) -> str:
+    return get_analysis_prompt(job_description, FOCUS_AREAS, "medium", EXPERIENCE_YEARS, REQUIRED_SKILLS)
+
+# Canned reply; a well-formed analysis also reads as a "valid" verdict
+STUB_REPLY = json.dumps({
+    "valid": True,
+    "summary": "Backend engineer building data services.",
+    "key_skills": REQUIRED_SKILLS,
+    "required_experience": f"{EXPERIENCE_YEARS}+ years",
+    "company_culture": "Not specified",
+    "estimated_salary_range": "Not specified",
+})
+
+class PrefixCacheStub(LLMClient):
+    """
+    Stand-in for a local model server: prefill time is proportional to the
+    prompt tokens not shared with the previous prompt's prefix. Every reply
+    is STUB_REPLY, streamed a few characters at a time.
+    """
+
+    def __init__(self, seconds_per_token: float = 0.0005):
+        self.seconds_per_token = seconds_per_token
+        self.previous = ""
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        json_schema: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        full_prompt = f"{system_prompt}\n\n{prompt}"
+        shared = len(os.path.commonprefix([self.previous, full_prompt]))
+        self.previous = full_prompt
+        await asyncio.sleep(estimate_tokens(full_prompt[shared:]) * self.seconds_per_token)
+        for i in range(0, len(STUB_REPLY), 8):
+            yield STUB_REPLY[i:i + 8]
+
+    async def generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        json_schema: Optional[Dict] = None
+    ) -> str:
+        return "".join([chunk async for chunk in self.generate_stream(prompt, system_prompt, temperature, json_schema)])
+
+    async def analyze_job(
+        self,
+        job_description: str,
+        focus_areas: List[str],
+        summary_length: str = "medium",
+        experience_years: Optional[int] = None,
+        required_skills: Optional[List[str]] = None
+    ) -> Dict:
+        parsed = await self.generate_json(
+            prompt=get_analysis_prompt(job_description, focus_areas, summary_length, experience_years, required_skills),
+            system_prompt=get_system_prompt(),
+            temperature=0.3,
+            json_schema=ANALYSIS_JSON_SCHEMA
+        )
+        return ResponseParser.validate_analysis_response(parsed)
+
+    async def validate_job(
+        self,
+        job_description: str,
+        experience_years: Optional[int] = None,
+        required_skills: Optional[List[str]] = None
+    ) -> bool:
+        response = await self.generate_until(
+            prompt=get_validation_prompt(job_description, experience_years, required_skills),
+            stop=lambda text: ResponseParser.early_validation_verdict(text) is not None,
+            system_prompt=get_system_prompt(),
+            temperature=0.1
+        )
+        return ResponseParser.parse_validation_response(response)
+
+async def time_to_first_token(client: LLMClient, prompts: List[str]) -> List[float]:
+    timings = []
+    for prompt in prompts:
+        started = time.perf_counter()
+        stream = client.generate_stream(prompt, system_prompt=get_system_prompt(), temperature=0.3)
+        try:
+            async for _ in stream:
+                timings.append(time.perf_counter() - started)
+                break
+        finally:
+            await stream.aclose()
+    return timings
+
+async def run(descriptions: List[str], client: LLMClient, label: str):
+    legacy = await time_to_first_token(client, [legacy_analysis_prompt(d) for d in descriptions])
+    current = await time_to_first_token(client, [current_analysis_prompt(d) for d in descriptions])
+    print(f"{label}, {len(descriptions)} prompts each (first prompt excluded as cold):")
+    print(f"  description first  median TTFT {statistics.median(legacy[1:]) * 1000:.0f}ms")
+    print(f"  static prefix      median TTFT {statistics.median(current[1:]) * 1000:.0f}ms")
+    print(f"  change             {statistics.mean(current[1:]) / statistics.mean(legacy[1:]) - 1:+.0%}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", help="JSON file with a list of jobs (defaults to synthetic descriptions)")
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--ollama", action="store_true", help="Benchmark the configured Ollama instead of the stub")
+    args = parser.parse_args()
+
+    if args.jobs:
+        with open(args.jobs) as f:
+            descriptions = [job["description"] for job in json.load(f) if job.get("description")][:args.count]
+    else:
+        descriptions = [
+            f"Backend engineer {i} building data services in Python on AWS. "
+            f"{i % 6 + 2}+ years of experience with SQL and distributed systems required. " * 5
+            for i in range(args.count)
+        ]
+    if len(descriptions) < 2:
+        raise SystemExit("Need at least two descriptions")
+    # Compare layouts only; pre-processing would shrink one side's descriptions
+    settings.PREPROCESS_ENABLED = False
+
+    if args.ollama:
+        asyncio.run(run(descriptions, OllamaClient(), f"Ollama ({settings.OLLAMA_MODEL})"))
+    else:
+        asyncio.run(run(descriptions, PrefixCacheStub(), "Prefix-cache stub"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Report prompt tokens saved by job description pre-processing and, optionally,
+the resulting Ollama latency change.
+
+Usage (from backend/):
+    python -m scripts.benchmark_preprocessing jobs.json [--ollama N]
+
+jobs.json is a list of scraped jobs with a "description" field, e.g. the
+response of POST /api/scrape saved to a file.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from app.config import get_settings
+from app.llm.client import OllamaClient
+from app.llm.preprocess import DescriptionPreprocessor, estimate_tokens
+
+settings = get_settings()
+
+def report_tokens(descriptions):
+    preprocessor = DescriptionPreprocessor()
+    # Two passes: the first lets recurring paragraphs be learned as boilerplate
+    for description in descriptions:
+        preprocessor.clean(description)
+    preprocessor.cache.clear()
+
+    before = [estimate_tokens(description) for description in descriptions]
+    after = [estimate_tokens(preprocessor.clean(description)) for description in descriptions]
+    saved = sum(before) - sum(after)
+    print(f"Descriptions:        {len(descriptions)}")
+    print(f"Avg tokens before:   {statistics.mean(before):.0f}")
+    print(f"Avg tokens after:    {statistics.mean(after):.0f}")
+    print(f"Avg tokens saved:    {saved / len(descriptions):.0f} ({saved / sum(before):.0%})")
+    print(f"Learned boilerplate: {preprocessor.stats()['learned_boilerplate']} paragraphs")
+
+async def time_analyses(client, descriptions, enabled):
+    settings.PREPROCESS_ENABLED = enabled
+    timings = []
+    for description in descriptions:
+        started = time.perf_counter()
+        await client.analyze_job(description, focus_areas=['skills', 'requirements', 'culture'])
+        timings.append(time.perf_counter() - started)
+    return timings
+
+async def report_latency(descriptions):
+    client = OllamaClient()
+    raw = await time_analyses(client, descriptions, enabled=False)
+    cleaned = await time_analyses(client, descriptions, enabled=True)
+    print(f"Ollama ({settings.OLLAMA_MODEL}), {len(descriptions)} analyses each:")
+    print(f"  raw      median {statistics.median(raw):.2f}s  mean {statistics.mean(raw):.2f}s")
+    print(f"  cleaned  median {statistics.median(cleaned):.2f}s  mean {statistics.mean(cleaned):.2f}s")
+    print(f"  change   {statistics.mean(cleaned) / statistics.mean(raw) - 1:+.0%}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("jobs", help="JSON file with a list of jobs")
+    parser.add_argument("--ollama", type=int, default=0, metavar="N",
+                        help="Also time N analyses against Ollama with and without pre-processing")
+    args = parser.parse_args()
+
+    with open(args.jobs) as f:
+        descriptions = [job["description"] for job in json.load(f) if job.get("description")]
+    if not descriptions:
+        raise SystemExit("No descriptions found")
+
+    report_tokens(descriptions)
+    if args.ollama:
+        asyncio.run(report_latency(descriptions[:args.ollama]))
+
+if __name__ == "__main__":
+    main()
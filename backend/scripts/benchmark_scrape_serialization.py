@@ -0,0 +1,104 @@
+"""
+Compare the old scrape post-processing (replace NaN, stringify floats per
+cell, to_dict('records'), FastAPI's jsonable_encoder + json.dumps) with the
+columnar path (early column drop, per-column cleaning, records from column
+lists, direct JSON bytes) and, when pyarrow is installed, Arrow IPC.
+
+Uses synthetic frames shaped like jobspy output. Usage (from backend/):
+    python -m scripts.benchmark_scrape_serialization [--rows 100 1000 10000] [--repeat 5]
+"""
+import argparse
+import datetime
+import json
+import statistics
+import time
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from app.config import get_settings
+from app.services.job_frames import (
+    arrow_available,
+    clean_frame,
+    dumps_json,
+    frame_to_records,
+    records_to_arrow,
+    select_columns
+)
+
+settings = get_settings()
+
+# Column layout of jobspy's scrape_jobs() output
+JOBSPY_COLUMNS = [
+    "id", "site", "job_url", "job_url_direct", "title", "company", "location", "date_posted",
+    "job_type", "salary_source", "interval", "min_amount", "max_amount", "currency", "is_remote",
+    "job_level", "job_function", "listing_type", "emails", "description", "company_industry",
+    "company_url", "company_logo", "company_url_direct", "company_addresses", "company_num_employees",
+    "company_revenue", "company_description", "skills", "experience_range", "company_rating",
+    "company_reviews_count", "vacancy_count", "work_from_home_type",
+]
+FLOAT_COLUMNS = {"min_amount", "max_amount", "company_rating", "company_reviews_count", "vacancy_count"}
+
+def synthetic_jobs(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = {}
+    for column in JOBSPY_COLUMNS:
+        if column in FLOAT_COLUMNS:
+            values = rng.integers(40, 200, rows) * 1000.0
+            values[rng.random(rows) < 0.4] = np.nan
+            data[column] = values
+        elif column == "date_posted":
+            today = datetime.date.today()
+            data[column] = [today - datetime.timedelta(days=int(d)) for d in rng.integers(0, 30, rows)]
+        elif column == "is_remote":
+            data[column] = rng.random(rows) < 0.3
+        elif column == "description":
+            data[column] = [f"Job {i}: build data services in Python. " * 40 for i in range(rows)]
+        else:
+            values = np.array([f"{column}-{i}" for i in range(rows)], dtype=object)
+            values[rng.random(rows) < 0.2] = np.nan
+            data[column] = values
+    return pd.DataFrame(data)
+
+def legacy_pipeline(df: pd.DataFrame) -> bytes:
+    df = df.replace({np.nan: None})
+    for col in df.select_dtypes(include=['float64']).columns:
+        df[col] = df[col].apply(lambda x: str(x) if x is not None else None)
+    return json.dumps(jsonable_encoder(df.to_dict('records'))).encode()
+
+def columnar_pipeline(df: pd.DataFrame) -> bytes:
+    df = clean_frame(select_columns(df, settings.SCRAPE_COLUMNS))
+    return dumps_json(frame_to_records(df))
+
+def arrow_pipeline(df: pd.DataFrame) -> bytes:
+    df = clean_frame(select_columns(df, settings.SCRAPE_COLUMNS))
+    return records_to_arrow(frame_to_records(df), list(df.columns))
+
+def best_of(pipeline, df: pd.DataFrame, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        payload = pipeline(df)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), len(payload)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pipelines = [("legacy", legacy_pipeline), ("columnar", columnar_pipeline)]
+    if arrow_available():
+        pipelines.append(("arrow", arrow_pipeline))
+
+    print(f"{'rows':>7}  {'pipeline':<9} {'median':>10} {'payload':>12} {'speedup':>8}")
+    for rows in args.rows:
+        df = synthetic_jobs(rows)
+        baseline = None
+        for name, pipeline in pipelines:
+            seconds, size = best_of(pipeline, df, args.repeat)
+            baseline = baseline or seconds
+            print(f"{rows:>7}  {name:<9} {seconds * 1000:>8.1f}ms {size / 1024:>10.0f}KB {baseline / seconds:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import asyncio
+import json
+from datetime import timedelta
+
+import pytest
+
+from app.cache.codec import (
+    ANALYSIS_FIELDS, CODEC_NONE, CODEC_ZLIB, HEADER, StaleSchemaError, decode_analysis, encode_analysis
+)
+from app.config import get_settings
+
+settings = get_settings()
+
+ANALYSIS = {
+    "summary": "Backend role on the payments team",
+    "key_skills": ["python", "postgresql", "redis"],
+    "required_experience": "3+ years",
+    "company_culture": "Remote-first, small teams",
+    "estimated_salary_range": "$120k - $150k",
+}
+
+def test_round_trip():
+    analysis, is_legacy = decode_analysis(encode_analysis(ANALYSIS))
+    assert analysis == ANALYSIS
+    assert not is_legacy
+
+def test_round_trip_compressed(monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_COMPRESSION", "zlib")
+    monkeypatch.setattr(settings, "CACHE_COMPRESSION_MIN_BYTES", 0)
+    data = encode_analysis(ANALYSIS)
+    assert HEADER.unpack_from(data)[3] == CODEC_ZLIB
+    assert decode_analysis(data) == (ANALYSIS, False)
+
+def test_small_values_stay_uncompressed(monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_COMPRESSION_MIN_BYTES", 1 << 20)
+    assert HEADER.unpack_from(encode_analysis(ANALYSIS))[3] == CODEC_NONE
+
+def test_missing_fields_decode_as_none():
+    analysis, _ = decode_analysis(encode_analysis({"summary": "only a summary"}))
+    assert analysis == dict.fromkeys(ANALYSIS_FIELDS) | {"summary": "only a summary"}
+
+def test_baseline_entry_decodes_as_legacy():
+    # Exactly what the original cache stored: json.dumps of the analysis part
+    baseline = json.dumps(ANALYSIS).encode()
+    assert decode_analysis(baseline) == (ANALYSIS, True)
+
+def test_other_schema_version_is_stale(monkeypatch):
+    data = encode_analysis(ANALYSIS)
+    monkeypatch.setattr(settings, "ANALYSIS_SCHEMA_VERSION", settings.ANALYSIS_SCHEMA_VERSION + 1)
+    with pytest.raises(StaleSchemaError):
+        decode_analysis(data)
+
+@pytest.mark.parametrize("data", [b"JA", b"XX\x01\x00\x01\x00[]", b"garbage"])
+def test_unreadable_values_raise(data):
+    with pytest.raises(ValueError):
+        decode_analysis(data)
+
+def test_baseline_url_keyed_entry_is_moved_to_its_content_key():
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.cache.job_analysis import JobAnalysisCache
+    from app.cache.simhash import content_hash
+
+    async def scenario():
+        cache = JobAnalysisCache()
+        cache.redis = fakeredis.FakeAsyncRedis()
+        legacy_key = "job_analysis:https://example.com/jobs/1"
+        await cache.redis.set(legacy_key, json.dumps(ANALYSIS), ex=timedelta(days=2))
+
+        assert await cache.get_analysis("Senior backend engineer") is None
+        assert await cache.get_analysis("Senior backend engineer", "https://example.com/jobs/1") == ANALYSIS
+        assert not await cache.redis.exists(legacy_key)
+
+        content_key = cache.analysis_key(content_hash("Senior backend engineer"))
+        assert 0 < await cache.redis.ttl(content_key) <= timedelta(days=2).total_seconds()
+        assert decode_analysis(await cache.redis.get(content_key)) == (ANALYSIS, False)
+        cache.local.clear()
+        assert await cache.get_analysis("Senior backend engineer") == ANALYSIS
+
+    asyncio.run(scenario())
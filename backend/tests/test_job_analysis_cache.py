@@ -0,0 +1,81 @@
+import asyncio
+import random
+
+import pytest
+
+from app.cache.simhash import SIMHASH_BANDS, bands, content_hash, hamming_distance, simhash
+from app.config import get_settings
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.cache import job_analysis
+from app.cache.job_analysis import JobAnalysisCache
+
+settings = get_settings()
+
+ANALYSIS = {
+    "summary": "s",
+    "key_skills": ["python"],
+    "required_experience": "3 years",
+    "company_culture": "c",
+    "estimated_salary_range": "r",
+}
+
+random.seed(7)
+WORDS = [f"{random.choice(['python', 'team', 'remote', 'senior', 'cloud', 'data'])}{random.randint(0, 99)}"
+         for _ in range(300)]
+POSTING = " ".join(WORDS)
+
+def make_cache() -> JobAnalysisCache:
+    cache = JobAnalysisCache()
+    cache.redis = fakeredis.FakeAsyncRedis()
+    return cache
+
+def test_content_hash_ignores_case_and_whitespace():
+    assert content_hash(POSTING) == content_hash("  " + POSTING.upper().replace(" ", "\n  ") + "\n")
+    assert content_hash(POSTING) != content_hash(POSTING + " extra")
+
+def test_simhash_keeps_reposts_close():
+    repost = " ".join(WORDS[:150] + ["apply", "now"] + WORDS[150:])
+    unrelated = " ".join(random.sample(WORDS, len(WORDS)))
+    assert hamming_distance(simhash(POSTING), simhash(repost)) <= settings.NEAR_DUPLICATE_MAX_DISTANCE
+    assert hamming_distance(simhash(POSTING), simhash(unrelated)) > settings.NEAR_DUPLICATE_MAX_DISTANCE
+    assert len(bands(simhash(POSTING))) == SIMHASH_BANDS
+
+def test_near_duplicate_reuses_analysis():
+    async def scenario():
+        cache = make_cache()
+        await cache.set_analyses({POSTING: ANALYSIS})
+        cache.local.clear()
+        repost = " ".join(WORDS[:150] + ["apply", "now"] + WORDS[150:])
+        assert await cache.get_analyses([repost, "something else entirely"]) == [ANALYSIS, None]
+
+    asyncio.run(scenario())
+
+def test_band_membership_is_capped_and_expired(monkeypatch):
+    monkeypatch.setattr(settings, "NEAR_DUPLICATE_BAND_MAX_MEMBERS", 3)
+    # Every description lands in the same bands
+    monkeypatch.setattr(job_analysis, "simhash", lambda description: 0)
+
+    async def scenario():
+        cache = make_cache()
+        band_key = cache.band_key(0, 0)
+        await cache.redis.zadd(band_key, {"long-expired": 1.0})
+        for n in range(5):
+            await cache.set_analyses({f"posting {n}": ANALYSIS})
+        members = {member.decode() for member in await cache.redis.zrange(band_key, 0, -1)}
+        assert members == {content_hash(f"posting {n}") for n in range(2, 5)}
+
+    asyncio.run(scenario())
+
+def test_redis_failure_reads_as_miss():
+    class BrokenRedis:
+        async def mget(self, keys):
+            raise ConnectionError("redis down")
+
+    async def scenario():
+        cache = make_cache()
+        cache.redis = BrokenRedis()
+        assert await cache.get_analyses(["a", "b"]) == [None, None]
+
+    asyncio.run(scenario())
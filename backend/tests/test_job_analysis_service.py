@@ -0,0 +1,118 @@
+import asyncio
+import json
+import re
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.config import get_settings
+from app.llm.interfaces import LLMClient
+from app.services.job_analysis import JobAnalysisService
+
+settings = get_settings()
+
+PART = {
+    "summary": "cached",
+    "key_skills": ["python"],
+    "required_experience": "2 years",
+    "company_culture": "c",
+    "estimated_salary_range": "r",
+}
+
+class FakeLLM(LLMClient):
+    """Packed replies take pack_delay; single-job analyses and validations are instant."""
+
+    def __init__(self, pack_delay: float = 0.0, skip_ids=()):
+        self.pack_delay = pack_delay
+        self.skip_ids = set(skip_ids)
+        self.calls = []
+
+    async def generate(self, prompt, system_prompt=None, temperature=0.7, json_schema=None):
+        ids = re.findall(r"### Job (\d+)", prompt)
+        self.calls.append(("packed", len(ids)))
+        await asyncio.sleep(self.pack_delay)
+        return json.dumps([
+            {"id": job_id, "valid": True, "summary": f"packed {job_id}", "key_skills": []}
+            for job_id in ids if job_id not in self.skip_ids
+        ])
+
+    async def analyze_job(self, job_description, **kwargs):
+        self.calls.append("single")
+        return {"valid": True, "summary": "single", **{k: v for k, v in PART.items() if k != "summary"}}
+
+    async def validate_job(self, job_description, **kwargs):
+        self.calls.append("validate")
+        return True
+
+def make_service(llm: FakeLLM) -> JobAnalysisService:
+    service = JobAnalysisService()
+    service.llm_client = llm
+    service.cache.redis = fakeredis.FakeAsyncRedis()
+    return service
+
+def jobs(count: int):
+    return [{"url": f"https://example.com/{n}", "description": f"Job posting number {n}"} for n in range(count)]
+
+def test_packed_misses_fall_back_to_single_calls(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PACKED_ANALYSIS", True)
+
+    async def scenario():
+        llm = FakeLLM(skip_ids={"2"})
+        service = make_service(llm)
+        results = await service.analyze_jobs(jobs(3))
+        assert [result["analysis"]["summary"] for result in results] == ["packed 1", "single", "packed 3"]
+        assert llm.calls == [("packed", 3), "single"]
+        assert service.analysis_flights.stats()["analysis_in_flight"] == 0
+
+    asyncio.run(scenario())
+
+def test_cache_hits_do_not_wait_for_packs(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PACKED_ANALYSIS", True)
+
+    async def scenario():
+        llm = FakeLLM(pack_delay=0.3)
+        service = make_service(llm)
+        await service.cache.set_analyses({"Cached posting": PART})
+        batch = [{"url": "https://example.com/cached", "description": "Cached posting"}, *jobs(2)]
+        task = asyncio.create_task(service.analyze_jobs(batch, required_skills=["python"]))
+        await asyncio.sleep(0.1)
+        # The hit needs an LLM validation, which ran while the pack was still pending
+        assert "validate" in llm.calls
+        assert not task.done()
+        results = await task
+        assert [result["validation_source"] for result in results] == ["llm", "analysis", "analysis"]
+
+    asyncio.run(scenario())
+
+def test_single_and_packed_analyses_coalesce(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PACKED_ANALYSIS", True)
+
+    async def scenario():
+        llm = FakeLLM(pack_delay=0.1)
+        service = make_service(llm)
+        batch = asyncio.create_task(service.analyze_jobs(jobs(2)))
+        await asyncio.sleep(0.01)
+        single = await service._llm_analyze("Job posting number 1", None, "medium", None, None)
+        await batch
+        assert single["summary"] == "packed 2"
+        assert llm.calls == [("packed", 2)]
+        assert service.analysis_flights.stats()["analysis_coalesced"] == 1
+
+    asyncio.run(scenario())
+
+def test_failed_pack_retries_each_job(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PACKED_ANALYSIS", True)
+
+    class FailingPacks(FakeLLM):
+        async def generate(self, prompt, system_prompt=None, temperature=0.7, json_schema=None):
+            self.calls.append("packed")
+            raise RuntimeError("provider down")
+
+    async def scenario():
+        llm = FailingPacks()
+        service = make_service(llm)
+        results = await service.analyze_jobs(jobs(2))
+        assert [result["analysis"]["summary"] for result in results] == ["single", "single"]
+
+    asyncio.run(scenario())
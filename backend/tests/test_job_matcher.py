@@ -0,0 +1,86 @@
+import pytest
+
+from app.config import get_settings
+from app.services.job_matcher import JobMatcher, SkillAutomaton, canonical_skill
+
+settings = get_settings()
+
+LONG_TAIL = " We offer flexible hours, a learning budget and a friendly team." * 20
+
+@pytest.fixture
+def matcher() -> JobMatcher:
+    return JobMatcher()
+
+def test_automaton_finds_every_term_in_one_pass():
+    automaton = SkillAutomaton(["he", "she", "his", "hers", "c++"])
+    assert automaton.find("she said hers, his; C++!") == {"she", "hers", "his", "c++"}
+
+def test_automaton_respects_word_boundaries():
+    automaton = SkillAutomaton(["go", "java"])
+    assert automaton.find("a good javascript developer") == set()
+    assert automaton.find("write Go and Java") == {"go", "java"}
+
+def test_canonical_skill_resolves_aliases():
+    assert canonical_skill(" K8s ") == "kubernetes"
+    assert canonical_skill("Postgres") == "postgresql"
+    assert canonical_skill("Haskell") == "haskell"
+
+def test_match_skills_honours_aliases(matcher):
+    matched, uncertain, missing = matcher.match_skills(
+        "Deploy services on k8s backed by Postgres.", ["Kubernetes", "PostgreSQL", "Haskell"]
+    )
+    assert matched == ["Kubernetes", "PostgreSQL"]
+    assert uncertain == []
+    assert missing == ["Haskell"]
+
+def test_ambiguous_terms_never_count_as_matches(matcher):
+    matched, uncertain, missing = matcher.match_skills(
+        "Help us go to market and rest easy with the rest of the team.", ["Go", "REST"]
+    )
+    assert matched == []
+    assert uncertain == ["Go", "REST"]
+    assert missing == []
+
+def test_unknown_skills_are_matched_literally(matcher):
+    assert matcher.match_skills("Experience with Haskell is a plus", ["haskell"])[0] == ["haskell"]
+
+@pytest.mark.parametrize("description, years", [
+    ("5+ years of experience with Python", 5),
+    ("3-5 years' relevant experience", 3),
+    ("at least 4 yrs Python experience", 4),
+    ("Minimum of 7 years experience; 10+ years of experience preferred", 7),
+    ("Founded 25 years ago, we have 100 years of combined wisdom", None),
+    ("No experience requirement", None),
+])
+def test_extract_required_years(matcher, description, years):
+    assert matcher.extract_required_years(description) == years
+
+def test_without_a_profile_every_job_is_valid(matcher):
+    assert matcher.evaluate("Anything at all").verdict is True
+
+def test_rejects_when_far_more_experience_is_required(matcher):
+    description = f"We need {2 + settings.MATCHER_YEARS_TOLERANCE + 1} years of experience with Python."
+    decision = matcher.evaluate(description, experience_years=2)
+    assert decision.verdict is False
+
+def test_experience_within_tolerance_is_left_to_the_llm(matcher):
+    description = f"We need {2 + settings.MATCHER_YEARS_TOLERANCE} years of experience with Python."
+    assert matcher.evaluate(description, experience_years=2).verdict is None
+
+def test_rejects_when_no_required_skill_is_mentioned(matcher):
+    description = "Senior accountant for our finance team." + LONG_TAIL
+    assert len(description) >= settings.MATCHER_MIN_DESCRIPTION_CHARS
+    assert matcher.evaluate(description, required_skills=["Python", "Kubernetes"]).verdict is False
+
+def test_short_descriptions_are_never_rejected_on_skills(matcher):
+    assert matcher.evaluate("Accountant", required_skills=["Python"]).verdict is None
+
+def test_never_accepts_a_job_with_requirements(matcher):
+    description = "Python and Kubernetes, 1 year of experience." + LONG_TAIL
+    decision = matcher.evaluate(description, experience_years=5, required_skills=["python", "kubernetes"])
+    assert decision.verdict is None
+    assert decision.matched_skills == ["python", "kubernetes"]
+
+def test_an_ambiguous_mention_keeps_the_matcher_from_rejecting(matcher):
+    description = "You will go the extra mile for customers." + LONG_TAIL
+    assert matcher.evaluate(description, required_skills=["Go"]).verdict is None
@@ -0,0 +1,99 @@
+import sqlite3
+import time
+
+import pytest
+
+from app.config import get_settings
+from app.store.job_store import SCHEMA_VERSION, JobStore, job_key, normalize_search_term
+
+settings = get_settings()
+
+def posting(job_id: str, title: str = "Python Developer", **fields):
+    return {"id": job_id, "site": "indeed", "title": title, "company": "Acme",
+            "location": "Berlin, Germany", "job_url": f"https://example.com/{job_id}", **fields}
+
+@pytest.fixture
+def store():
+    store = JobStore(":memory:")
+    yield store
+    store.close()
+
+def test_job_key_falls_back_to_the_url():
+    assert job_key({"id": 42}) == "42"
+    assert job_key({"job_url": "https://example.com/a"}) == job_key({"job_url_direct": "https://example.com/a"})
+    assert job_key({}) is None
+
+def test_normalize_search_term():
+    assert normalize_search_term("  Python   DEVELOPER ") == "python developer"
+
+def test_upsert_refreshes_instead_of_duplicating(store):
+    assert store.upsert_jobs([posting("1"), posting("2"), {"title": "no site or id"}], "python") == 2
+    store.upsert_jobs([posting("1", title="Senior Python Developer")], "python")
+    assert store.stats()["jobs"] == 2
+    assert store.get_jobs([("indeed", "1")])[("indeed", "1")]["title"] == "Senior Python Developer"
+
+def test_search_by_term_location_and_site(store):
+    store.upsert_jobs([posting("1"), posting("2", title="Data Engineer", location="Munich")], "python")
+    store.upsert_jobs([posting("3", title="Barista", site="linkedin")], "coffee")
+    assert {job["id"] for job in store.search("Python")} == {"1", "2"}
+    assert {job["id"] for job in store.search("engineer")} == {"2"}  # Title match, never searched for
+    assert {job["id"] for job in store.search(location="munich")} == {"2"}
+    assert {job["id"] for job in store.search(sites=["linkedin"])} == {"3"}
+    assert store.search("100%_python") == []
+
+def test_search_orders_newest_posting_first(store):
+    store.upsert_jobs([posting("old", date_posted="2024-01-01"), posting("new", date_posted="2024-03-01")])
+    assert [job["id"] for job in store.search()] == ["new", "old"]
+
+def test_watermark_round_trip_keeps_the_newest_posting(store):
+    assert store.get_watermark("python", "Berlin", "indeed", "germany") is None
+    store.set_watermark("Python", " berlin", "indeed", "Germany", 100.0, 50.0, 20,
+                        [posting("1", date_posted="2024-03-01")])
+    store.set_watermark("python", "Berlin", "indeed", "germany", 200.0, 150.0, 20,
+                        [posting("2", date_posted="2024-02-01")])
+    assert store.get_watermark("python", "berlin", "indeed", "GERMANY") == {
+        "scraped_at": 200.0, "covered_from": 150.0, "results_wanted": 20, "newest_posted": "2024-03-01"
+    }
+
+def test_query_jobs_only_returns_what_the_search_found(store):
+    store.upsert_jobs([posting("1", date_posted="2024-03-01")], "python", "Berlin")
+    store.upsert_jobs([posting("2", date_posted="2024-03-01")], "java", "Berlin")
+    since = time.mktime((2024, 2, 1, 0, 0, 0, 0, 0, 0))
+    assert [job["id"] for job in store.query_jobs("Python", "berlin", "indeed", since, 10)] == ["1"]
+
+def test_prune_drops_stale_postings_and_tells_listeners(store):
+    pruned = []
+    store.add_prune_listener(pruned.extend)
+    store.add_prune_listener(lambda keys: 1 / 0)  # A failing listener must not break the write
+    store.upsert_jobs([posting("stale"), posting("fresh")], "python")
+    stale_since = time.time() - (settings.JOB_STORE_RETENTION_DAYS + 1) * 86400
+    store.connection.execute("UPDATE jobs SET last_seen = ? WHERE job_id = 'stale'", (stale_since,))
+    store.connection.execute("UPDATE job_searches SET last_seen = ? WHERE job_id = 'stale'", (stale_since,))
+
+    assert store.upsert_jobs([posting("fresh")], "python") == 1
+    assert pruned == [("indeed", "stale")]
+    assert [job["id"] for job in store.search("python")] == ["fresh"]
+
+def test_older_schema_is_migrated_keeping_postings(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path)
+    store.upsert_jobs([posting("1")], "python")
+    store.close()
+
+    connection = sqlite3.connect(path)
+    connection.executescript(
+        "DROP TABLE job_searches; DROP TABLE scrape_watermarks;"
+        "CREATE TABLE job_searches (search_term TEXT, site TEXT, job_id TEXT);"
+        "PRAGMA user_version = 1;"
+    )
+    connection.close()
+
+    store = JobStore(path)
+    try:
+        assert store.connection.execute("PRAGMA user_version").fetchone() == (SCHEMA_VERSION,)
+        assert store.stats()["jobs"] == 1
+        store.upsert_jobs([posting("2")], "python", "Berlin")
+        assert store.get_watermark("python", "berlin", "indeed", "germany") is None
+        assert {job["id"] for job in store.search("python")} == {"1", "2"}
+    finally:
+        store.close()
@@ -0,0 +1,114 @@
+import json
+
+import pytest
+
+from app.llm.parser import IncrementalJSONParser, ResponseParseError, ResponseParser
+
+ANALYSIS = {
+    "valid": True,
+    "summary": "Build {APIs}, \"fast\" and [well]",
+    "key_skills": ["python", {"nested": [1, 2]}],
+    "required_experience": "3 years\\n",
+    "company_culture": None,
+}
+
+def feed_in_chunks(text: str, size: int):
+    parser = IncrementalJSONParser()
+    completed = []
+    for start in range(0, len(text), size):
+        completed.extend(parser.feed(text[start:start + size]))
+    return parser, completed
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_incremental_parser_yields_each_field_once(size):
+    parser, completed = feed_in_chunks("```json\n" + json.dumps(ANALYSIS, indent=2) + "\n```", size)
+    assert completed == list(ANALYSIS.items())
+    assert parser.fields == ANALYSIS
+    assert parser.complete
+
+def test_incremental_parser_yields_fields_before_the_object_ends():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"valid": false, "summ') == [("valid", False)]
+    assert not parser.complete
+    assert parser.feed('ary": "x"}') == [("summary", "x")]
+    assert parser.complete
+
+def test_incremental_parser_ignores_text_after_the_object():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"a": 1} {"b": 2}') == [("a", 1)]
+    assert parser.feed('{"c": 3}') == []
+
+def test_incremental_parser_skips_an_unparsable_field():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"a": nope, "b": 2}') == [("b", 2)]
+
+def test_extract_json_tolerates_fences_and_prose():
+    reply = 'Here you go:\n```json\n{"valid": true, "summary": "s"}\n```\nHope that helps {'
+    assert ResponseParser.extract_json(reply) == {"valid": True, "summary": "s"}
+
+def test_extract_json_skips_values_of_the_wrong_type():
+    assert ResponseParser.extract_json('[1, 2] then {"a": 1}') == {"a": 1}
+    assert ResponseParser.extract_json('[1, 2]', expected=list) == [1, 2]
+
+def test_extract_json_raises_without_json():
+    with pytest.raises(ResponseParseError):
+        ResponseParser.extract_json("no json here")
+
+def test_parse_json_response_marks_failures_with_an_error():
+    parsed = ResponseParser.parse_json_response("not json")
+    assert parsed["error"]
+    assert parsed["valid"] is False
+
+def test_validate_analysis_response_fills_defaults():
+    validated = ResponseParser.validate_analysis_response({"valid": 1, "key_skills": "python"})
+    assert validated == {
+        "valid": True,
+        "summary": "",
+        "key_skills": [],
+        "required_experience": "Not specified",
+        "company_culture": "Not specified",
+        "estimated_salary_range": "Not specified",
+    }
+
+@pytest.mark.parametrize("reply, verdict", [
+    ("true", True),
+    ("false", False),
+    ('{"valid": false}', False),
+    ('```json\n{"valid": true, "reason": "matches"}', True),
+    ("TRUE, the candidate fits", True),
+    ("Yes, this job matches the profile", True),
+])
+def test_parse_validation_response(reply, verdict):
+    assert ResponseParser.parse_validation_response(reply) is verdict
+
+@pytest.mark.parametrize("reply", ["", "maybe", "yes and no"])
+def test_parse_validation_response_without_a_verdict_raises(reply):
+    with pytest.raises(ResponseParseError):
+        ResponseParser.parse_validation_response(reply)
+
+@pytest.mark.parametrize("partial, verdict", [
+    ("", None),
+    ("tr", None),
+    ("true", True),
+    ('{"reason": "x", "valid": fal', None),
+    ('{"reason": "x", "valid": false', False),
+])
+def test_early_validation_verdict(partial, verdict):
+    assert ResponseParser.early_validation_verdict(partial) is verdict
+
+def test_packed_response_keeps_only_well_formed_known_ids():
+    reply = json.dumps({"jobs": [
+        {"id": "1", "valid": True, "summary": "one"},
+        {"id": "1", "valid": False, "summary": "duplicate"},
+        {"id": "2", "valid": True},
+        {"id": "9", "valid": True, "summary": "unknown"},
+        "garbage",
+        {"id": 3, "valid": False, "summary": "three"},
+    ]})
+    results = ResponseParser.parse_packed_analysis_response(reply, ["1", "2", "3"])
+    assert sorted(results) == ["1", "3"]
+    assert results["1"]["summary"] == "one"
+    assert results["3"]["valid"] is False
+
+def test_packed_response_that_is_not_json_is_empty():
+    assert ResponseParser.parse_packed_analysis_response("sorry", ["1", "2"]) == {}
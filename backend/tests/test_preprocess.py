@@ -0,0 +1,72 @@
+import random
+
+from app.config import get_settings
+from app.llm.preprocess import DescriptionPreprocessor, estimate_tokens, normalize_markup, truncate_to_tokens
+
+settings = get_settings()
+
+def test_normalize_markup_flattens_html_and_markdown():
+    text = (
+        "<p>We build <b>fast</b> APIs &amp; tools.</p><ul><li>Python</li><li>Go</li></ul>"
+        "## Stack\n**Django** and [Postgres](https://postgresql.org)\n1. Docker\nSee https://example.com/apply"
+    )
+    assert normalize_markup(text) == (
+        "We build fast APIs & tools.\n- Python\n- Go\nStack\nDjango and Postgres\n- Docker\nSee"
+    )
+
+def test_truncate_to_tokens_cuts_at_a_boundary():
+    text = "First sentence here. " * 20
+    cut = truncate_to_tokens(text, 30)
+    assert estimate_tokens(cut) <= 30
+    assert cut.endswith(".")
+    assert truncate_to_tokens("short", 30) == "short"
+
+def test_boilerplate_sentences_are_dropped_not_their_paragraph():
+    cleaned = DescriptionPreprocessor()._clean(
+        "You will own the billing service. We are an equal opportunity employer. Python required."
+    )
+    assert cleaned == "You will own the billing service. Python required."
+
+def test_boilerplate_sections_are_dropped_until_the_next_heading():
+    cleaned = DescriptionPreprocessor()._clean(
+        "Requirements:\n- 3 years of Python\n"
+        "Benefits:\n- Gym membership\n- Free lunch\n"
+        "Responsibilities:\n- Ship features"
+    )
+    assert cleaned == "Requirements:\n- 3 years of Python\nResponsibilities:\n- Ship features"
+
+def test_headings_only_match_exactly():
+    # "Benefits of the role" is not the "benefits" heading
+    cleaned = DescriptionPreprocessor()._clean("Benefits Of The Role\n- Lead a team of five")
+    assert cleaned == "Benefits Of The Role\n- Lead a team of five"
+
+def test_salary_lines_survive_boilerplate_sections():
+    cleaned = DescriptionPreprocessor()._clean("What we offer:\n- Salary: $120,000 - $150,000\n- Snacks")
+    assert cleaned == "- Salary: $120,000 - $150,000"
+
+def test_paragraphs_repeated_across_jobs_are_learned_as_boilerplate():
+    preprocessor = DescriptionPreprocessor()
+    blurb = ("Acme Corp is a global leader in widgets, serving customers in forty countries "
+             "with a passion for quality, innovation and sustainable growth since 1950.")
+    random.seed(3)
+    vocabulary = ["python", "java", "sales", "design", "finance", "support", "cloud", "data", "legal"]
+    jobs = [" ".join(random.choices(vocabulary, k=80)) for _ in range(settings.PREPROCESS_REPEAT_THRESHOLD)]
+
+    for job in jobs[:-1]:
+        assert blurb in preprocessor._clean(f"{job}\n{blurb}")
+    # Dropped from the job that takes it to the threshold onwards
+    assert preprocessor._clean(f"{jobs[-1]}\n{blurb}") == jobs[-1]
+    assert preprocessor.stats()["learned_boilerplate"] == 1
+
+def test_reposts_of_one_job_are_not_learned():
+    preprocessor = DescriptionPreprocessor()
+    requirement = ("You must have shipped production Kubernetes operators in Go and be comfortable "
+                   "owning on-call for the control plane of our managed database product.")
+    job = "Platform engineer on the database team in Berlin. " * 5
+    for n in range(settings.PREPROCESS_REPEAT_THRESHOLD + 2):
+        assert requirement in preprocessor._clean(f"{job}\n{requirement}\nReference {n}")
+
+def test_clean_is_a_no_op_when_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "PREPROCESS_ENABLED", False)
+    text = "<p>Raw</p> We are an equal opportunity employer."
+    assert DescriptionPreprocessor().clean(text) == text
@@ -0,0 +1,35 @@
+import pytest
+
+from app.cache.resume_analysis import prompt_version
+from app.config import get_settings
+
+settings = get_settings()
+
+@pytest.mark.parametrize("provider", ["ollama", "Ollama", "gemini", "GEMINI"])
+def test_prompt_version_tracks_the_configured_model(monkeypatch, provider):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", provider)
+    before = prompt_version()
+    model = "OLLAMA_MODEL" if provider.lower() == "ollama" else "GEMINI_MODEL"
+    monkeypatch.setattr(settings, model, "another-model")
+    assert prompt_version() != before
+
+def test_prompt_version_ignores_provider_case(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "ollama")
+    lower = prompt_version()
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "Ollama")
+    assert prompt_version() == lower
+
+@pytest.mark.parametrize("model", ["OLLAMA_MODEL", "GEMINI_MODEL"])
+def test_composite_prompt_version_tracks_every_routed_model(monkeypatch, model):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "composite")
+    monkeypatch.setattr(settings, "LLM_COMPOSITE_PROVIDERS", ["Ollama", "gemini"])
+    before = prompt_version()
+    monkeypatch.setattr(settings, model, "another-model")
+    assert prompt_version() != before
+
+def test_composite_prompt_version_ignores_unrouted_models(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "composite")
+    monkeypatch.setattr(settings, "LLM_COMPOSITE_PROVIDERS", ["gemini"])
+    before = prompt_version()
+    monkeypatch.setattr(settings, "OLLAMA_MODEL", "another-model")
+    assert prompt_version() == before
@@ -0,0 +1,123 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.config import get_settings
+from app.llm.scheduler import LLMScheduler, Priority, SchedulerOverloadedError, is_overload, llm_priority
+
+settings = get_settings()
+
+async def hold(scheduler: LLMScheduler, release: asyncio.Event, order: list, name: str):
+    async with scheduler.slot():
+        order.append(name)
+        await release.wait()
+
+def test_queued_calls_are_admitted_by_priority():
+    async def scenario():
+        scheduler = LLMScheduler("test", max_limit=1)
+        release = asyncio.Event()
+        order = []
+        first = asyncio.create_task(hold(scheduler, release, order, "first"))
+        await asyncio.sleep(0)
+
+        tasks = []
+        for name, priority in [("bulk", Priority.BULK), ("validation", Priority.VALIDATION),
+                               ("interactive", Priority.INTERACTIVE)]:
+            with llm_priority(priority):
+                tasks.append(asyncio.create_task(hold(scheduler, release, order, name)))
+        await asyncio.sleep(0)
+        assert scheduler.stats()["queued"] == 3
+
+        release.set()
+        await asyncio.gather(first, *tasks)
+        assert order == ["first", "interactive", "validation", "bulk"]
+        assert scheduler.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+def test_bulk_is_shed_before_validation(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_SCHEDULER_MAX_QUEUED", 4)
+
+    async def scenario():
+        scheduler = LLMScheduler("test", max_limit=1)
+        release = asyncio.Event()
+        order = []
+        tasks = [asyncio.create_task(hold(scheduler, release, order, str(n))) for n in range(3)]
+        await asyncio.sleep(0)
+        assert scheduler.stats()["queued"] == 2  # The bulk share of 4
+
+        with pytest.raises(SchedulerOverloadedError):
+            await hold(scheduler, release, order, "shed")
+        with llm_priority(Priority.VALIDATION):
+            tasks.append(asyncio.create_task(hold(scheduler, release, order, "validation")))
+        await asyncio.sleep(0)
+        assert scheduler.stats()["queued"] == 3
+        assert scheduler.stats()["shed"]["bulk"] == 1
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert "shed" not in order
+
+    asyncio.run(scenario())
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def scenario():
+        scheduler = LLMScheduler("test", max_limit=1)
+        release = asyncio.Event()
+        order = []
+        first = asyncio.create_task(hold(scheduler, release, order, "first"))
+        await asyncio.sleep(0)
+        cancelled = asyncio.create_task(hold(scheduler, release, order, "cancelled"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        release.set()
+        await first
+        await asyncio.gather(cancelled, return_exceptions=True)
+        await hold(scheduler, release, order, "after")
+        assert order == ["first", "after"]
+        assert scheduler.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+def test_limit_backs_off_on_overload_and_recovers_additively(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_SCHEDULER_INITIAL_LIMIT", 4)
+    monkeypatch.setattr(settings, "LLM_SCHEDULER_MIN_LIMIT", 1)
+    monkeypatch.setattr(settings, "LLM_SCHEDULER_BACKOFF_RATIO", 0.5)
+    scheduler = LLMScheduler("test", max_limit=8)
+
+    scheduler.in_flight = 1
+    scheduler._release(latency=0.1, overloaded=True)
+    assert scheduler.limit == 2
+    # A second failure in the same latency window is the same signal
+    scheduler.in_flight = 1
+    scheduler._release(latency=0.1, overloaded=True)
+    assert scheduler.limit == 2
+
+    for _ in range(2):
+        scheduler.in_flight = 1
+        scheduler._release(latency=0.1, overloaded=False)
+    assert scheduler.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5)
+    assert scheduler.stats()["overloads"] == 2
+
+def test_limit_stays_within_bounds(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_SCHEDULER_MIN_LIMIT", 2)
+    scheduler = LLMScheduler("test", max_limit=3)
+    for _ in range(50):
+        scheduler.in_flight = 1
+        scheduler._release(latency=0.1, overloaded=False)
+    assert scheduler.limit == 3
+
+    scheduler.last_decrease = float("-inf")
+    for _ in range(5):
+        scheduler.in_flight = 1
+        scheduler._release(latency=settings.LLM_SCHEDULER_LATENCY_TARGET + 1, overloaded=False)
+        scheduler.last_decrease = float("-inf")
+    assert scheduler.limit == 2
+
+def test_errors_that_signal_overload():
+    request = httpx.Request("POST", "http://ollama/api/generate")
+    assert is_overload(httpx.ReadTimeout("slow", request=request))
+    assert is_overload(httpx.HTTPStatusError("busy", request=request, response=httpx.Response(503, request=request)))
+    assert not is_overload(httpx.HTTPStatusError("bad", request=request, response=httpx.Response(400, request=request)))
+    assert not is_overload(ValueError("parse error"))
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from app.config import get_settings
+from app.services.scrape_queue import ScrapeCancelledError, ScrapeJobManager, ScrapeJobStatus, ScrapeQueueFullError
+
+settings = get_settings()
+
+class FakeScraper:
+    """Reports each site as scraped; blocks before the last one until release is set."""
+
+    def __init__(self, sites=("indeed", "linkedin")):
+        self.sites = sites
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.runs = []
+
+    def scrape_jobs(self, params, progress_callback=None):
+        self.runs.append(params)
+        self.started.set()
+        if params.get("fail"):
+            raise RuntimeError("site blocked us")
+        jobs = []
+        for n, site in enumerate(self.sites):
+            if n == len(self.sites) - 1:
+                self.release.wait(5)
+            jobs.append({"site": site, "title": params.get("search_term")})
+            if progress_callback:
+                progress_callback(site, 1)
+        return jobs
+
+    def stream_jobs(self, params, submit):
+        return submit(self.scrape_jobs, params)
+
+@pytest.fixture
+def scraper():
+    return FakeScraper()
+
+@pytest.fixture
+def manager(monkeypatch, scraper):
+    monkeypatch.setattr(settings, "SCRAPE_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "SCRAPE_MAX_QUEUED", 1)
+    manager = ScrapeJobManager(scraper)
+    yield manager
+    scraper.release.set()
+    manager.shutdown()
+
+def test_completed_job_reports_progress_and_result(manager, scraper):
+    scraper.release.set()
+    job = manager.submit({"search_term": "python"})
+    job.future.result(5)
+    data = manager.get(job.id).to_dict()
+    assert data["status"] == "completed"
+    assert data["progress"] == {"indeed": 1, "linkedin": 1}
+    assert data["jobs_found"] == 2
+    assert len(data["result"]) == 2
+
+def test_failed_job_records_the_error(manager):
+    job = manager.submit({"fail": True})
+    with pytest.raises(RuntimeError):
+        job.future.result(5)
+    assert job.status == ScrapeJobStatus.FAILED
+    assert job.error == "site blocked us"
+    assert "result" not in job.to_dict()
+
+def test_queue_limit_rejects_beyond_max_queued(manager, scraper):
+    running = manager.submit({"search_term": "running"})
+    assert scraper.started.wait(5)
+    manager.submit({"search_term": "waiting"})
+    with pytest.raises(ScrapeQueueFullError):
+        manager.submit({"search_term": "rejected"})
+    with pytest.raises(ScrapeQueueFullError):
+        manager.stream({"search_term": "rejected"})
+    scraper.release.set()
+    running.future.result(5)
+
+def test_streamed_calls_count_as_queued_until_they_start(manager, scraper):
+    manager.submit({"search_term": "running"})
+    assert scraper.started.wait(5)
+    future = manager.stream({"search_term": "streamed"})
+    assert manager.queued_calls == 1
+    with pytest.raises(ScrapeQueueFullError):
+        manager.submit({"search_term": "rejected"})
+    scraper.release.set()
+    assert len(future.result(5)) == 2
+    assert manager.queued_calls == 0
+
+def test_cancelled_pending_job_never_runs(manager, scraper):
+    running = manager.submit({"search_term": "running"})
+    assert scraper.started.wait(5)
+    pending = manager.submit({"search_term": "pending"})
+    assert manager.cancel(pending.id).status == ScrapeJobStatus.CANCELLED
+    scraper.release.set()
+    running.future.result(5)
+    assert [params["search_term"] for params in scraper.runs] == ["running"]
+    # A cancelled job frees its place in the queue
+    manager.submit({"search_term": "next"}).future.result(5)
+
+def test_running_job_stops_at_the_next_site(manager, scraper):
+    job = manager.submit({"search_term": "python"})
+    assert scraper.started.wait(5)
+    manager.cancel(job.id)
+    scraper.release.set()
+    with pytest.raises(ScrapeCancelledError):
+        job.future.result(5)
+    assert job.status == ScrapeJobStatus.CANCELLED
+    assert job.result is None
+    assert manager.cancel("unknown") is None
+
+def test_finished_jobs_expire(manager, scraper, monkeypatch):
+    scraper.release.set()
+    job = manager.submit({"search_term": "python"})
+    job.future.result(5)
+    monkeypatch.setattr(settings, "SCRAPE_JOB_TTL", 0)
+    job.finished_at = time.time() - 1
+    manager.submit({"search_term": "next"}).future.result(5)
+    assert manager.get(job.id) is None
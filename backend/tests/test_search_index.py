@@ -0,0 +1,96 @@
+import pytest
+
+from app.config import get_settings
+from app.store.job_store import JobStore
+from app.store.search_index import JobSearchIndex, tokenize
+
+settings = get_settings()
+
+JOBS = [
+    {"id": "1", "site": "indeed", "title": "Python Developer",
+     "description": "Build APIs with Python, Django and PostgreSQL."},
+    {"id": "2", "site": "linkedin", "title": "Frontend Engineer",
+     "description": "React and TypeScript; some Python scripting."},
+    {"id": "3", "site": "indeed", "title": "C++ Engineer",
+     "description": "Low-latency C++ and C# services on .NET and node.js."},
+]
+
+@pytest.fixture
+def index(tmp_path):
+    return JobSearchIndex(str(tmp_path / "index"))
+
+def keys(results):
+    return [(site, key) for site, key, _ in results]
+
+def test_tokenize_keeps_tech_tokens_and_drops_stopwords():
+    assert tokenize("The C++ and C# devs use .NET, node.js and Python3!") == [
+        "c++", "c#", "devs", "use", ".net", "node.js", "python3"
+    ]
+
+def test_title_matches_rank_first(index):
+    assert index.add_jobs(JOBS) == 3
+    assert keys(index.search("python")) == [("indeed", "1"), ("linkedin", "2")]
+    assert keys(index.search("c++")) == [("indeed", "3")]
+    assert index.search("") == []
+    assert index.search("haskell") == []
+
+def test_search_restricted_to_sites(index):
+    index.add_jobs(JOBS)
+    assert keys(index.search("python", sites=["linkedin"])) == [("linkedin", "2")]
+
+def test_unchanged_postings_are_not_reindexed(index):
+    index.add_jobs(JOBS)
+    assert index.add_jobs(JOBS) == 0
+    changed = dict(JOBS[1], description="Now a Rust role.")
+    assert index.add_jobs([changed]) == 1
+    assert keys(index.search("python")) == [("indeed", "1")]
+    assert keys(index.search("rust")) == [("linkedin", "2")]
+    assert index.stats()["documents"] == 3
+
+def test_removed_postings_take_no_result_slots(index):
+    index.add_jobs(JOBS)
+    assert index.remove_jobs([("indeed", "1"), ("indeed", "missing")]) == 1
+    assert keys(index.search("python", limit=1)) == [("linkedin", "2")]
+    assert index.stats()["documents"] == 2
+
+def test_save_and_reload_compacts_deleted_documents(index, tmp_path):
+    index.add_jobs(JOBS)
+    index.remove_jobs([("indeed", "1")])
+    index.add_jobs([dict(JOBS[1], description="Now a Rust role.")])
+    before = {query: index.search(query) for query in ("python", "rust", "engineer", "c#")}
+    index.save()
+
+    reloaded = JobSearchIndex(str(tmp_path / "index"))
+    assert reloaded.stats()["deleted"] == 0
+    assert reloaded.stats()["documents"] == 2
+    for query, results in before.items():
+        assert keys(reloaded.search(query)) == keys(results)
+        assert [score for *_, score in reloaded.search(query)] == pytest.approx([score for *_, score in results])
+
+    # Documents added after a load are searched together with the mapped ones
+    reloaded.add_jobs([{"id": "4", "site": "indeed", "title": "Rust Engineer", "description": ""}])
+    assert keys(reloaded.search("rust")) == [("indeed", "4"), ("linkedin", "2")]
+
+def test_mismatched_files_start_empty(index, tmp_path):
+    index.add_jobs(JOBS)
+    index.save()
+    with open(tmp_path / "index.bin", "ab") as f:
+        f.write(b"\0\0\0\0")
+    assert JobSearchIndex(str(tmp_path / "index")).stats()["documents"] == 0
+
+def test_rebuild_from_the_job_store(index):
+    store = JobStore(":memory:")
+    store.upsert_jobs(JOBS, "engineer")
+    assert index.rebuild(store) == 3
+    assert keys(index.search("typescript")) == [("linkedin", "2")]
+    store.close()
+
+def test_pruned_postings_leave_the_index(index):
+    store = JobStore(":memory:")
+    store.add_prune_listener(index.remove_jobs)
+    store.upsert_jobs(JOBS, "engineer")
+    index.add_jobs(JOBS)
+    store.connection.execute("UPDATE jobs SET last_seen = 0 WHERE job_id = '1'")
+    store.upsert_jobs(JOBS[1:], "engineer")
+    assert keys(index.search("django")) == []
+    store.close()
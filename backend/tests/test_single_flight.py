@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+def test_concurrent_calls_share_one_run():
+    async def scenario():
+        flights = SingleFlight("test")
+        runs = []
+
+        async def work():
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            return "done"
+
+        results = await asyncio.gather(*(flights.do("key", work) for _ in range(5)))
+        assert results == ["done"] * 5
+        assert len(runs) == 1
+        assert flights.stats() == {"test_started": 1, "test_coalesced": 4, "test_in_flight": 0}
+        # The key is released once finished, so a later call runs again
+        await flights.do("key", work)
+        assert len(runs) == 2
+
+    asyncio.run(scenario())
+
+def test_errors_reach_every_waiter():
+    async def scenario():
+        flights = SingleFlight("test")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(*(flights.do("key", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flights.stats()["test_in_flight"] == 0
+
+    asyncio.run(scenario())
+
+def test_cancelling_one_waiter_keeps_the_work_for_others():
+    async def scenario():
+        flights = SingleFlight("test")
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "done"
+
+        first = asyncio.create_task(flights.do("key", work))
+        second = asyncio.create_task(flights.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await second == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
+
+def test_last_waiter_cancelling_cancels_the_work():
+    async def scenario():
+        flights = SingleFlight("test")
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiter = asyncio.create_task(flights.do("key", work))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        assert flights.stats()["test_in_flight"] == 0
+
+    asyncio.run(scenario())